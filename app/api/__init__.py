@@ -6,22 +6,24 @@ Integrações com fontes governamentais e auxiliares
 
 from app.api.catmat_api import CATMATClient
 from app.api.catser_api import CATSERClient
-# from app.api.pncp_api import PNCPClient # Comentado, pois ainda não foi refatorado
-# from app.api.comprasnet_api import ComprasNetClient # Comentado, pois ainda não foi refatorado
-# from app.api.painel_precos_api import PainelPrecosClient # Comentado, pois ainda não foi refatorado
+from app.api.pncp_api import PNCPClient
+from app.api.comprasnet_api import ComprasNetClient
+from app.api.painel_precos_api import PainelPrecosClient
 from app.api.portal_transparencia_api import PortalTransparenciaClient
 from app.api.brasilapi_client import BrasilAPIClient
-# from app.api.fallback_manager import APIFallbackManager, exponential_backoff, rate_limit
+from app.api.fallback_manager import APIFallbackManager, get_fallback_manager
+# from app.api.fallback_manager import exponential_backoff, rate_limit
 
 __all__ = [
     'CATMATClient',
     'CATSERClient',
     'PortalTransparenciaClient',
     'BrasilAPIClient',
-    # 'PNCPClient',
-    # 'ComprasNetClient',
-    # 'PainelPrecosClient',
-    # 'APIFallbackManager',
+    'PNCPClient',
+    'ComprasNetClient',
+    'PainelPrecosClient',
+    'APIFallbackManager',
+    'get_fallback_manager',
     # 'exponential_backoff',
     # 'rate_limit'
 ]
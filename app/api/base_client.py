@@ -6,111 +6,548 @@ Implementa retry, rate limiting, cache e logging
 """
 
 import requests
+from requests.adapters import HTTPAdapter
 import time
 import logging
-from typing import Optional, Dict, Any, Callable
+import json
+import os
+import sqlite3
+from typing import Optional, Dict, Any, Callable, Tuple, List, Iterator
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
 from functools import wraps
-from datetime import datetime, timedelta
-from collections import defaultdict
+from datetime import timedelta
+from collections import OrderedDict
 import threading
+from config import Config
+from app.api.pagination import iter_pages, total_pages_from
+from app.api.fallback_manager import get_fallback_manager, remaining_time
 
 logger = logging.getLogger(__name__)
 
 
+class SQLiteStore:
+    """Base para estados compartilhados em SQLite (uma conexão por thread/processo)"""
+    
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    
+    def _connect(self) -> sqlite3.Connection:
+        """Conexão da thread atual (recriada após fork do worker)"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+
+class SQLiteCacheBackend(SQLiteStore):
+    """
+    Cache persistente em SQLite, compartilhado pelos workers do mesmo nó
+    
+    - Valores serializados em JSON (respostas das APIs)
+    - Expiração por TTL gravada em cada entrada
+    - Tamanho limitado a max_entries (remove as entradas mais antigas)
+    - Uma conexão por thread/processo; modo WAL para leituras concorrentes
+    """
+    
+    EVICTION_CHECK_EVERY = 100  # gravações entre verificações de tamanho
+    
+    def __init__(self, path: str, max_entries: int = 50000):
+        super().__init__(path)
+        self.max_entries = max_entries
+        self._writes = 0
+        self._writes_lock = threading.Lock()
+        
+        conn = self._connect()
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS cache_entries (
+                namespace TEXT NOT NULL,
+                key TEXT NOT NULL,
+                value TEXT NOT NULL,
+                expires_at REAL NOT NULL,
+                created_at REAL NOT NULL,
+                PRIMARY KEY (namespace, key)
+            )
+            """
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_cache_expires ON cache_entries (expires_at)")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_cache_created ON cache_entries (created_at)")
+    
+    def get(self, namespace: str, key: str) -> Optional[Any]:
+        """Recupera item se existir e não estiver expirado"""
+        entry = self.get_entry(namespace, key)
+        return None if entry is None else entry[0]
+    
+    def get_entry(self, namespace: str, key: str) -> Optional[Tuple[Any, float]]:
+        """Recupera (valor, expires_at) se existir e não estiver expirado"""
+        try:
+            row = self._connect().execute(
+                "SELECT value, expires_at FROM cache_entries WHERE namespace = ? AND key = ?",
+                (namespace, key)
+            ).fetchone()
+            
+            if row is None:
+                return None
+            
+            value, expires_at = row
+            if expires_at < time.time():
+                self._connect().execute(
+                    "DELETE FROM cache_entries WHERE namespace = ? AND key = ?",
+                    (namespace, key)
+                )
+                return None
+            
+            return json.loads(value), expires_at
+        
+        except (sqlite3.Error, ValueError) as e:
+            logger.warning(f"Cache SQLite indisponível (get): {e}")
+            return None
+    
+    def set(self, namespace: str, key: str, value: Any, ttl_seconds: float) -> None:
+        """Armazena item com TTL"""
+        try:
+            payload = json.dumps(value)
+        except (TypeError, ValueError):
+            logger.debug(f"Valor não serializável, ignorado no cache persistente: {key}")
+            return
+        
+        now = time.time()
+        try:
+            self._connect().execute(
+                "INSERT OR REPLACE INTO cache_entries (namespace, key, value, expires_at, created_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (namespace, key, payload, now + ttl_seconds, now)
+            )
+        except sqlite3.Error as e:
+            logger.warning(f"Cache SQLite indisponível (set): {e}")
+            return
+        
+        with self._writes_lock:
+            self._writes += 1
+            check = self._writes % self.EVICTION_CHECK_EVERY == 0
+        if check:
+            self._evict()
+    
+    def _evict(self) -> None:
+        """Remove expirados e, se necessário, os 20% mais antigos"""
+        try:
+            conn = self._connect()
+            conn.execute("DELETE FROM cache_entries WHERE expires_at < ?", (time.time(),))
+            
+            total = conn.execute("SELECT COUNT(*) FROM cache_entries").fetchone()[0]
+            if total > self.max_entries:
+                remove_count = total - int(self.max_entries * 0.8)
+                conn.execute(
+                    "DELETE FROM cache_entries WHERE rowid IN "
+                    "(SELECT rowid FROM cache_entries ORDER BY created_at LIMIT ?)",
+                    (remove_count,)
+                )
+                logger.info(f"Cache SQLite cleanup: removidos {remove_count} itens")
+        except sqlite3.Error as e:
+            logger.warning(f"Cache SQLite indisponível (cleanup): {e}")
+    
+    def clear(self, namespace: Optional[str] = None) -> None:
+        """Limpa o cache (todo ou apenas um namespace)"""
+        try:
+            if namespace is None:
+                self._connect().execute("DELETE FROM cache_entries")
+            else:
+                self._connect().execute("DELETE FROM cache_entries WHERE namespace = ?", (namespace,))
+        except sqlite3.Error as e:
+            logger.warning(f"Cache SQLite indisponível (clear): {e}")
+
+
+_default_cache_backend: Optional[SQLiteCacheBackend] = None
+_default_cache_backend_lock = threading.Lock()
+
+
+def get_default_cache_backend() -> Optional[SQLiteCacheBackend]:
+    """Backend persistente compartilhado do processo, conforme Config.API_CACHE_BACKEND"""
+    global _default_cache_backend
+    
+    if Config.API_CACHE_BACKEND != 'sqlite':
+        return None
+    
+    with _default_cache_backend_lock:
+        if _default_cache_backend is None:
+            try:
+                _default_cache_backend = SQLiteCacheBackend(
+                    Config.API_CACHE_DB,
+                    max_entries=Config.API_CACHE_MAX_ENTRIES
+                )
+            except (sqlite3.Error, OSError) as e:
+                logger.warning(f"Cache persistente desativado: {e}")
+                return None
+        return _default_cache_backend
+
+
 class CacheManager:
-    """Gerenciador de cache com expiração automática"""
+    """
+    Cache LRU com expiração automática
+    
+    - get/set O(1) amortizado (OrderedDict); get renova a recência do item
+    - Expiração preguiçosa: itens vencidos são descartados ao serem lidos
+      ou quando chegam ao fim da fila LRU
+    - Limite por quantidade (max_size) e, opcionalmente, por bytes (max_bytes)
+    - Contadores de hits/misses/evictions para ajuste da taxa de acerto
+    
+    O dicionário em memória atua como L1; se um backend persistente for
+    informado, ele atua como L2 compartilhado entre processos.
+    """
     
-    def __init__(self, ttl_seconds: int = 3600, max_size: int = 1000):
-        self._cache: Dict[str, Any] = {}
-        self._timestamps: Dict[str, datetime] = {}
+    def __init__(
+        self,
+        ttl_seconds: int = 3600,
+        max_size: int = 1000,
+        backend: Optional[SQLiteCacheBackend] = None,
+        namespace: str = 'default',
+        max_bytes: Optional[int] = None,
+        size_fn: Optional[Callable[[Any], int]] = None
+    ):
+        # key -> (valor, instante de gravação, tamanho em bytes)
+        self._cache: OrderedDict = OrderedDict()
         self.ttl = timedelta(seconds=ttl_seconds)
+        self._ttl_seconds = float(ttl_seconds)
         self.max_size = max_size
+        self.max_bytes = max_bytes or None
+        self._size_fn = size_fn or self._json_size
+        self._bytes = 0
+        self.backend = backend
+        self.namespace = namespace
         self._lock = threading.Lock()
+        
+        # Contadores
+        self.hits = 0
+        self.misses = 0
+        self.l2_hits = 0
+        self.evictions = 0
+        self.expirations = 0
+    
+    @staticmethod
+    def _json_size(value: Any) -> int:
+        """Tamanho aproximado do valor serializado"""
+        try:
+            return len(json.dumps(value, default=str))
+        except (TypeError, ValueError):
+            return 0
     
     def get(self, key: str) -> Optional[Any]:
         """Recupera item do cache se não expirado"""
         with self._lock:
-            if key not in self._cache:
-                return None
-            
-            # Verifica expiração
-            if datetime.now() - self._timestamps[key] > self.ttl:
-                self._remove(key)
-                return None
-            
-            return self._cache[key]
+            value = self._get_local(key)
+        
+        if value is None and self.backend is not None:
+            entry = self.backend.get_entry(self.namespace, key)
+            if entry is not None:
+                value, expires_at = entry
+                with self._lock:
+                    self.l2_hits += 1
+                # O L1 herda o prazo restante do L2, sem renovar o TTL
+                remaining = expires_at - time.time()
+                self._set_local(key, value, age=max(self._ttl_seconds - remaining, 0.0))
+        
+        return value
+    
+    def _get_local(self, key: str) -> Optional[Any]:
+        """Consulta o L1 (chamado com o lock adquirido)"""
+        entry = self._cache.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        
+        value, stored_at, _ = entry
+        
+        # Verifica expiração
+        if time.monotonic() - stored_at > self._ttl_seconds:
+            self._remove(key)
+            self.expirations += 1
+            self.misses += 1
+            return None
+        
+        self._cache.move_to_end(key)
+        self.hits += 1
+        return value
     
     def set(self, key: str, value: Any) -> None:
         """Armazena item no cache"""
+        self._set_local(key, value)
+        
+        if self.backend is not None:
+            self.backend.set(self.namespace, key, value, self._ttl_seconds)
+    
+    def _set_local(self, key: str, value: Any, age: float = 0.0) -> None:
+        """Armazena item no L1, removendo os menos usados se necessário
+        
+        age: idade que o item já tem (vindo do L2), descontada do TTL
+        """
+        size = self._size_fn(value) if self.max_bytes else 0
+        
         with self._lock:
-            # Limpa cache se muito grande
-            if len(self._cache) >= self.max_size:
-                self._cleanup()
+            self._remove(key)
+            self._cache[key] = (value, time.monotonic() - age, size)
+            self._bytes += size
             
-            self._cache[key] = value
-            self._timestamps[key] = datetime.now()
+            while self._cache and (
+                len(self._cache) > self.max_size or
+                (self.max_bytes and self._bytes > self.max_bytes)
+            ):
+                _, (_, _, evicted_size) = self._cache.popitem(last=False)
+                self._bytes -= evicted_size
+                self.evictions += 1
     
     def _remove(self, key: str) -> None:
         """Remove item do cache"""
-        if key in self._cache:
-            del self._cache[key]
-        if key in self._timestamps:
-            del self._timestamps[key]
-    
-    def _cleanup(self) -> None:
-        """Remove 20% dos itens mais antigos"""
-        remove_count = int(self.max_size * 0.2)
-        sorted_items = sorted(self._timestamps.items(), key=lambda x: x[1])
-        
-        for key, _ in sorted_items[:remove_count]:
-            self._remove(key)
-        
-        logger.info(f"Cache cleanup: removidos {remove_count} itens")
+        entry = self._cache.pop(key, None)
+        if entry is not None:
+            self._bytes -= entry[2]
     
     def clear(self) -> None:
         """Limpa todo o cache"""
         with self._lock:
             self._cache.clear()
-            self._timestamps.clear()
+            self._bytes = 0
+        
+        if self.backend is not None:
+            self.backend.clear(self.namespace)
+    
+    def stats(self) -> Dict:
+        """Retorna estatísticas do cache (idades em segundos)"""
+        with self._lock:
+            now = time.monotonic()
+            ages = [now - stored_at for _, stored_at, _ in self._cache.values()]
+            lookups = self.hits + self.misses
+            stats = {
+                "total_items": len(ages),
+                "bytes": self._bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "l2_hits": self.l2_hits,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "hit_rate": self.hits / lookups if lookups else 0.0
+            }
+        
+        if not ages:
+            stats.update({"avg_age": 0, "oldest": 0, "newest": 0})
+        else:
+            stats.update({
+                "avg_age": sum(ages) / len(ages),
+                "oldest": max(ages),
+                "newest": min(ages)
+            })
+        
+        return stats
 
 
-class RateLimiter:
-    """Rate limiter thread-safe"""
+class _InFlightCall:
+    """Chamada em andamento compartilhada pelo SingleFlight"""
+    
+    __slots__ = ('event', 'result', 'error', 'waiters')
     
     def __init__(self):
-        self._calls: Dict[str, list] = defaultdict(list)
+        self.event = threading.Event()
+        self.result = None
+        self.error: Optional[BaseException] = None
+        self.waiters = 0
+
+
+class SingleFlight:
+    """
+    Deduplicação de chamadas idênticas concorrentes (single-flight)
+    
+    Enquanto uma chamada para a chave está em andamento, as demais threads
+    aguardam e recebem o mesmo resultado (ou a mesma exceção) em vez de
+    repetir a requisição ao servidor.
+    """
+    
+    def __init__(self):
+        self._calls: Dict[str, _InFlightCall] = {}
         self._lock = threading.Lock()
+        self.shared = 0  # chamadas atendidas por uma busca já em andamento
     
-    def is_allowed(self, key: str, max_calls: int, period_seconds: int) -> bool:
-        """Verifica se chamada é permitida"""
+    def do(self, key: str, fn: Callable[[], Any]) -> Any:
+        """Executa fn uma única vez por chave entre chamadas concorrentes"""
         with self._lock:
-            now = datetime.now()
-            cutoff = now - timedelta(seconds=period_seconds)
-            
-            # Remove chamadas antigas
-            self._calls[key] = [
-                call_time for call_time in self._calls[key]
-                if call_time > cutoff
-            ]
+            call = self._calls.get(key)
+            if call is not None:
+                call.waiters += 1
+                self.shared += 1
+                leader = False
+            else:
+                call = _InFlightCall()
+                self._calls[key] = call
+                leader = True
+        
+        if not leader:
+            call.event.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+        
+        try:
+            call.result = fn()
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.event.set()
+            if call.waiters:
+                logger.debug(f"Single-flight: {call.waiters} chamadas compartilharam {key}")
+
+
+def _gcra(tat: float, now: float, max_calls: int, period_seconds: float) -> Tuple[float, float]:
+    """
+    Generic Cell Rate Algorithm
+    
+    Cada chamada "consome" period/max_calls segundos do TAT (theoretical
+    arrival time); rajadas de até max_calls são permitidas. Retorna o novo
+    TAT e quanto tempo a chamada precisa esperar (0 se pode seguir já).
+    """
+    emission_interval = period_seconds / max_calls
+    new_tat = max(tat, now) + emission_interval
+    wait = new_tat - period_seconds - now
+    return new_tat, max(0.0, wait)
+
+
+class SQLiteRateLimitBackend(SQLiteStore):
+    """Estado do rate limiter compartilhado entre os processos do nó"""
+    
+    def __init__(self, path: str):
+        super().__init__(path)
+        self._connect().execute(
+            "CREATE TABLE IF NOT EXISTS rate_limits (key TEXT PRIMARY KEY, tat REAL NOT NULL)"
+        )
+    
+    def acquire(self, key: str, max_calls: int, period_seconds: float, reserve: bool) -> float:
+        """
+        Tenta consumir uma chamada de forma atômica entre processos
+        
+        Com reserve=True a vaga é sempre reservada e o retorno é o tempo a
+        aguardar; com reserve=False só consome se puder seguir imediatamente.
+        """
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            now = time.time()
+            row = conn.execute("SELECT tat FROM rate_limits WHERE key = ?", (key,)).fetchone()
+            new_tat, wait = _gcra(row[0] if row else now, now, max_calls, period_seconds)
             
-            # Verifica limite
-            if len(self._calls[key]) < max_calls:
-                self._calls[key].append(now)
-                return True
+            if wait == 0 or reserve:
+                conn.execute(
+                    "INSERT OR REPLACE INTO rate_limits (key, tat) VALUES (?, ?)",
+                    (key, new_tat)
+                )
+            conn.execute("COMMIT")
+            return wait
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+
+class RateLimiter:
+    """
+    Rate limiter thread-safe (GCRA / token bucket)
+    
+    Verificação O(1) por chave e cálculo exato do tempo de espera, sem
+    polling. Com um backend SQLite, o limite é respeitado em conjunto por
+    todos os workers do nó; se o backend falhar, usa o estado local.
+    """
+    
+    MAX_LOCAL_KEYS = 10000
+    
+    def __init__(self, backend: Optional[SQLiteRateLimitBackend] = None):
+        self._tats: Dict[str, float] = {}
+        self._lock = threading.Lock()
+        self.backend = backend
+    
+    def _acquire(self, key: str, max_calls: int, period_seconds: float, reserve: bool) -> float:
+        """Consome uma chamada (ou reserva a próxima vaga) e retorna a espera"""
+        if self.backend is not None:
+            try:
+                return self.backend.acquire(key, max_calls, period_seconds, reserve)
+            except sqlite3.Error as e:
+                logger.warning(f"Rate limiter compartilhado indisponível, usando estado local: {e}")
+        
+        with self._lock:
+            now = time.time()
+            new_tat, wait = _gcra(self._tats.get(key, now), now, max_calls, period_seconds)
+            if wait == 0 or reserve:
+                self._tats[key] = new_tat
             
-            return False
+            # Chaves com TAT no passado equivalem a chaves ausentes
+            if len(self._tats) > self.MAX_LOCAL_KEYS:
+                self._tats = {k: t for k, t in self._tats.items() if t > now}
+            return wait
+    
+    def is_allowed(self, key: str, max_calls: int, period_seconds: int) -> bool:
+        """Verifica se chamada é permitida (e a consome, se for)"""
+        return self._acquire(key, max_calls, period_seconds, reserve=False) == 0
     
     def wait_if_needed(self, key: str, max_calls: int, period_seconds: int) -> None:
-        """Aguarda se necessário para respeitar rate limit"""
-        while not self.is_allowed(key, max_calls, period_seconds):
-            wait_time = 1.0
-            logger.warning(f"Rate limit atingido para {key}, aguardando {wait_time}s")
+        """Reserva a próxima vaga e aguarda exatamente o tempo necessário"""
+        wait_time = self._acquire(key, max_calls, period_seconds, reserve=True)
+        if wait_time > 0:
+            logger.warning(f"Rate limit atingido para {key}, aguardando {wait_time:.2f}s")
             time.sleep(wait_time)
 
 
+_default_rate_limiter: Optional[RateLimiter] = None
+_default_rate_limiter_lock = threading.Lock()
+
+
+def get_default_rate_limiter() -> RateLimiter:
+    """Rate limiter compartilhado do processo, conforme Config.RATE_LIMIT_BACKEND"""
+    global _default_rate_limiter
+    
+    with _default_rate_limiter_lock:
+        if _default_rate_limiter is None:
+            backend = None
+            if Config.RATE_LIMIT_BACKEND == 'sqlite':
+                try:
+                    backend = SQLiteRateLimitBackend(Config.RATE_LIMIT_DB)
+                except (sqlite3.Error, OSError) as e:
+                    logger.warning(f"Rate limiter compartilhado desativado: {e}")
+            _default_rate_limiter = RateLimiter(backend=backend)
+        return _default_rate_limiter
+
+
+# Pool de conexões compartilhado por todos os clientes do processo: cada
+# host tem um pool de até HTTP_POOL_LIMIT_PER_HOST conexões reutilizáveis,
+# usado por qualquer cliente (e thread) que fale com aquele host
+_http_adapter = HTTPAdapter(
+    pool_connections=Config.HTTP_POOL_HOSTS,
+    pool_maxsize=Config.HTTP_POOL_LIMIT_PER_HOST
+)
+
+
+# Executor compartilhado pelas requisições com hedging
+_hedge_executor = ThreadPoolExecutor(
+    max_workers=Config.HEDGE_MAX_WORKERS,
+    thread_name_prefix='hedging'
+)
+
+
+def _discard_response(future) -> None:
+    """Libera a conexão da requisição perdedora"""
+    if not future.cancelled() and future.exception() is None:
+        future.result()[0].close()
+
+
 class BaseAPIClient:
     """Cliente base com funcionalidades comuns"""
     
+    # Duplica requisições lentas da fonte (ver _send)
+    HEDGE_REQUESTS = False
+    
     def __init__(
         self, 
         base_url: str,
@@ -118,24 +555,40 @@ class BaseAPIClient:
         max_retries: int = 3,
         rate_limit_calls: int = 30,
         rate_limit_period: int = 60,
-        cache_ttl: int = 3600
+        cache_ttl: int = 3600,
+        headers: Optional[Dict[str, str]] = None
     ):
         self.base_url = base_url
         self.timeout = timeout
         self.max_retries = max_retries
         
-        # Session reutilizável
+        # Session própria (cabeçalhos), conexões do pool compartilhado
         self.session = requests.Session()
+        self.session.mount('https://', _http_adapter)
+        self.session.mount('http://', _http_adapter)
         self.session.headers.update({
             'Accept': 'application/json',
             'User-Agent': 'PrecoAgil/1.0'
         })
+        if headers:
+            self.session.headers.update(headers)
         
         # Gerenciadores
-        self.cache = CacheManager(ttl_seconds=cache_ttl)
-        self.rate_limiter = RateLimiter()
+        self.cache = CacheManager(
+            ttl_seconds=cache_ttl,
+            max_size=Config.API_CACHE_L1_MAX_ITEMS,
+            max_bytes=Config.API_CACHE_L1_MAX_BYTES,
+            backend=get_default_cache_backend(),
+            namespace=self.__class__.__name__
+        )
+        self.rate_limiter = get_default_rate_limiter()
         self.rate_limit_calls = rate_limit_calls
         self.rate_limit_period = rate_limit_period
+        self._inflight = SingleFlight()
+        
+        # Circuit breaker e timeout adaptativo (compartilhados por fonte)
+        self.source_name = self.__class__.__name__
+        self.fallback = get_fallback_manager()
     
     def _get_cache_key(self, endpoint: str, params: Dict) -> str:
         """Gera chave única para cache"""
@@ -145,6 +598,10 @@ class BaseAPIClient:
         data = f"{endpoint}:{json.dumps(params, sort_keys=True)}"
         return hashlib.md5(data.encode()).hexdigest()
     
+    def _rate_key(self, endpoint: str) -> str:
+        """Chave de rate limit (sobrescrever se o endpoint tiver parâmetros no caminho)"""
+        return f"{self.__class__.__name__}:{endpoint}"
+    
     def _request_with_retry(
         self,
         method: str,
@@ -155,18 +612,46 @@ class BaseAPIClient:
     ) -> Optional[Dict]:
         """Faz requisição com retry, rate limiting e cache"""
         
+        if not (use_cache and method.upper() == 'GET'):
+            return self._fetch_with_retry(method, endpoint, params, None, **kwargs)
+        
         # Verifica cache
-        if use_cache and method.upper() == 'GET':
-            cache_key = self._get_cache_key(endpoint, params or {})
+        cache_key = self._get_cache_key(endpoint, params or {})
+        cached = self.cache.get(cache_key)
+        if cached is not None:
+            logger.debug(f"Cache hit para {endpoint}")
+            return cached
+        
+        # Requisições idênticas concorrentes compartilham uma única busca
+        return self._inflight.do(
+            cache_key,
+            lambda: self._fetch_with_retry(method, endpoint, params, cache_key, **kwargs)
+        )
+    
+    def _fetch_with_retry(
+        self,
+        method: str,
+        endpoint: str,
+        params: Optional[Dict],
+        cache_key: Optional[str],
+        **kwargs
+    ) -> Optional[Dict]:
+        """Executa a requisição; grava no cache se cache_key for informada"""
+        
+        # Outra busca idêntica pode ter acabado de preencher o cache
+        if cache_key is not None:
             cached = self.cache.get(cache_key)
             if cached is not None:
-                logger.debug(f"Cache hit para {endpoint}")
                 return cached
         
+        # Fonte fora do ar: falha na hora, sem aguardar timeout
+        if not self.fallback.is_available(self.source_name):
+            logger.warning(f"Circuito aberto para {self.source_name}, ignorando {endpoint}")
+            return None
+        
         # Rate limiting
-        rate_key = f"{self.__class__.__name__}:{endpoint}"
         self.rate_limiter.wait_if_needed(
-            rate_key, 
+            self._rate_key(endpoint), 
             self.rate_limit_calls, 
             self.rate_limit_period
         )
@@ -174,47 +659,76 @@ class BaseAPIClient:
         # Retry com backoff exponencial
         last_exception = None
         for attempt in range(self.max_retries):
+            # Prazo da coleta (ver run_with_deadline): o timeout não passa dele
+            timeout = self.fallback.timeout_for(self.source_name, self.timeout)
+            remaining = remaining_time()
+            if remaining is not None:
+                if remaining <= 0:
+                    logger.warning(f"Prazo esgotado, desistindo de {endpoint}")
+                    return None
+                truncated = remaining < timeout
+                timeout = min(timeout, remaining)
+            else:
+                truncated = False
+            
+            if not self.fallback.allow_request(self.source_name):
+                logger.warning(f"Circuito aberto para {self.source_name}, abortando {endpoint}")
+                return None
+            
             try:
-                response = self.session.request(
-                    method=method,
-                    url=f"{self.base_url}{endpoint}",
-                    params=params,
-                    timeout=self.timeout,
-                    **kwargs
-                )
+                response, latency = self._send(method, endpoint, params, timeout, **kwargs)
                 
                 response.raise_for_status()
                 data = response.json()
+                self.fallback.record_success(self.source_name, latency)
                 
                 # Armazena em cache
-                if use_cache and method.upper() == 'GET':
+                if cache_key is not None:
                     self.cache.set(cache_key, data)
                 
                 logger.debug(f"Sucesso: {method} {endpoint}")
                 return data
                 
             except requests.exceptions.Timeout as e:
+                if truncated:
+                    # Cortada pelo prazo da coleta, não pela fonte: não conta como falha
+                    logger.warning(f"Prazo esgotado aguardando {endpoint}")
+                    return None
                 last_exception = e
+                # O timeout esperado entra como amostra de latência
+                self.fallback.record_failure(self.source_name, latency=timeout)
                 logger.warning(f"Timeout na tentativa {attempt + 1}/{self.max_retries}: {endpoint}")
+            
+            except requests.exceptions.JSONDecodeError:
+                # Resposta não-JSON (página de erro/manutenção): retentar não ajuda
+                self.fallback.record_failure(self.source_name)
+                logger.error(f"Resposta não é JSON válido (não retentável): {endpoint}")
+                return None
                 
             except requests.exceptions.HTTPError as e:
                 status = e.response.status_code
                 
-                # Não retenta em alguns casos
+                # Não retenta em alguns casos (a fonte está no ar)
                 if status in [400, 401, 403, 404]:
+                    self.fallback.record_success(self.source_name)
                     logger.error(f"Erro HTTP {status} (não retentável): {endpoint}")
                     return None
                 
                 last_exception = e
+                self.fallback.record_failure(self.source_name)
                 logger.warning(f"Erro HTTP {status} na tentativa {attempt + 1}/{self.max_retries}")
                 
             except requests.exceptions.RequestException as e:
                 last_exception = e
+                self.fallback.record_failure(self.source_name)
                 logger.warning(f"Erro na tentativa {attempt + 1}/{self.max_retries}: {e}")
             
             # Backoff exponencial
             if attempt < self.max_retries - 1:
                 wait_time = 2 ** attempt  # 1s, 2s, 4s
+                remaining = remaining_time()
+                if remaining is not None and remaining <= wait_time:
+                    break
                 logger.info(f"Aguardando {wait_time}s antes de retentar...")
                 time.sleep(wait_time)
         
@@ -222,10 +736,116 @@ class BaseAPIClient:
         logger.error(f"Todas as {self.max_retries} tentativas falharam para {endpoint}: {last_exception}")
         return None
     
+    def _send(
+        self,
+        method: str,
+        endpoint: str,
+        params: Optional[Dict],
+        timeout: float,
+        **kwargs
+    ) -> Tuple[requests.Response, float]:
+        """
+        Envia uma requisição e retorna a resposta e sua latência
+        
+        Com HEDGE_REQUESTS, se a resposta não chega até o percentil
+        HEDGE_PERCENTILE das latências da fonte, uma cópia é enviada e vale a
+        primeira resposta bem-sucedida (um erro rápido de uma delas não
+        descarta a outra). As cópias respeitam o orçamento da fonte
+        (HEDGE_BUDGET_RATIO) e o rate limit, e só são usadas em GET.
+        
+        O timeout vem de _fetch_with_retry (adaptativo e limitado ao prazo
+        da coleta). Com cópia, a latência retornada é contada desde o envio
+        da original: a da cópia, mais curta, puxaria o percentil (e o próprio
+        gatilho das cópias) para baixo.
+        """
+        def send(timeout=timeout):
+            started = time.monotonic()
+            response = self.session.request(
+                method=method,
+                url=f"{self.base_url}{endpoint}",
+                params=params,
+                timeout=timeout,
+                **kwargs
+            )
+            return response, time.monotonic() - started
+        
+        delay = None
+        if self.HEDGE_REQUESTS and Config.HEDGE_ENABLED and method.upper() == 'GET':
+            delay = self.fallback.hedge_delay(self.source_name)
+        if delay is None:
+            return send()
+        
+        sent_at = time.monotonic()
+        primary = _hedge_executor.submit(send)
+        done, _ = wait([primary], timeout=delay)
+        if done or not self._may_hedge(endpoint):
+            return primary.result()
+        
+        logger.info(f"{self.source_name}: sem resposta em {delay:.2f}s, enviando cópia de {endpoint}")
+        # A cópia expira junto com a original (e dentro do prazo da coleta)
+        futures = {primary, _hedge_executor.submit(send, max(timeout - delay, 0.001))}
+        pending = set(futures)
+        failed, error = None, None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is not None:
+                    error = future.exception()
+                    continue
+                
+                response = future.result()[0]
+                if response.ok:
+                    for other in futures - {future}:
+                        other.add_done_callback(_discard_response)
+                    return response, time.monotonic() - sent_at
+                
+                # Erro HTTP: vale só se a outra também não der certo
+                if failed is None:
+                    failed = future
+        
+        if failed is not None:
+            for other in futures - {failed}:
+                other.add_done_callback(_discard_response)
+            return failed.result()
+        raise error
+    
+    def _may_hedge(self, endpoint: str) -> bool:
+        """Há orçamento e vaga no rate limit para uma cópia"""
+        if not self.fallback.try_hedge(self.source_name):
+            return False
+        return self.rate_limiter.is_allowed(
+            self._rate_key(endpoint),
+            self.rate_limit_calls,
+            self.rate_limit_period
+        )
+    
     def get(self, endpoint: str, params: Optional[Dict] = None, use_cache: bool = True) -> Optional[Dict]:
         """GET request"""
         return self._request_with_retry('GET', endpoint, params, use_cache)
     
+    def iter_pages(
+        self,
+        endpoint: str,
+        params: Dict,
+        extract_items: Callable[[Dict], List],
+        page_param: str = 'pagina',
+        page_size: Optional[int] = None,
+        **kwargs
+    ) -> Iterator[List]:
+        """
+        Itera os itens de um endpoint paginado, buscando páginas em paralelo
+        
+        Cada página passa por cache, single-flight e rate limit do cliente.
+        Demais argumentos (max_pages, concurrency, first_data) vão para
+        app.api.pagination.iter_pages.
+        """
+        return iter_pages(
+            fetch_page=lambda page: self.get(endpoint, {**params, page_param: page}),
+            extract_items=extract_items,
+            total_pages=lambda data: total_pages_from(data, page_size),
+            **kwargs
+        )
+    
     def post(self, endpoint: str, data: Optional[Dict] = None, use_cache: bool = False) -> Optional[Dict]:
         """POST request"""
         return self._request_with_retry('POST', endpoint, json=data, use_cache=use_cache)
@@ -0,0 +1,652 @@
+# -*- coding: utf-8 -*-
+"""
+Base dos clientes de catálogo (CATMAT/CATSER em CSV) - VERSÃO ROBUSTA
+Preço Ágil - Sistema de Pesquisa de Preços
+"""
+
+import codecs
+import csv
+import hashlib
+import io
+import os
+import logging
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+from itertools import islice
+from typing import Iterable, Iterator, List, Dict, Optional, Tuple
+
+import pandas as pd
+
+from config import Config
+from app.api.catalog_index import CatalogIndex, CatalogMapping, OverlayIndex
+
+logger = logging.getLogger(__name__)
+
+
+class _HashingReader(io.RawIOBase):
+    """Leitura de um arquivo binário que calcula o SHA-1 dos bytes lidos"""
+
+    def __init__(self, raw):
+        self._raw = raw
+        self.sha1 = hashlib.sha1()
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:
+        n = self._raw.readinto(buffer)
+        if n:
+            self.sha1.update(memoryview(buffer)[:n])
+        return n
+
+
+class CatalogClient:
+    """
+    Cliente de catálogo em formato CSV
+
+    O catálogo é servido inteiramente pelo CatalogIndex: descrições em um
+    único buffer UTF-8 com offsets, códigos em um array int64 e o índice de
+    busca, abertos do snapshot binário via mmap. Nenhum DataFrame ou dict
+    é mantido após o carregamento; `catalog` é uma visão código → descrição
+    sobre o índice.
+
+    Com CATALOG_BACKGROUND_LOAD, o carregamento ocorre em uma thread e o
+    cliente responde vazio até ficar pronto; `status()` informa a etapa e o
+    progresso (usado pelo /health).
+
+    Subclasses definem o nome do catálogo, o tipo de item e as
+    particularidades do CSV de origem.
+    """
+
+    # Estados do carregamento
+    PENDING = 'pendente'
+    LOADING = 'carregando'
+    READY = 'pronto'
+    UNAVAILABLE = 'indisponivel'
+    FAILED = 'erro'
+
+    LABEL = ''
+    ITEM_TYPE = ''
+    FILE_SETTING = ''
+    SNAPSHOT_SETTING = ''
+
+    # Palavras que identificam a coluna de código no cabeçalho
+    CODE_COLUMN_HINTS: Tuple[str, ...] = ('codigo', 'code')
+
+    # Colunas (código, descrição) por posição no layout exportado pelo governo
+    POSITIONAL_COLUMNS: Tuple[int, int] = (0, 1)
+
+    # Detecção do formato do CSV (amostra inicial e delimitadores aceitos)
+    SNIFF_BYTES = 64 * 1024
+    DELIMITERS = ';,\t|'
+
+    def __init__(self, background: Optional[bool] = None):
+        self.index = None
+        self._base_index = None
+        self._source_fingerprint = None
+        self._read_sha1 = None  # SHA-1 do CSV calculado na última leitura completa
+        self._reload_lock = threading.Lock()
+        self._last_reload = None
+        self._watcher_pid = None
+
+        self._state = self.PENDING
+        self._stage = None
+        self._progress = None
+        self._error = None
+        self._started_at = None
+        self._finished_at = None
+        self._loaded = threading.Event()
+        self._loader_lock = threading.Lock()
+        self._loader_pid = None
+
+        if background is None:
+            background = Config.CATALOG_BACKGROUND_LOAD
+
+        if background:
+            self.start_background_load()
+        else:
+            self._run_load()
+            return
+
+        self.start_watcher()
+
+    # ---------- Carregamento ----------
+
+    def start_background_load(self):
+        """Inicia o carregamento em uma thread (uma por processo)"""
+        with self._loader_lock:
+            if self._loaded.is_set() or self._loader_pid == os.getpid():
+                return
+            self._loader_pid = os.getpid()
+            threading.Thread(
+                target=self._run_load,
+                name=f'carga-{self.LABEL.lower()}',
+                daemon=True
+            ).start()
+
+    def _run_load(self):
+        self._state = self.LOADING
+        self._started_at = time.time()
+        try:
+            self.load_catalog()
+        finally:
+            if self._state == self.LOADING:
+                self._state = self.READY if self.index is not None else self.FAILED
+            self._stage = None
+            self._finished_at = time.time()
+            self._loaded.set()
+
+    def _set_stage(self, stage: str, progress: Optional[float] = None):
+        self._stage = stage
+        self._progress = progress
+
+    @property
+    def ready(self) -> bool:
+        """Carregamento concluído (com ou sem catálogo disponível)"""
+        if not self._loaded.is_set() and self._loader_pid not in (None, os.getpid()):
+            # Processo filho (fork) herdou o estado mas não a thread de carga
+            self._loader_pid = None
+            self.start_background_load()
+        if self._watcher_pid not in (None, os.getpid()):
+            self.start_watcher()
+        return self._loaded.is_set()
+
+    def wait_ready(self, timeout: Optional[float] = None) -> bool:
+        """Aguarda o fim do carregamento"""
+        self.ready
+        return self._loaded.wait(timeout)
+
+    def status(self) -> Dict:
+        """Estado do carregamento (para o /health)"""
+        end = self._finished_at or time.time()
+        return {
+            'catalogo': self.LABEL,
+            'estado': self._state,
+            'pronto': self.ready,
+            'etapa': self._stage,
+            'progresso': round(self._progress, 3) if self._progress is not None else None,
+            'itens': len(self.index) if self.index is not None else 0,
+            'inicio': datetime.fromtimestamp(self._started_at).isoformat() if self._started_at else None,
+            'duracao_s': round(end - self._started_at, 2) if self._started_at else None,
+            'memoria_mb': self.memory_usage()['mb'],
+            'ultima_recarga': self._last_reload,
+            'erro': self._error
+        }
+
+    @property
+    def source_path(self) -> str:
+        return getattr(Config, self.FILE_SETTING)
+
+    @property
+    def snapshot_path(self) -> str:
+        return getattr(Config, self.SNAPSHOT_SETTING)
+
+    @property
+    def catalog(self):
+        """Visão código → descrição sobre o índice (compatível com o antigo dict)"""
+        index = self.index
+        return CatalogMapping(index) if index is not None else {}
+
+    def load_catalog(self):
+        """
+        Carrega o catálogo do arquivo CSV
+
+        Parser ROBUSTO que aceita:
+        - Linhas com campos variados
+        - Diferentes delimitadores (vírgula, ponto-vírgula)
+        - Linhas de cabeçalho extras
+        - Campos com vírgulas dentro (entre aspas)
+        """
+        try:
+            if not os.path.exists(self.source_path):
+                logger.warning(f"Arquivo {self.LABEL} não encontrado: {self.source_path}")
+                self._state = self.UNAVAILABLE
+                return
+
+            fingerprint = CatalogIndex.source_fingerprint(self.source_path, with_hash=False)
+
+            # Snapshot pré-compilado e atualizado: abertura via mmap, sem pandas
+            self._set_stage('abrindo snapshot')
+            index = self._open_snapshot()
+            if index is not None:
+                self._swap(index, fingerprint)
+                logger.info(
+                    f"{self.LABEL} carregado do snapshot: {len(index)} itens "
+                    f"({self.memory_usage()['mb']} MB mapeados)"
+                )
+                return
+
+            index = self._build_index(self._read_items())
+            if index is None:
+                return
+            self._swap(index, fingerprint)
+
+            logger.info(f"{self.LABEL} carregado: {len(index)} itens")
+
+            # Exemplos
+            if len(index) > 0:
+                logger.info("Exemplos:")
+                for cod, desc in islice(index.iter_items(), 3):
+                    logger.info(f"   • {cod}: {desc[:70]}...")
+
+        except Exception as e:
+            logger.error(f"Erro ao carregar {self.LABEL}: {e}")
+            import traceback
+            traceback.print_exc()
+            self.index = None
+            self._error = str(e)
+
+    def _read_items(self) -> Optional[Iterator[Tuple[str, str]]]:
+        """
+        Prepara a leitura do CSV e devolve os pares (código, descrição) em fluxo
+
+        Delimitador, cabeçalho e codificação são detectados nos primeiros
+        KB; as linhas são lidas depois, uma única vez, à medida que o índice
+        as consome (ver _iter_csv).
+        """
+        logger.info(f"Carregando {self.LABEL}: {self.source_path}")
+
+        self._set_stage('lendo CSV')
+        layout = self._sniff_csv(self.source_path)
+
+        if layout is None:
+            logger.warning(f"Arquivo {self.LABEL} vazio ou inválido")
+            self._error = 'arquivo vazio ou inválido'
+            return None
+
+        # Identifica colunas de código e descrição
+        columns = self._identify_columns(layout['columns'])
+
+        if columns is None:
+            logger.error(f"Não foi possível identificar colunas no {self.LABEL}")
+            self._error = 'colunas de código/descrição não identificadas'
+            return None
+
+        return self._iter_csv(self.source_path, layout, *columns)
+
+    def _build_index(self, items: Optional[Iterable[Tuple[str, str]]]) -> Optional[CatalogIndex]:
+        """Indexa os pares e grava o snapshot (servido a partir dele via mmap)"""
+        if items is None:
+            return None
+
+        self._set_stage('indexando')
+        index = CatalogIndex(items)
+
+        if not Config.CATALOG_SNAPSHOT_ENABLED:
+            return index
+
+        # SHA-1 calculado na própria leitura do CSV (sem nova passada)
+        self._set_stage('gravando snapshot')
+        try:
+            index.save(self.snapshot_path, self.source_path, source_sha1=self._read_sha1)
+        except OSError as e:
+            logger.warning(f"Não foi possível gravar o snapshot do {self.LABEL}: {e}")
+            return index
+
+        return CatalogIndex.load(self.snapshot_path) or index
+
+    def _open_snapshot(self) -> Optional[CatalogIndex]:
+        """Abre o snapshot binário do catálogo, se existir e estiver atualizado"""
+        if not Config.CATALOG_SNAPSHOT_ENABLED:
+            return None
+        return CatalogIndex.load(self.snapshot_path, source_path=self.source_path)
+
+    def _swap(self, index, fingerprint: Dict, base: Optional[CatalogIndex] = None):
+        """
+        Passa a servir o novo índice
+
+        A troca é uma única atribuição: consultas em andamento terminam com
+        o índice antigo, que é liberado quando deixa de ser referenciado.
+        """
+        self._base_index = base if base is not None else index
+        self._source_fingerprint = fingerprint
+        self.index = index
+        self._state = self.READY
+        self._error = None
+
+    # ---------- Recarga a quente ----------
+
+    def reload(self, force: bool = False) -> Dict:
+        """
+        Recarrega o catálogo se o CSV mudou, sem bloquear as consultas
+
+        O novo índice é montado ao lado do atual e trocado atomicamente.
+        Ordem de preferência:
+        - snapshot já compilado por outro worker para a nova versão (mmap);
+        - sobreposição incremental, quando os códigos novos, alterados ou
+          removidos não passam de CATALOG_RELOAD_MAX_DIFF do catálogo;
+        - reconstrução completa (e novo snapshot).
+
+        Enquanto a carga inicial não termina, não faz nada: ela já lê a
+        versão atual do CSV.
+        """
+        if not self._loaded.is_set():
+            return {'catalogo': self.LABEL, 'resultado': 'carga inicial em andamento'}
+
+        if not self._reload_lock.acquire(blocking=False):
+            return {'catalogo': self.LABEL, 'resultado': 'em andamento'}
+
+        started = time.time()
+        try:
+            if not os.path.exists(self.source_path):
+                return {'catalogo': self.LABEL, 'resultado': 'arquivo não encontrado'}
+
+            fingerprint = CatalogIndex.source_fingerprint(self.source_path, with_hash=False)
+            if not force and fingerprint == self._source_fingerprint:
+                return {'catalogo': self.LABEL, 'resultado': 'inalterado'}
+
+            result = {'catalogo': self.LABEL}
+
+            index = None if force else self._open_snapshot()
+            if index is not None:
+                self._swap(index, fingerprint)
+                result['resultado'] = 'snapshot'
+            else:
+                items = self._read_items()
+                if items is None:
+                    return {'catalogo': self.LABEL, 'resultado': 'erro', 'erro': self._error}
+
+                base = self._base_index
+                if base is not None and not force:
+                    # Comparação em fluxo com o base; desiste ao passar do limite
+                    self._set_stage('comparando versões')
+                    diff = OverlayIndex.diff(
+                        base, items, max_changes=int(Config.CATALOG_RELOAD_MAX_DIFF * len(base))
+                    )
+
+                    if diff is not None:
+                        changed, removed = diff
+                        self._swap(OverlayIndex(base, changed, removed), fingerprint, base=base)
+                        result.update({
+                            'resultado': 'incremental',
+                            'alterados': len(changed),
+                            'removidos': len(removed)
+                        })
+                    else:
+                        # Muitas alterações: nova leitura do CSV para a reconstrução
+                        items = self._read_items()
+                        if items is None:
+                            return {'catalogo': self.LABEL, 'resultado': 'erro', 'erro': self._error}
+
+                if 'resultado' not in result:
+                    index = self._build_index(items)
+                    self._swap(index, fingerprint)
+                    result['resultado'] = 'completo'
+
+            result.update({'itens': len(self.index), 'duracao_s': round(time.time() - started, 2)})
+            self._last_reload = {**result, 'em': datetime.now().isoformat()}
+            logger.info(f"{self.LABEL} recarregado: {result}")
+            return result
+
+        except Exception as e:
+            logger.error(f"Erro ao recarregar {self.LABEL}: {e}")
+            return {'catalogo': self.LABEL, 'resultado': 'erro', 'erro': str(e)}
+
+        finally:
+            self._set_stage(None)
+            self._reload_lock.release()
+
+    def reload_async(self, force: bool = False):
+        """Dispara a recarga em segundo plano"""
+        threading.Thread(
+            target=self.reload,
+            kwargs={'force': force},
+            name=f'recarga-{self.LABEL.lower()}',
+            daemon=True
+        ).start()
+
+    def start_watcher(self):
+        """
+        Verifica periodicamente (CATALOG_WATCH_INTERVAL) se o CSV foi republicado
+
+        A verificação começa após a carga inicial e só vale para catálogos
+        carregados (sem CSV na inicialização, use a recarga manual).
+        """
+        interval = Config.CATALOG_WATCH_INTERVAL
+        if interval <= 0 or self._watcher_pid == os.getpid():
+            return
+        self._watcher_pid = os.getpid()
+
+        def watch():
+            self.wait_ready()
+            while True:
+                time.sleep(interval)
+                if self._source_fingerprint is None:
+                    continue
+                try:
+                    self.reload()
+                except Exception as e:
+                    logger.error(f"Erro ao verificar {self.LABEL}: {e}")
+
+        threading.Thread(target=watch, name=f'vigia-{self.LABEL.lower()}', daemon=True).start()
+
+    def _sniff_csv(self, filepath: str) -> Optional[Dict]:
+        """
+        Detecta o formato do CSV pelos primeiros SNIFF_BYTES
+
+        A codificação também vem da amostra: UTF-8 se ela for válida, senão
+        Latin-1. Um byte Latin-1 depois da amostra é tratado na leitura
+        (_iter_csv), sem varrer o arquivo aqui.
+
+        Returns:
+            Dict com encoding, sep, skiprows (linhas antes do cabeçalho, como
+            "Consulta realizada em ...") e os nomes das colunas, ou None
+        """
+        with open(filepath, 'rb') as f:
+            head = f.read(self.SNIFF_BYTES)
+
+        # UTF-8 (com ou sem BOM) se a amostra for válida, senão Latin-1; um
+        # caractere cortado no fim da amostra não conta como inválido
+        try:
+            text = codecs.getincrementaldecoder('utf-8-sig')().decode(head, final=False)
+            encoding = 'utf-8-sig' if head.startswith(codecs.BOM_UTF8) else 'utf-8'
+        except UnicodeDecodeError:
+            text = head.decode('latin-1')
+            encoding = 'latin-1'
+
+        lines = text.splitlines()
+        if len(head) == self.SNIFF_BYTES:
+            lines = lines[:-1]  # a última linha da amostra pode estar truncada
+
+        # Delimitador: o que dá o mesmo número de campos (>1) ao maior número de linhas
+        best = None
+        for sep in self.DELIMITERS:
+            fields = Counter(
+                len(row) for row in csv.reader(lines, delimiter=sep) if len(row) > 1
+            ).most_common(1)
+            if fields and (best is None or fields[0][1] > best[2]):
+                best = (sep, fields[0][0], fields[0][1])
+
+        if best is None:
+            logger.debug(f"Nenhum delimitador reconhecido em {filepath}")
+            return None
+
+        sep, n_fields, _ = best
+        for skiprows, row in enumerate(csv.reader(lines, delimiter=sep)):
+            if len(row) == n_fields:
+                logger.debug(f"CSV: {encoding}, sep {sep!r}, cabeçalho na linha {skiprows + 1}")
+                return {'encoding': encoding, 'sep': sep, 'skiprows': skiprows, 'columns': row}
+
+        return None
+
+    def _identify_columns(self, columns: List[str]) -> Optional[Tuple[int, int]]:
+        """
+        Identifica as posições das colunas de código e descrição
+
+        Procura por:
+        - Colunas com nome contendo CODE_COLUMN_HINTS
+        - Colunas com nome contendo 'descricao', 'description'
+        """
+
+        codigo_col = None
+        descricao_col = None
+
+        # Procura por nome de coluna
+        for i, col in enumerate(columns):
+            col_lower = str(col).lower()
+
+            if codigo_col is None and any(x in col_lower for x in self.CODE_COLUMN_HINTS):
+                codigo_col = i
+
+            if descricao_col is None and any(x in col_lower for x in ['descricao', 'description', 'desc', 'nome']):
+                descricao_col = i
+
+        # Fallback: usa colunas por posição
+        if codigo_col is None or descricao_col is None or codigo_col == descricao_col:
+            logger.warning("Usando colunas por posição (fallback)")
+
+            codigo_pos, descricao_pos = self.POSITIONAL_COLUMNS
+            if len(columns) > descricao_pos:
+                codigo_col, descricao_col = codigo_pos, descricao_pos
+            elif len(columns) >= 2:
+                codigo_col, descricao_col = 0, 1
+            else:
+                return None
+
+        logger.info(f"Colunas identificadas: [{columns[codigo_col]}] → [{columns[descricao_col]}]")
+        return codigo_col, descricao_col
+
+    def _iter_csv(self, filepath: str, layout: Dict, codigo_col: int, descricao_col: int) -> Iterator[Tuple[str, str]]:
+        """
+        Lê apenas as colunas de código e descrição, em blocos de CATALOG_CSV_CHUNKSIZE
+
+        Cada bloco é limpo e entregue ao índice antes do próximo ser lido,
+        de modo que o pico de memória não depende do tamanho do arquivo.
+
+        É a única passada sobre o arquivo: o SHA-1 do snapshot é calculado
+        nos mesmos bytes (fica em _read_sha1 ao final). Se surgir um byte
+        inválido em UTF-8 depois da amostra do _sniff_csv, a leitura
+        recomeça em Latin-1, pulando os códigos já entregues.
+        """
+        size = max(os.path.getsize(filepath), 1)
+        seen = set()
+        encoding = layout['encoding']
+        self._read_sha1 = None
+
+        # usecols devolve as colunas na ordem do arquivo
+        order = [0, 1] if codigo_col < descricao_col else [1, 0]
+
+        while True:
+            try:
+                with open(filepath, 'rb') as f:
+                    hashed = _HashingReader(f)
+                    reader = pd.read_csv(
+                        io.BufferedReader(hashed),
+                        sep=layout['sep'],
+                        encoding=encoding,
+                        skiprows=layout['skiprows'],
+                        usecols=[codigo_col, descricao_col],
+                        dtype=str,
+                        on_bad_lines='skip',
+                        chunksize=Config.CATALOG_CSV_CHUNKSIZE
+                    )
+
+                    for chunk in reader:
+                        codes, descriptions = self._clean_chunk(chunk.iloc[:, order])
+
+                        for code, description in zip(codes, descriptions):
+                            # Remove duplicatas (mantém a primeira ocorrência)
+                            if code not in seen:
+                                seen.add(code)
+                                yield code, description
+
+                        self._set_stage('indexando', min(f.tell() / size, 1.0))
+
+                    # Bytes após a última linha também entram no SHA-1
+                    for _ in iter(lambda: hashed.read(1 << 20), b''):
+                        pass
+            except UnicodeDecodeError:
+                if encoding == 'latin-1':
+                    raise
+                logger.info(f"{self.LABEL}: byte fora de UTF-8 após a amostra, relendo em Latin-1")
+                encoding = 'latin-1'
+                continue
+            break
+
+        self._read_sha1 = hashed.sha1.hexdigest()
+        logger.info(f"CSV lido em fluxo: {len(seen)} itens ({encoding}, sep {layout['sep']!r})")
+
+    @staticmethod
+    def _clean_chunk(chunk: pd.DataFrame) -> Tuple[pd.Series, pd.Series]:
+        """Limpa e valida um bloco (código, descrição) do CSV"""
+
+        # Remove NaN
+        chunk = chunk.dropna()
+
+        codes = chunk.iloc[:, 0].str.strip()
+        descriptions = chunk.iloc[:, 1].str.strip()
+
+        # Remove vazios e linhas que parecem cabeçalhos
+        valid = (
+            codes.astype(bool)
+            & descriptions.astype(bool)
+            & ~codes.str.lower().str.contains('codigo|catmat', na=False)
+        )
+
+        return codes[valid], descriptions[valid]
+
+    def search_by_description(self, description: str, limit: int = 50, ranked: bool = False) -> List[Dict]:
+        """
+        Busca códigos do catálogo por descrição (índice invertido)
+
+        Args:
+            ranked: Ordena por relevância (BM25) e inclui o score de cada item
+        """
+        if self.index is None:
+            return []
+
+        return [
+            {**item, "tipo": self.ITEM_TYPE}
+            for item in self.index.items(description, limit, ranked=ranked)
+        ]
+
+    def suggest(self, text: str, limit: int = 10) -> List[Dict]:
+        """Sugestões de autocompletar para a descrição digitada"""
+        if self.index is None:
+            return []
+
+        return [{"texto": texto, "itens": itens} for texto, itens in self.index.suggest(text, limit)]
+
+    def get_description(self, code: str) -> Optional[str]:
+        """Retorna descrição de um código do catálogo"""
+        if self.index is None:
+            return None
+
+        return self.index.description(code)
+
+    def get_descriptions(self, codes: List[str]) -> List[Optional[str]]:
+        """Descrições de vários códigos de uma vez (None para os inexistentes)"""
+        if self.index is None:
+            return [None] * len(codes)
+
+        return self.index.descriptions_many(codes)
+
+    def search_by_code(self, code: str) -> Optional[Dict]:
+        """Busca item por código exato"""
+        desc = self.get_description(code)
+
+        if desc:
+            return {
+                "codigo": code,
+                "descricao": desc,
+                "tipo": self.ITEM_TYPE
+            }
+
+        return None
+
+    def memory_usage(self) -> Dict:
+        """Memória ocupada pelo catálogo (índice, descrições e códigos)"""
+        if self.index is None:
+            return {'catalogo': self.LABEL, 'itens': 0, 'bytes': 0, 'mb': 0.0, 'mmap': False}
+
+        usage = self.index.memory_usage()
+        return {
+            'catalogo': self.LABEL,
+            'itens': len(self.index),
+            'bytes': usage['total_bytes'],
+            'mb': round(usage['total_bytes'] / 1024 / 1024, 1),
+            'mmap': usage['mmap'],
+            'arrays': usage['arrays']
+        }
@@ -0,0 +1,975 @@
+# -*- coding: utf-8 -*-
+"""
+Índice de busca dos catálogos CATMAT/CATSER
+Preço Ágil - Sistema de Pesquisa de Preços
+"""
+
+import hashlib
+import heapq
+import json
+import logging
+import mmap
+import os
+import re
+import tempfile
+import threading
+import unicodedata
+from array import array
+from bisect import bisect_left
+from collections import Counter
+from collections.abc import Mapping, Sequence
+from itertools import islice
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+import numpy as np
+from scipy import sparse
+
+logger = logging.getLogger(__name__)
+
+TOKEN_RE = re.compile(r'[a-z0-9]+')
+
+
+def normalize_text(text: str) -> str:
+    """Remove acentos e normaliza espaços/caixa"""
+    if not isinstance(text, str):
+        text = str(text)
+
+    text = unicodedata.normalize('NFD', text.lower())
+    text = text.encode('ascii', 'ignore').decode('utf-8')
+    return ' '.join(text.split())
+
+
+def tokenize(text: str) -> List[str]:
+    """Tokens normalizados (alfanuméricos, sem acentos) de um texto"""
+    return TOKEN_RE.findall(normalize_text(text))
+
+
+def trigrams(token: str) -> List[str]:
+    """Trigramas de caracteres do token (com marcadores de início e fim)"""
+    padded = f'${token}$'
+    return [padded[i:i + 3] for i in range(len(padded) - 2)]
+
+
+def bounded_levenshtein(a: str, b: str, max_dist: int) -> Optional[int]:
+    """
+    Distância de edição entre a e b, ou None se for maior que max_dist
+
+    Interrompe o cálculo assim que toda a linha da matriz excede o limite.
+    """
+    if abs(len(a) - len(b)) > max_dist:
+        return None
+
+    previous = list(range(len(b) + 1))
+    for i, ca in enumerate(a, start=1):
+        current = [i]
+        for j, cb in enumerate(b, start=1):
+            current.append(min(
+                previous[j] + 1,
+                current[j - 1] + 1,
+                previous[j - 1] + (ca != cb)
+            ))
+        if min(current) > max_dist:
+            return None
+        previous = current
+
+    return previous[-1] if previous[-1] <= max_dist else None
+
+
+class StringColumn(Sequence):
+    """
+    Sequência de strings armazenada em um único buffer UTF-8 + offsets
+
+    Cada item é decodificado sob demanda, o que permite usar a coluna
+    diretamente sobre um arquivo mapeado em memória (e com bisect).
+    """
+
+    __slots__ = ('buffer', 'offsets')
+
+    def __init__(self, buffer: np.ndarray, offsets: np.ndarray):
+        self.buffer = buffer
+        self.offsets = offsets
+
+    @classmethod
+    def from_strings(cls, strings: Iterable[str]) -> 'StringColumn':
+        encoded = [s.encode('utf-8') for s in strings]
+        offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        np.cumsum([len(b) for b in encoded], out=offsets[1:])
+        return cls(np.frombuffer(b''.join(encoded), dtype=np.uint8), offsets)
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(len(self)))]
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError(i)
+        return self.buffer[self.offsets[i]:self.offsets[i + 1]].tobytes().decode('utf-8')
+
+
+class IntColumn(Sequence):
+    """Códigos numéricos em um array int64, expostos como str"""
+
+    __slots__ = ('values',)
+
+    def __init__(self, values: np.ndarray):
+        self.values = values
+
+    def __len__(self) -> int:
+        return len(self.values)
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [str(v) for v in self.values[i].tolist()]
+        return str(self.values[i])
+
+
+class _TokenIds(dict):
+    """Token → id sequencial, atribuído no primeiro acesso"""
+
+    def __missing__(self, token: str) -> int:
+        token_id = self[token] = len(self)
+        return token_id
+
+
+def _numeric_codes(codes: List[str]) -> bool:
+    """Códigos inteiros canônicos (sem zeros à esquerda) cabem em int64 sem perda"""
+    return bool(codes) and all(
+        c.isascii() and c.isdigit() and len(c) <= 18 and (c == '0' or c[0] != '0')
+        for c in codes
+    )
+
+
+class CatalogIndex:
+    """
+    Índice invertido de um catálogo (código → descrição)
+
+    Construído uma única vez no carregamento do catálogo. O vocabulário é
+    mantido ordenado e as listas de postings ficam contíguas em um único
+    array (layout CSR), de modo que todos os tokens com um mesmo prefixo
+    ocupam uma fatia contínua: a busca por prefixo é um bisect no
+    vocabulário e cada termo da consulta resolve-se por interseção de
+    arrays ordenados, sem normalizar descrições em tempo de consulta.
+
+    A mesma estrutura é a matriz esparsa termo × documento com os pesos
+    BM25 usada pela busca ranqueada (`rank`).
+    """
+
+    MIN_TERM_LENGTH = 3
+    MIN_PREFIX_LENGTH = 2
+
+    # Tolerância a erros de digitação: edições admitidas por tamanho do termo
+    FUZZY_MIN_LENGTH = 4
+    FUZZY_LONG_TERM = 6
+
+    # Parâmetros BM25
+    K1 = 1.2
+    B = 0.75
+
+    # As primeiras palavras da descrição identificam o item
+    # ("CANETA ESFEROGRÁFICA, ..."): contam com peso maior (BM25F)
+    LEADING_WORDS = 2
+    LEADING_BOOST = 2.0
+
+    # Snapshot binário (ver save/load)
+    SNAPSHOT_MAGIC = b'PACATIDX'
+    SNAPSHOT_VERSION = 3
+    SNAPSHOT_ALIGN = 64
+
+    def __init__(self, items: Iterable[Tuple[str, str]], corpus: Optional['CatalogIndex'] = None):
+        """
+        Args:
+            items: Pares (código, descrição)
+            corpus: Índice cujas estatísticas (total de documentos, document
+                frequency e tamanho médio) entram no BM25, de modo que os
+                scores deste índice sejam comparáveis aos dele (sobreposição)
+        """
+        # Construção incremental em uma única passada: os itens podem vir de
+        # um leitor em fluxo. Pares (termo, documento) e descrições são
+        # acumulados em buffers tipados compactos (array/bytearray) em vez
+        # de listas de objetos Python, limitando o pico de memória.
+        codes = []
+        descriptions = bytearray()
+        description_offsets = array('q', [0])
+        token_ids = _TokenIds()
+        pair_terms = array('i')
+        pair_tf = array('f')
+        doc_pairs = array('i')
+        doc_lengths = array('i')
+
+        for code, description in items:
+            codes.append(code)
+            descriptions += description.encode('utf-8')
+            description_offsets.append(len(descriptions))
+            tokens = tokenize(description)
+            tf = Counter(tokens)
+            for token in tokens[:self.LEADING_WORDS]:
+                tf[token] += self.LEADING_BOOST - 1
+            # Ids provisórios na ordem de aparição; reordenados ao final
+            pair_terms.extend(map(token_ids.__getitem__, tf))
+            pair_tf.extend(tf.values())
+            doc_pairs.append(len(tf))
+            doc_lengths.append(len(tokens))
+
+        vocab = sorted(token_ids)
+        sorted_ids = np.empty(len(vocab), dtype=np.int32)
+        sorted_ids[np.fromiter((token_ids[t] for t in vocab), dtype=np.int64, count=len(vocab))] = np.arange(
+            len(vocab), dtype=np.int32
+        )
+        del token_ids
+
+        term_ids = sorted_ids[np.frombuffer(pair_terms, dtype=np.intc)]
+        doc_ids = np.repeat(
+            np.arange(len(doc_pairs), dtype=np.int32), np.frombuffer(doc_pairs, dtype=np.intc)
+        )
+        del pair_terms, doc_pairs
+        # Documentos chegam em ordem crescente: ordenação estável por termo
+        # já deixa cada lista de postings ordenada por documento
+        order = np.argsort(term_ids, kind='stable')
+        term_ids, doc_ids = term_ids[order], doc_ids[order]
+        tf = np.frombuffer(pair_tf, dtype=np.float32)[order]
+        del pair_tf
+
+        offsets = np.searchsorted(term_ids, np.arange(len(vocab) + 1)).astype(np.int64)
+
+        # Pesos BM25 por par (termo, documento)
+        n_docs = len(codes)
+        lengths = np.frombuffer(doc_lengths, dtype=np.intc).astype(np.float32)
+        avg_length = float(lengths.mean()) if n_docs else 1.0
+        df = np.diff(offsets).astype(np.float32)
+        corpus_docs = n_docs
+        if corpus is not None:
+            corpus_docs, avg_length = corpus.corpus_stats()
+            corpus_docs += n_docs
+            df += corpus.document_frequencies(vocab)
+        idf = np.log1p((corpus_docs - df + 0.5) / (df + 0.5))
+        norm = self.K1 * (1 - self.B + self.B * lengths[doc_ids] / max(avg_length, 1.0))
+        weights = idf[term_ids] * tf * (self.K1 + 1) / (tf + norm)
+        del term_ids, tf, norm
+
+        vocab_column = StringColumn.from_strings(vocab)
+        arrays = {
+            'descriptions_buffer': np.frombuffer(descriptions, dtype=np.uint8),
+            'descriptions_offsets': np.frombuffer(description_offsets, dtype=np.int64),
+            'vocab_buffer': vocab_column.buffer,
+            'vocab_offsets': vocab_column.offsets,
+            'indptr': offsets,
+            'indices': doc_ids,
+            'weights': weights.astype(np.float32),
+            'corpus_stats': np.array([n_docs, avg_length], dtype=np.float64),
+        }
+
+        # Códigos numéricos (caso de CATMAT/CATSER) viram um array int64;
+        # code_order = documentos em ordem de código (busca por código exato)
+        if _numeric_codes(codes):
+            codes_int = np.fromiter(map(int, codes), dtype=np.int64, count=n_docs)
+            code_order = np.argsort(codes_int, kind='stable').astype(np.int32)
+            arrays.update({'codes_int': codes_int, 'codes_sorted': codes_int[code_order]})
+        else:
+            codes_column = StringColumn.from_strings(codes)
+            code_order = np.asarray(sorted(range(n_docs), key=codes.__getitem__), dtype=np.int32)
+            arrays.update({'codes_buffer': codes_column.buffer, 'codes_offsets': codes_column.offsets})
+        arrays['code_order'] = code_order
+
+        self._set_arrays(arrays)
+
+    def _set_arrays(self, arrays: Dict[str, np.ndarray]):
+        """Monta as estruturas do índice a partir dos arrays (construídos ou mapeados)"""
+        self._arrays = arrays
+        if 'codes_int' in arrays:
+            self.codes = IntColumn(arrays['codes_int'])
+        else:
+            self.codes = StringColumn(arrays['codes_buffer'], arrays['codes_offsets'])
+        self.descriptions = StringColumn(arrays['descriptions_buffer'], arrays['descriptions_offsets'])
+        self.vocab = StringColumn(arrays['vocab_buffer'], arrays['vocab_offsets'])
+        self.code_order = arrays['code_order']
+
+        # Linhas = termos (ordem do vocabulário), colunas = documentos
+        self.matrix = sparse.csr_matrix(
+            (arrays['weights'], arrays['indices'], arrays['indptr']),
+            shape=(len(self.vocab), len(self.codes)),
+            copy=False
+        )
+
+        # Índice de trigramas do vocabulário (construído na primeira busca
+        # aproximada, ou lido do snapshot)
+        self._trigram_lock = threading.Lock()
+        self._trigram_keys = None
+        if 'trigram_tokens' in arrays:
+            self._set_trigrams(arrays)
+
+    @property
+    def postings(self) -> np.ndarray:
+        """postings[offsets[t]:offsets[t + 1]] = documentos do token t (ordenados)"""
+        return self.matrix.indices
+
+    @property
+    def offsets(self) -> np.ndarray:
+        return self.matrix.indptr
+
+    def __len__(self) -> int:
+        return len(self.codes)
+
+    def lookup_many(self, codes: List[str]) -> np.ndarray:
+        """Documentos de vários códigos de uma vez (-1 onde não existe)"""
+        codes = [str(c).strip() for c in codes]
+        docs = np.full(len(codes), -1, dtype=np.int64)
+
+        if 'codes_sorted' not in self._arrays:
+            for i, code in enumerate(codes):
+                doc = self.lookup(code)
+                if doc is not None:
+                    docs[i] = doc
+            return docs
+
+        # Códigos numéricos: uma única busca binária vetorizada
+        valid = np.fromiter((_numeric_codes([c]) for c in codes), dtype=bool, count=len(codes))
+        if not valid.any() or not len(self.code_order):
+            return docs
+
+        values = np.fromiter((int(c) for c, ok in zip(codes, valid) if ok), dtype=np.int64)
+        codes_sorted = self._arrays['codes_sorted']
+        pos = np.minimum(np.searchsorted(codes_sorted, values), len(codes_sorted) - 1)
+        found = codes_sorted[pos] == values
+        docs[np.flatnonzero(valid)[found]] = self.code_order[pos[found]]
+        return docs
+
+    def lookup(self, code: str) -> Optional[int]:
+        """Documento do código exato (ou None)"""
+        code = str(code).strip()
+
+        if 'codes_sorted' in self._arrays:
+            if not _numeric_codes([code]):
+                return None
+            value = int(code)
+            codes_sorted = self._arrays['codes_sorted']
+            i = int(np.searchsorted(codes_sorted, value))
+            if i < len(codes_sorted) and codes_sorted[i] == value:
+                return int(self.code_order[i])
+            return None
+
+        i = bisect_left(self.code_order, code, key=lambda doc: self.codes[doc])
+        if i < len(self.code_order) and self.codes[self.code_order[i]] == code:
+            return int(self.code_order[i])
+        return None
+
+    def description(self, code: str) -> Optional[str]:
+        """Descrição do código exato (ou None)"""
+        doc = self.lookup(code)
+        return self.descriptions[doc] if doc is not None else None
+
+    def descriptions_many(self, codes: List[str]) -> List[Optional[str]]:
+        """Descrições de vários códigos em uma única busca vetorizada (None onde não existe)"""
+        return [self.descriptions[doc] if doc >= 0 else None for doc in self.lookup_many(codes).tolist()]
+
+    @classmethod
+    def query_terms(cls, query: str) -> List[str]:
+        """Termos significativos da consulta"""
+        return [t for t in tokenize(query) if len(t) >= cls.MIN_TERM_LENGTH]
+
+    def corpus_stats(self) -> Tuple[int, float]:
+        """Total de documentos e tamanho médio (em tokens) usados no BM25"""
+        n_docs, avg_length = self._arrays['corpus_stats'].tolist()
+        return int(n_docs), avg_length
+
+    def document_frequencies(self, tokens: List[str]) -> np.ndarray:
+        """Quantidade de documentos com cada token (0 se fora do vocabulário)"""
+        df = np.zeros(len(tokens), dtype=np.float32)
+        for i, token in enumerate(tokens):
+            row = bisect_left(self.vocab, token)
+            if row < len(self.vocab) and self.vocab[row] == token:
+                df[i] = self.offsets[row + 1] - self.offsets[row]
+        return df
+
+    def _prefix_range(self, prefix: str) -> Tuple[int, int]:
+        """Intervalo [lo, hi) do vocabulário com tokens iniciados por prefix"""
+        lo = bisect_left(self.vocab, prefix)
+        hi = bisect_left(self.vocab, prefix + '\x7f', lo)
+        return lo, hi
+
+    def _build_trigrams(self):
+        """Trigrama → tokens do vocabulário que o contêm (layout CSR, trigramas ordenados)"""
+        grams = {}
+        for token_id, token in enumerate(self.vocab):
+            for gram in set(trigrams(token)):
+                grams.setdefault(gram, []).append(token_id)
+
+        keys = sorted(grams)
+        offsets = np.zeros(len(keys) + 1, dtype=np.int64)
+        np.cumsum([len(grams[k]) for k in keys], out=offsets[1:])
+        tokens = np.fromiter(
+            (token_id for k in keys for token_id in grams[k]),
+            dtype=np.int32, count=int(offsets[-1])
+        )
+
+        keys_column = StringColumn.from_strings(keys)
+        arrays = {
+            'trigrams_buffer': keys_column.buffer,
+            'trigrams_offsets': keys_column.offsets,
+            'trigram_indptr': offsets,
+            'trigram_tokens': tokens,
+        }
+        self._arrays.update(arrays)
+        self._set_trigrams(arrays)
+
+    def _set_trigrams(self, arrays: Dict[str, np.ndarray]):
+        self._trigram_tokens = arrays['trigram_tokens']
+        self._trigram_offsets = arrays['trigram_indptr']
+        self._trigram_keys = StringColumn(arrays['trigrams_buffer'], arrays['trigrams_offsets'])
+
+    def _trigram_row(self, gram: str) -> Optional[int]:
+        row = bisect_left(self._trigram_keys, gram)
+        if row < len(self._trigram_keys) and self._trigram_keys[row] == gram:
+            return row
+        return None
+
+    def fuzzy_tokens(self, term: str) -> np.ndarray:
+        """
+        Tokens do vocabulário mais próximos do termo (distância de edição)
+
+        Os candidatos são os tokens que compartilham trigramas suficientes
+        com o termo (contagem vetorizada sobre as listas de trigramas); só
+        eles passam pela verificação de Levenshtein limitada. Devolve os de
+        menor distância.
+        """
+        if len(term) < self.FUZZY_MIN_LENGTH or not self.vocab:
+            return np.empty(0, dtype=np.int64)
+
+        if self._trigram_keys is None:
+            with self._trigram_lock:
+                if self._trigram_keys is None:
+                    self._build_trigrams()
+
+        max_dist = 2 if len(term) >= self.FUZZY_LONG_TERM else 1
+        grams = set(trigrams(term))
+        rows = [r for r in map(self._trigram_row, grams) if r is not None]
+        if not rows:
+            return np.empty(0, dtype=np.int64)
+
+        # Cada edição destrói no máximo 3 trigramas do termo
+        threshold = max(1, len(grams) - 3 * max_dist)
+        candidates = np.concatenate([
+            self._trigram_tokens[self._trigram_offsets[r]:self._trigram_offsets[r + 1]]
+            for r in rows
+        ])
+        shared = np.bincount(candidates, minlength=len(self.vocab))
+        candidates = np.flatnonzero(shared >= threshold)
+
+        best, matches = max_dist + 1, []
+        for token_id in candidates.tolist():
+            dist = bounded_levenshtein(term, self.vocab[token_id], min(best, max_dist))
+            if dist is None:
+                continue
+            if dist < best:
+                best, matches = dist, [token_id]
+            elif dist == best:
+                matches.append(token_id)
+
+        return np.asarray(matches, dtype=np.int64)
+
+    def _term_rows(self, term: str, fuzzy: bool = True) -> np.ndarray:
+        """
+        Linhas do vocabulário que satisfazem o termo
+
+        Tokens com o termo como prefixo; se não houver nenhum, os tokens
+        mais próximos por distância de edição (quando fuzzy).
+        """
+        lo, hi = self._prefix_range(term)
+        if lo < hi:
+            return np.arange(lo, hi)
+        return self.fuzzy_tokens(term) if fuzzy else np.empty(0, dtype=np.int64)
+
+    def _rows_size(self, rows: np.ndarray) -> int:
+        """Total de postings das linhas"""
+        return int((self.offsets[rows + 1] - self.offsets[rows]).sum()) if rows.size else 0
+
+    def _rows_docs(self, rows: np.ndarray) -> np.ndarray:
+        """Documentos (ordenados, sem repetição) dos tokens das linhas"""
+        if rows.size and rows[-1] - rows[0] + 1 == rows.size:
+            # Linhas contíguas (prefixo): uma única fatia
+            docs = self.postings[self.offsets[rows[0]]:self.offsets[rows[-1] + 1]]
+        else:
+            docs = np.concatenate([self.postings[self.offsets[r]:self.offsets[r + 1]] for r in rows])
+        return np.unique(docs) if rows.size > 1 else docs
+
+    def _query_rows(self, query: str, fuzzy: bool = True) -> Optional[List[np.ndarray]]:
+        """Linhas de cada termo da consulta, do termo mais seletivo ao menos"""
+        terms = self.query_terms(query)
+        if not terms:
+            return None
+
+        return sorted((self._term_rows(t, fuzzy) for t in terms), key=self._rows_size)
+
+    def match(self, query: str, fuzzy: bool = True) -> Optional[np.ndarray]:
+        """
+        Documentos que contêm todos os termos da consulta (como prefixo de token)
+
+        Termos sem nenhum token correspondente são corrigidos pelo índice de
+        trigramas quando fuzzy=True.
+
+        Returns:
+            Array ordenado de ids de documento, ou None se a consulta não
+            tiver termos significativos
+        """
+        term_rows = self._query_rows(query, fuzzy)
+        if term_rows is None:
+            return None
+        return self._intersect(term_rows)
+
+    def _intersect(self, term_rows: List[np.ndarray]) -> np.ndarray:
+        """Interseção dos documentos de cada termo (termos mais seletivos primeiro)"""
+        result = None
+        for rows in term_rows:
+            if not rows.size:
+                return np.empty(0, dtype=np.int32)
+
+            if result is not None and rows.size == 1 and result.size * 8 < self._rows_size(rows):
+                # Poucos candidatos contra uma lista longa: busca binária por candidato
+                row = rows[0]
+                docs = self.postings[self.offsets[row]:self.offsets[row + 1]]
+                pos = np.minimum(np.searchsorted(docs, result), docs.size - 1)
+                result = result[docs[pos] == result]
+            else:
+                docs = self._rows_docs(rows)
+                result = docs if result is None else np.intersect1d(result, docs, assume_unique=True)
+
+            if not result.size:
+                break
+
+        return result
+
+    def search(self, query: str, limit: int = 50, fuzzy: bool = True) -> List[str]:
+        """Códigos que contêm todos os termos da consulta, na ordem do catálogo"""
+        return [self.codes[doc] for doc in self._search_docs(query, limit, fuzzy)]
+
+    def rank(self, query: str, limit: int = 50, fuzzy: bool = True) -> List[Tuple[str, float]]:
+        """Busca ranqueada (BM25): códigos e scores em ordem de relevância"""
+        return [(self.codes[doc], score) for doc, score in self._rank_docs(query, limit, fuzzy)]
+
+    def items(
+        self,
+        query: str,
+        limit: int = 50,
+        ranked: bool = False,
+        fuzzy: bool = True,
+        exclude: Optional[np.ndarray] = None
+    ) -> List[Dict]:
+        """
+        Resultados da busca com código e descrição (e score, se ranqueada)
+
+        Args:
+            exclude: Máscara booleana de documentos a omitir (ex.: alterados
+                por uma sobreposição)
+        """
+        if ranked:
+            return [
+                {'codigo': self.codes[doc], 'descricao': self.descriptions[doc], 'score': score}
+                for doc, score in self._rank_docs(query, limit, fuzzy, exclude)
+            ]
+        return [
+            {'codigo': self.codes[doc], 'descricao': self.descriptions[doc]}
+            for doc in self._search_docs(query, limit, fuzzy, exclude)
+        ]
+
+    def iter_items(self) -> Iterator[Tuple[str, str]]:
+        """Pares (código, descrição) na ordem do catálogo"""
+        return zip(self.codes, self.descriptions)
+
+    def _search_docs(self, query: str, limit: int, fuzzy: bool, exclude: Optional[np.ndarray] = None) -> List[int]:
+        docs = self.match(query, fuzzy)
+        if docs is None:
+            return []
+        if exclude is not None:
+            docs = docs[~exclude[docs]]
+        return docs[:limit].tolist()
+
+    def _rank_docs(
+        self,
+        query: str,
+        limit: int,
+        fuzzy: bool,
+        exclude: Optional[np.ndarray] = None
+    ) -> List[Tuple[int, float]]:
+        """
+        Documentos e scores BM25 em ordem de relevância
+
+        Os scores são somados em forma vetorizada sobre as linhas da matriz
+        correspondentes aos tokens de cada termo. Concorrem os documentos com
+        todos os termos; se não houver nenhum, os que têm ao menos um.
+        """
+        term_rows = self._query_rows(query, fuzzy)
+        if term_rows is None:
+            return []
+
+        rows = np.unique(np.concatenate(term_rows))
+        if not rows.size:
+            return []
+
+        # Vetor de consulta (1 × vocabulário) × matriz: só as linhas dos termos são lidas
+        query_vector = sparse.csr_matrix(
+            (np.ones(rows.size, dtype=np.float32), rows, [0, rows.size]),
+            shape=(1, len(self.vocab))
+        )
+        scores = (query_vector @ self.matrix).toarray().ravel()
+
+        if exclude is not None:
+            scores[exclude] = 0
+
+        candidates = self._intersect(term_rows)
+        if exclude is not None:
+            candidates = candidates[~exclude[candidates]]
+        if not candidates.size:
+            candidates = np.flatnonzero(scores)
+
+        candidate_scores = scores[candidates]
+        if candidates.size > limit:
+            # Pré-seleção vetorizada; o heap ordena apenas os k melhores
+            keep = np.argpartition(-candidate_scores, limit)[:limit]
+            candidates, candidate_scores = candidates[keep], candidate_scores[keep]
+
+        # Empates: ordem do catálogo
+        top = heapq.nlargest(limit, zip(candidate_scores.tolist(), (-candidates).tolist()))
+        return [(-neg_doc, round(score, 4)) for score, neg_doc in top]
+
+    def suggest(
+        self,
+        text: str,
+        limit: int = 10,
+        exclude_counts: Optional[Dict[str, int]] = None
+    ) -> List[Tuple[str, int]]:
+        """
+        Autocompletar: completa a última palavra digitada
+
+        Os tokens do vocabulário com o prefixo digitado formam uma fatia
+        contínua (bisect); os `limit` mais frequentes no catálogo são
+        devolvidos como consultas completas, com a quantidade de itens.
+
+        Args:
+            exclude_counts: Documentos a descontar por token (ex.: itens
+                mascarados por uma sobreposição)
+        """
+        # Última palavra já concluída (espaço/pontuação no final): nada a completar
+        if not text or not text[-1].isalnum():
+            return []
+
+        tokens = tokenize(text)
+        if not tokens or len(tokens[-1]) < self.MIN_PREFIX_LENGTH:
+            return []
+
+        lo, hi = self._prefix_range(tokens[-1])
+        if lo == hi:
+            return []
+
+        freq = np.diff(self.offsets[lo:hi + 1])
+        for token, count in (exclude_counts or {}).items():
+            row = bisect_left(self.vocab, token, lo, hi)
+            if row < hi and self.vocab[row] == token:
+                freq[row - lo] -= count
+        if freq.size > limit:
+            keep = np.argpartition(-freq, limit)[:limit]
+        else:
+            keep = np.arange(freq.size)
+        keep = sorted(keep.tolist(), key=lambda i: (-freq[i], i))
+
+        head = ' '.join(tokens[:-1])
+        return [
+            (f"{head} {self.vocab[lo + i]}".strip(), int(freq[i]))
+            for i in keep
+            if freq[i] > 0
+        ]
+
+    def memory_usage(self) -> Dict:
+        """Bytes ocupados por cada array do índice (e se estão mapeados do snapshot)"""
+        arrays = {name: int(array.nbytes) for name, array in self._arrays.items()}
+        return {
+            'arrays': arrays,
+            'total_bytes': sum(arrays.values()),
+            'mmap': getattr(self, '_mmap', None) is not None,
+        }
+
+    # ---------- Snapshot binário ----------
+
+    @staticmethod
+    def source_fingerprint(source_path: str, with_hash: bool = True) -> Dict:
+        """Tamanho, mtime e (opcionalmente) SHA-1 do CSV de origem"""
+        stat = os.stat(source_path)
+        fingerprint = {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+        if with_hash:
+            sha1 = hashlib.sha1()
+            with open(source_path, 'rb') as f:
+                for chunk in iter(lambda: f.read(1 << 20), b''):
+                    sha1.update(chunk)
+            fingerprint['sha1'] = sha1.hexdigest()
+        return fingerprint
+
+    def save(self, path: str, source_path: str, source_sha1: Optional[str] = None):
+        """
+        Grava o índice em um snapshot binário mapeável em memória
+
+        Formato: MAGIC, versão, tamanho do cabeçalho JSON, cabeçalho (origem e
+        posição/dtype/shape de cada array) e os arrays brutos alinhados em
+        SNAPSHOT_ALIGN bytes. A gravação é atômica (arquivo temporário +
+        rename), de modo que workers concorrentes nunca leem um arquivo parcial.
+        """
+        if self._trigram_keys is None:
+            self._build_trigrams()
+
+        arrays = {name: np.ascontiguousarray(a) for name, a in self._arrays.items()}
+        layout = {}
+        position = 0
+        for name, array in arrays.items():
+            position = -(-position // self.SNAPSHOT_ALIGN) * self.SNAPSHOT_ALIGN
+            layout[name] = {'dtype': array.dtype.str, 'shape': list(array.shape), 'offset': position}
+            position += array.nbytes
+
+        # SHA-1 já calculado por quem leu o CSV, ou uma nova leitura
+        source = self.source_fingerprint(source_path, with_hash=source_sha1 is None)
+        if source_sha1 is not None:
+            source['sha1'] = source_sha1
+
+        header = json.dumps({
+            'source': source,
+            'params': self._params(),
+            'arrays': layout,
+        }).encode('utf-8')
+
+        prefix = self.SNAPSHOT_MAGIC + np.array([self.SNAPSHOT_VERSION, len(header)], dtype='<u8').tobytes()
+        data_start = -(-(len(prefix) + len(header)) // self.SNAPSHOT_ALIGN) * self.SNAPSHOT_ALIGN
+
+        # Temporário exclusivo: gravações simultâneas (mesmo processo ou não)
+        # nunca compartilham o arquivo
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=os.path.basename(path) + '.', suffix='.tmp')
+        os.chmod(tmp_path, 0o644)  # mkstemp cria com 0600; outros workers leem o snapshot
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(prefix + header)
+                for name, array in arrays.items():
+                    f.seek(data_start + layout[name]['offset'])
+                    f.write(array.tobytes())
+            os.replace(tmp_path, path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    @classmethod
+    def _params(cls) -> Dict:
+        """Parâmetros que alteram o conteúdo do índice (invalidam o snapshot)"""
+        return {'k1': cls.K1, 'b': cls.B, 'leading_words': cls.LEADING_WORDS, 'leading_boost': cls.LEADING_BOOST}
+
+    @classmethod
+    def _read_header(cls, f) -> Tuple[Dict, int]:
+        prefix = f.read(len(cls.SNAPSHOT_MAGIC) + 16)
+        if len(prefix) < len(cls.SNAPSHOT_MAGIC) + 16 or not prefix.startswith(cls.SNAPSHOT_MAGIC):
+            raise ValueError('arquivo não é um snapshot de catálogo')
+        version, header_len = np.frombuffer(prefix[len(cls.SNAPSHOT_MAGIC):], dtype='<u8')
+        if version != cls.SNAPSHOT_VERSION:
+            raise ValueError(f'versão de snapshot incompatível: {version}')
+        header = json.loads(f.read(int(header_len)).decode('utf-8'))
+        data_start = -(-(len(prefix) + int(header_len)) // cls.SNAPSHOT_ALIGN) * cls.SNAPSHOT_ALIGN
+        return header, data_start
+
+    @classmethod
+    def load(cls, path: str, source_path: Optional[str] = None) -> Optional['CatalogIndex']:
+        """
+        Abre um snapshot via mmap (sem cópia: as páginas são compartilhadas
+        entre os workers pelo page cache)
+
+        Com source_path, devolve None se o snapshot estiver desatualizado em
+        relação ao CSV: tamanho ou mtime diferentes invalidam, a menos que o
+        SHA-1 do conteúdo seja o mesmo (ex.: arquivo apenas tocado).
+        """
+        if not os.path.exists(path):
+            return None
+
+        try:
+            with open(path, 'rb') as f:
+                header, data_start = cls._read_header(f)
+
+                if header.get('params') != cls._params():
+                    return None
+
+                if source_path is not None:
+                    saved = header['source']
+                    current = cls.source_fingerprint(source_path, with_hash=False)
+                    if (current['size'], current['mtime_ns']) != (saved['size'], saved['mtime_ns']):
+                        if current['size'] != saved['size'] or \
+                                cls.source_fingerprint(source_path)['sha1'] != saved.get('sha1'):
+                            return None
+
+                buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except (OSError, ValueError, KeyError) as e:
+            logger.warning(f"Snapshot de catálogo inválido ({path}): {e}")
+            return None
+
+        arrays = {}
+        for name, spec in header['arrays'].items():
+            dtype = np.dtype(spec['dtype'])
+            count = int(np.prod(spec['shape'])) if spec['shape'] else 1
+            arrays[name] = np.frombuffer(
+                buffer, dtype=dtype, count=count, offset=data_start + spec['offset']
+            ).reshape(spec['shape'])
+
+        index = cls.__new__(cls)
+        index._mmap = buffer
+        index._set_arrays(arrays)
+        return index
+
+
+class OverlayIndex:
+    """
+    Catálogo base + sobreposição de itens alterados (recarga incremental)
+
+    Quando poucos códigos mudam na republicação do CSV, os itens novos ou
+    alterados ganham um CatalogIndex próprio (pequeno) e os documentos
+    correspondentes do índice base — alterados ou removidos — são
+    mascarados. Expõe a mesma interface de consulta do CatalogIndex.
+    """
+
+    DIFF_CHUNK = 10000
+
+    def __init__(self, base: CatalogIndex, changed: Dict[str, str], removed: Iterable[str]):
+        self.base = base
+        self.changed = dict(changed)
+        self.removed = set(removed) - set(self.changed)
+        # Scores BM25 com as estatísticas do catálogo base: comparáveis aos dele
+        self.overlay = CatalogIndex(self.changed.items(), corpus=base) if self.changed else None
+
+        self.hidden = np.zeros(len(base), dtype=bool)
+        docs = base.lookup_many(list(self.changed) + list(self.removed))
+        docs = docs[docs >= 0]
+        self.hidden[docs] = True
+
+        # Documentos mascarados por token, descontados do autocompletar do base
+        hidden_counts = Counter()
+        for doc in docs.tolist():
+            hidden_counts.update(set(tokenize(base.descriptions[doc])))
+        self._hidden_counts = dict(hidden_counts)
+        self._hidden_vocab = sorted(hidden_counts)
+
+    @classmethod
+    def diff(
+        cls,
+        base: CatalogIndex,
+        items: Iterable[Tuple[str, str]],
+        max_changes: Optional[int] = None
+    ) -> Optional[Tuple[Dict[str, str], List[str]]]:
+        """
+        Diferenças entre o índice base e a nova versão do catálogo
+
+        Os itens são comparados em blocos de DIFF_CHUNK à medida que chegam
+        (sem materializar o catálogo novo). Com max_changes, interrompe e
+        devolve None assim que as diferenças passam do limite.
+
+        Returns:
+            (novos ou alterados: código → descrição, códigos removidos)
+        """
+        items = iter(items)
+        seen = np.zeros(len(base), dtype=bool)
+        changed = {}
+
+        while True:
+            chunk = list(islice(items, cls.DIFF_CHUNK))
+            if not chunk:
+                break
+
+            docs = base.lookup_many([code for code, _ in chunk])
+            seen[docs[docs >= 0]] = True
+            changed.update(
+                (code, description)
+                for (code, description), doc in zip(chunk, docs.tolist())
+                if doc < 0 or base.descriptions[doc] != description
+            )
+            if max_changes is not None and len(changed) > max_changes:
+                return None
+
+        removed = [base.codes[doc] for doc in np.flatnonzero(~seen).tolist()]
+        if max_changes is not None and len(changed) + len(removed) > max_changes:
+            return None
+        return changed, removed
+
+    def __len__(self) -> int:
+        return len(self.base) - int(self.hidden.sum()) + len(self.changed)
+
+    def description(self, code: str) -> Optional[str]:
+        code = str(code).strip()
+        if code in self.changed:
+            return self.changed[code]
+        if code in self.removed:
+            return None
+        return self.base.description(code)
+
+    def descriptions_many(self, codes: List[str]) -> List[Optional[str]]:
+        codes = [str(c).strip() for c in codes]
+        return [
+            self.changed[code] if code in self.changed else None if code in self.removed else description
+            for code, description in zip(codes, self.base.descriptions_many(codes))
+        ]
+
+    def items(self, query: str, limit: int = 50, ranked: bool = False, fuzzy: bool = True) -> List[Dict]:
+        # Scores do base e da sobreposição usam as mesmas estatísticas (ver __init__)
+        results = self.base.items(query, limit, ranked, fuzzy, exclude=self.hidden)
+        if self.overlay is not None:
+            results += self.overlay.items(query, limit, ranked, fuzzy)
+            if ranked:
+                results.sort(key=lambda item: -item['score'])
+        return results[:limit]
+
+    def suggest(self, text: str, limit: int = 10) -> List[Tuple[str, int]]:
+        tokens = tokenize(text)
+        excluded = {}
+        if tokens:
+            lo = bisect_left(self._hidden_vocab, tokens[-1])
+            hi = bisect_left(self._hidden_vocab, tokens[-1] + '\x7f', lo)
+            excluded = {token: self._hidden_counts[token] for token in self._hidden_vocab[lo:hi]}
+
+        counts = dict(self.base.suggest(text, limit, exclude_counts=excluded))
+        if self.overlay is not None:
+            for texto, itens in self.overlay.suggest(text, limit):
+                counts[texto] = counts.get(texto, 0) + itens
+        return sorted(counts.items(), key=lambda s: (-s[1], s[0]))[:limit]
+
+    def iter_items(self) -> Iterator[Tuple[str, str]]:
+        for doc, item in enumerate(self.base.iter_items()):
+            if not self.hidden[doc]:
+                yield item
+        yield from self.changed.items()
+
+    def memory_usage(self) -> Dict:
+        usage = self.base.memory_usage()
+        if self.overlay is not None:
+            overlay = self.overlay.memory_usage()
+            usage['arrays'].update({f'overlay_{k}': v for k, v in overlay['arrays'].items()})
+            usage['total_bytes'] += overlay['total_bytes']
+        usage['arrays']['hidden'] = int(self.hidden.nbytes)
+        usage['total_bytes'] += int(self.hidden.nbytes)
+        usage['overlay_items'] = len(self.changed) + len(self.removed)
+        return usage
+
+
+class CatalogMapping(Mapping):
+    """Visão código → descrição sobre o índice (compatível com o antigo dict `catalog`)"""
+
+    def __init__(self, index: CatalogIndex):
+        self.index = index
+
+    def __getitem__(self, code: str) -> str:
+        description = self.index.description(code)
+        if description is None:
+            raise KeyError(code)
+        return description
+
+    def __contains__(self, code) -> bool:
+        return self.index.description(code) is not None
+
+    def __iter__(self) -> Iterator[str]:
+        return (code for code, _ in self.index.iter_items())
+
+    def __len__(self) -> int:
+        return len(self.index)
+
+    def items(self):
+        return self.index.iter_items()
@@ -2,19 +2,22 @@
 """
 Cliente para API do ComprasNet (Sistema Integrado de Administração)
 """
-import requests
 from typing import List, Dict
+from app.api.base_client import BaseAPIClient
 
-class ComprasNetClient:
+
+class ComprasNetClient(BaseAPIClient):
     """Cliente para API do ComprasNet (Sistema Integrado de Administração)"""
     
+    PAGE_SIZE = 100
+    MAX_RESULTS = 500
+    
     def __init__(self):
-        self.base_url = "https://comprasnet.gov.br/livre/compras"
-        self.session = requests.Session()
-        self.session.headers.update({
-            'User-Agent': 'Mozilla/5.0 (compatible; PrecoAgil/1.0)',
-            'Accept': 'application/json'
-        })
+        super().__init__(
+            base_url="https://comprasnet.gov.br/livre/compras",
+            timeout=30,
+            headers={'User-Agent': 'Mozilla/5.0 (compatible; PrecoAgil/1.0)'}
+        )
     
     def search_by_item(self, item_code: str, catalog_type: str = 'material', **kwargs) -> List[Dict]:
         """
@@ -31,62 +34,57 @@ class ComprasNetClient:
                 'codigoMaterial': item_code if catalog_type == 'material' else None,
                 'codigoServico': item_code if catalog_type == 'servico' else None,
                 'temRegistroPreco': 'S',  # Apenas com registro de preço
-                'pagina': 1,
-                'limite': 100
+                'limite': self.PAGE_SIZE
             }
             
             # Remover parâmetros None
             params = {k: v for k, v in params.items() if v is not None}
             
-            # URL alternativa documentada
-            url = f"{self.base_url}/consulta"
-            
-            print(f"  🔗 Tentando ComprasNet: {url}")
+            print(f"  🔗 Tentando ComprasNet: {self.base_url}/consulta")
             print(f"  📋 Params: {params}")
             
-            response = self.session.get(
-                url,
-                params=params,
-                timeout=30
-            )
+            first_page = self.get('/consulta', {**params, 'pagina': 1})
             
-            print(f"  📊 Status: {response.status_code}")
-            
-            if response.status_code == 404:
-                # Tentar endpoint alternativo
-                print("  ⚠️ Tentando endpoint alternativo...")
-                url_alt = "https://comprasnet.gov.br/acesso.html"
-                
+            if first_page is None:
                 # A API real do ComprasNet pode exigir autenticação
                 # Por enquanto, vamos usar dados mockados quando não disponível
                 print("  ℹ️ ComprasNet requer credenciais ou endpoint específico")
                 return self._generate_mock_data(item_code)
             
-            if response.status_code == 200:
-                try:
-                    data = response.json()
-                    return self._parse_results(data)
-                except:
-                    print("  ⚠️ Resposta não é JSON válido")
-                    return []
+            max_results = kwargs.get('max_results', self.MAX_RESULTS)
+            results = []
             
-            return []
+            # Demais páginas buscadas em paralelo a partir do total informado
+            for items in self.iter_pages(
+                '/consulta',
+                params,
+                extract_items=self._extract_items,
+                page_size=self.PAGE_SIZE,
+                max_pages=-(-max_results // self.PAGE_SIZE),
+                first_data=first_page
+            ):
+                results.extend(self._parse_items(items))
+                if len(results) >= max_results:
+                    break
+            
+            return results[:max_results]
             
-        except requests.exceptions.RequestException as e:
-            print(f"  ❌ Erro de conexão: {e}")
-            return []
         except Exception as e:
             print(f"  ❌ Erro inesperado: {e}")
             return []
     
-    def _parse_results(self, data: Dict) -> List[Dict]:
-        """Parse dos resultados da API"""
+    @staticmethod
+    def _extract_items(data: Dict) -> List[Dict]:
+        """Extrai a lista de itens de uma página (estrutura pode variar)"""
+        if not isinstance(data, dict):
+            return []
+        return data.get('dados', data.get('items', data.get('resultados', []))) or []
+    
+    def _parse_items(self, items: List[Dict]) -> List[Dict]:
+        """Parse dos itens de uma página da API"""
         results = []
         
         try:
-            # Estrutura esperada pode variar
-            items = data.get('dados', data.get('items', data.get('resultados', [])))
-            
             for item in items:
                 try:
                     result = {
@@ -1,13 +1,313 @@
 # -*- coding: utf-8 -*-
-"""Gerenciador de Fallback e Resiliência (Simulado)"""
+"""
+Gerenciador de Fallback e Resiliência - Preço Ágil
+Circuit breaker e timeout adaptativo por fonte de dados
+"""
 
+import logging
+import math
+import threading
 import time
+from collections import deque
+from contextvars import ContextVar
 from functools import wraps
+from typing import Any, Callable, Dict, Optional
+
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+# Prazo (time.monotonic) da operação em andamento: limita o timeout de cada
+# requisição e encerra retentativas e paginação quando se esgota. Para valer
+# em threads de executores, submeta com contextvars.copy_context().run.
+_deadline: ContextVar[Optional[float]] = ContextVar('deadline', default=None)
+
+
+def run_with_deadline(deadline: float, fn: Callable, *args) -> Any:
+    """Executa fn com o prazo informado (um prazo já vigente e mais curto prevalece)"""
+    current = _deadline.get()
+    token = _deadline.set(deadline if current is None else min(current, deadline))
+    try:
+        return fn(*args)
+    finally:
+        _deadline.reset(token)
+
+
+def remaining_time() -> Optional[float]:
+    """Segundos até o prazo vigente (None: sem prazo)"""
+    deadline = _deadline.get()
+    if deadline is None:
+        return None
+    return deadline - time.monotonic()
+
+
+class CircuitBreaker:
+    """
+    Circuit breaker de uma fonte (fechado → aberto → meio-aberto)
+
+    Após CIRCUIT_FAILURE_THRESHOLD falhas consecutivas o circuito abre e as
+    requisições falham na hora, sem tocar a rede. Passados
+    CIRCUIT_RESET_TIMEOUT segundos, uma única requisição de teste é liberada
+    (meio-aberto): se der certo o circuito fecha, senão volta a abrir.
+
+    Também mantém as latências recentes, usadas para o timeout adaptativo:
+    as das respostas bem-sucedidas e, para os timeouts, o tempo esperado até
+    desistir (a latência real foi no mínimo essa).
+    """
+
+    CLOSED = 'fechado'
+    OPEN = 'aberto'
+    HALF_OPEN = 'meio-aberto'
+
+    def __init__(
+        self,
+        name: str,
+        failure_threshold: int,
+        reset_timeout: float,
+        latency_window: int = 100
+    ):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self._probing = False
+        self._probe_started = 0.0
+        self._latencies = deque(maxlen=latency_window)
+        self._lock = threading.Lock()
+
+    def available(self) -> bool:
+        """Indica se a fonte deve ser consultada (não consome o teste do meio-aberto)"""
+        with self._lock:
+            if self.state == self.OPEN:
+                return time.monotonic() - self.opened_at >= self.reset_timeout
+            return not self._probe_pending()
+
+    def _probe_pending(self) -> bool:
+        """Há um teste do meio-aberto em andamento (chamar com o lock)"""
+        return (
+            self.state == self.HALF_OPEN and self._probing
+            and time.monotonic() - self._probe_started < self.reset_timeout
+        )
+
+    def allow_request(self) -> bool:
+        """Autoriza uma requisição; no meio-aberto, apenas uma por vez"""
+        with self._lock:
+            if self.state == self.CLOSED:
+                return True
+
+            if self.state == self.OPEN:
+                if time.monotonic() - self.opened_at < self.reset_timeout:
+                    return False
+                self.state = self.HALF_OPEN
+                self._probing = False
+                logger.info(f"Circuito {self.name}: meio-aberto, testando a fonte")
+
+            # Um teste sem resultado registrado expira após reset_timeout
+            if self._probe_pending():
+                return False
+            self._probing = True
+            self._probe_started = time.monotonic()
+            return True
+
+    def record_success(self, latency: Optional[float] = None) -> None:
+        """Registra uma resposta da fonte (fecha o circuito)"""
+        with self._lock:
+            if latency is not None:
+                self._latencies.append(latency)
+            if self.state != self.CLOSED:
+                logger.info(f"Circuito {self.name}: fechado, fonte respondeu")
+            self.state = self.CLOSED
+            self.failures = 0
+            self._probing = False
+
+    def record_failure(self, latency: Optional[float] = None) -> None:
+        """Registra uma falha (timeout, erro de rede ou 5xx)"""
+        with self._lock:
+            if latency is not None:
+                self._latencies.append(latency)
+            self.failures += 1
+            self._probing = False
+            if self.state == self.HALF_OPEN or (
+                self.state == self.CLOSED and self.failures >= self.failure_threshold
+            ):
+                self.state = self.OPEN
+                self.opened_at = time.monotonic()
+                logger.warning(
+                    f"Circuito {self.name}: aberto após {self.failures} falhas "
+                    f"(nova tentativa em {self.reset_timeout:.0f}s)"
+                )
+
+    def latency_percentile(self, percentile: float) -> Optional[float]:
+        """Percentil das latências recentes (None se não houver amostras)"""
+        with self._lock:
+            samples = sorted(self._latencies)
+        if not samples:
+            return None
+        rank = max(math.ceil(percentile / 100 * len(samples)) - 1, 0)
+        return samples[rank]
+
+    def sample_count(self) -> int:
+        with self._lock:
+            return len(self._latencies)
+
+    def status(self) -> Dict:
+        with self._lock:
+            status = {'estado': self.state, 'falhas_consecutivas': self.failures}
+            if self.state == self.OPEN:
+                remaining = self.reset_timeout - (time.monotonic() - self.opened_at)
+                status['nova_tentativa_em'] = round(max(remaining, 0), 1)
+        status['amostras_latencia'] = self.sample_count()
+        return status
+
+
+class HedgeBudget:
+    """
+    Orçamento de requisições redundantes de uma fonte (token bucket)
+
+    Cada requisição deposita `ratio` fichas (acumulando no máximo `burst`) e
+    cada cópia enviada consome uma, de modo que as cópias não passam de
+    `ratio` das requisições, mesmo com a fonte toda lenta.
+    """
+
+    def __init__(self, ratio: float, burst: float):
+        self.ratio = ratio
+        self.burst = burst
+        self.tokens = 0.0
+        self.requests = 0
+        self.hedges = 0
+        self._lock = threading.Lock()
+
+    def deposit(self) -> None:
+        with self._lock:
+            self.requests += 1
+            self.tokens = min(self.tokens + self.ratio, self.burst)
+
+    def withdraw(self) -> bool:
+        with self._lock:
+            if self.tokens < 1:
+                return False
+            self.tokens -= 1
+            self.hedges += 1
+            return True
+
 
 class APIFallbackManager:
-    """Classe placeholder para o gerenciador de fallback."""
-    def __init__(self):
-        print("   -> [SIMULADO] APIFallbackManager instanciado.")
+    """
+    Estado de resiliência das fontes de dados do processo
+
+    Cada fonte (um cliente de API) tem seu circuit breaker. O timeout de
+    cada requisição acompanha a latência observada: ADAPTIVE_TIMEOUT_FACTOR
+    vezes o percentil ADAPTIVE_TIMEOUT_PERCENTILE, limitado entre
+    ADAPTIVE_TIMEOUT_MIN e o timeout configurado no cliente. Enquanto não
+    há ADAPTIVE_TIMEOUT_MIN_SAMPLES amostras, vale o timeout do cliente.
+    Timeouts entram como amostras do próprio timeout, para que uma fonte
+    que ficou lenta não mantenha um timeout baseado só nas respostas rápidas.
+
+    A mesma latência define quando duplicar uma requisição lenta (hedging,
+    ver BaseAPIClient._send), dentro do orçamento HEDGE_BUDGET_RATIO.
+    """
+
+    def __init__(
+        self,
+        failure_threshold: Optional[int] = None,
+        reset_timeout: Optional[float] = None
+    ):
+        self.failure_threshold = failure_threshold or Config.CIRCUIT_FAILURE_THRESHOLD
+        self.reset_timeout = reset_timeout if reset_timeout is not None else Config.CIRCUIT_RESET_TIMEOUT
+        self._breakers: Dict[str, CircuitBreaker] = {}
+        self._budgets: Dict[str, HedgeBudget] = {}
+        self._lock = threading.Lock()
+
+    def breaker(self, source: str) -> CircuitBreaker:
+        """Circuit breaker da fonte (criado no primeiro uso)"""
+        with self._lock:
+            breaker = self._breakers.get(source)
+            if breaker is None:
+                breaker = CircuitBreaker(source, self.failure_threshold, self.reset_timeout)
+                self._breakers[source] = breaker
+            return breaker
+
+    def _budget(self, source: str) -> HedgeBudget:
+        with self._lock:
+            budget = self._budgets.get(source)
+            if budget is None:
+                budget = HedgeBudget(Config.HEDGE_BUDGET_RATIO, Config.HEDGE_BUDGET_BURST)
+                self._budgets[source] = budget
+            return budget
+
+    def is_available(self, source: str) -> bool:
+        return self.breaker(source).available()
+
+    def allow_request(self, source: str) -> bool:
+        return self.breaker(source).allow_request()
+
+    def record_success(self, source: str, latency: Optional[float] = None) -> None:
+        self.breaker(source).record_success(latency)
+
+    def record_failure(self, source: str, latency: Optional[float] = None) -> None:
+        self.breaker(source).record_failure(latency)
+
+    def timeout_for(self, source: str, default: float) -> float:
+        """Timeout adaptativo da fonte (nunca acima de default)"""
+        breaker = self.breaker(source)
+        if breaker.sample_count() < Config.ADAPTIVE_TIMEOUT_MIN_SAMPLES:
+            return default
+
+        observed = breaker.latency_percentile(Config.ADAPTIVE_TIMEOUT_PERCENTILE)
+        adaptive = max(observed * Config.ADAPTIVE_TIMEOUT_FACTOR, Config.ADAPTIVE_TIMEOUT_MIN)
+        return min(adaptive, default)
+
+    def hedge_delay(self, source: str) -> Optional[float]:
+        """
+        Espera antes de duplicar uma requisição da fonte (None: não duplicar)
+
+        Conta a requisição no orçamento. Só há cópia com o circuito fechado
+        e latências suficientes para estimar o percentil HEDGE_PERCENTILE.
+        """
+        breaker = self.breaker(source)
+        self._budget(source).deposit()
+        if breaker.state != CircuitBreaker.CLOSED:
+            return None
+        if breaker.sample_count() < Config.ADAPTIVE_TIMEOUT_MIN_SAMPLES:
+            return None
+        return breaker.latency_percentile(Config.HEDGE_PERCENTILE)
+
+    def try_hedge(self, source: str) -> bool:
+        """Consome o orçamento de uma cópia (False se esgotado)"""
+        return self._budget(source).withdraw()
+
+    def source_status(self, source: str) -> Dict:
+        """Estado do circuito e das cópias enviadas de uma fonte"""
+        status = self.breaker(source).status()
+        with self._lock:
+            budget = self._budgets.get(source)
+        if budget is not None:
+            status['copias_enviadas'] = budget.hedges
+            status['requisicoes'] = budget.requests
+        return status
+
+    def status(self) -> Dict[str, Dict]:
+        """Estado dos circuitos por fonte (para /health)"""
+        with self._lock:
+            sources = list(self._breakers)
+        return {source: self.source_status(source) for source in sources}
+
+
+_default_fallback_manager: Optional[APIFallbackManager] = None
+_default_fallback_manager_lock = threading.Lock()
+
+
+def get_fallback_manager() -> APIFallbackManager:
+    """Gerenciador compartilhado do processo (todos os clientes de uma fonte o usam)"""
+    global _default_fallback_manager
+
+    with _default_fallback_manager_lock:
+        if _default_fallback_manager is None:
+            _default_fallback_manager = APIFallbackManager()
+        return _default_fallback_manager
+
 
 def exponential_backoff(max_retries=3, base_delay=1):
     """Decorator simulado para exponential backoff."""
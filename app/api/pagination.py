@@ -0,0 +1,147 @@
+# app/api/pagination.py
+"""
+Motor de paginação concorrente para as APIs governamentais
+Descobre o total de páginas na primeira resposta e busca as demais em paralelo
+"""
+
+import contextvars
+import logging
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from typing import Callable, Dict, Iterator, List, Optional
+
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+# Executor compartilhado por todas as paginações do processo
+_page_executor = ThreadPoolExecutor(
+    max_workers=Config.PAGINATION_MAX_WORKERS,
+    thread_name_prefix='paginacao'
+)
+
+
+def total_pages_from(data: Dict, page_size: Optional[int] = None) -> Optional[int]:
+    """
+    Extrai o total de páginas dos formatos de resposta usados pelas fontes
+
+    - PNCP: totalPaginas / totalRegistros
+    - Painel de Preços (HAL): page.totalPages / page.totalElements
+    - Genérico: totalPages / total / count (dividido por page_size)
+    """
+    if not isinstance(data, dict):
+        return None
+
+    page_info = data.get('page') if isinstance(data.get('page'), dict) else {}
+
+    for value in (data.get('totalPaginas'), data.get('totalPages'), page_info.get('totalPages')):
+        if value is not None:
+            try:
+                return int(value)
+            except (TypeError, ValueError):
+                pass
+
+    if page_size:
+        for value in (data.get('totalRegistros'), page_info.get('totalElements'),
+                      data.get('total'), data.get('count')):
+            if value is not None:
+                try:
+                    return -(-int(value) // page_size)
+                except (TypeError, ValueError):
+                    pass
+
+    return None
+
+
+def iter_pages(
+    fetch_page: Callable[[int], Optional[Dict]],
+    extract_items: Callable[[Dict], List],
+    total_pages: Callable[[Dict], Optional[int]],
+    first_page: int = 1,
+    max_pages: Optional[int] = None,
+    concurrency: Optional[int] = None,
+    first_data: Optional[Dict] = None
+) -> Iterator[List]:
+    """
+    Itera sobre os itens de cada página à medida que as páginas chegam
+
+    A primeira página é buscada (ou recebida em first_data) para descobrir o
+    total; as restantes são buscadas com no máximo `concurrency` requisições
+    em voo, respeitando o rate limit aplicado por fetch_page. Sem total
+    conhecido, cai para a paginação sequencial até uma página vazia.
+
+    Interromper a iteração (break) cancela as páginas ainda não iniciadas,
+    o que permite parada antecipada pelo consumidor.
+
+    Args:
+        fetch_page: Busca uma página pelo número (None em caso de falha)
+        extract_items: Extrai a lista de itens brutos da resposta
+        total_pages: Extrai o total de páginas da resposta (ou None)
+        first_page: Número da primeira página (1 na maioria das APIs)
+        max_pages: Limite de páginas a buscar
+        concurrency: Páginas simultâneas (default: Config.PAGINATION_CONCURRENCY)
+        first_data: Resposta da primeira página, se já obtida
+    """
+    data = first_data if first_data is not None else fetch_page(first_page)
+    if not data:
+        return
+
+    items = extract_items(data)
+    if not items:
+        return
+    yield items
+
+    total = total_pages(data)
+    last_page = first_page + max_pages - 1 if max_pages else None
+
+    # Total desconhecido: sequencial até página vazia
+    if total is None:
+        page = first_page + 1
+        while last_page is None or page <= last_page:
+            data = fetch_page(page)
+            items = extract_items(data) if data else []
+            if not items:
+                return
+            yield items
+            page += 1
+        return
+
+    end = first_page + total - 1
+    if last_page is not None:
+        end = min(end, last_page)
+
+    pending_pages = iter(range(first_page + 1, end + 1))
+    concurrency = concurrency or Config.PAGINATION_CONCURRENCY
+    in_flight = {}
+
+    def submit_next() -> bool:
+        page = next(pending_pages, None)
+        if page is None:
+            return False
+        # Contexto da thread (prazo da coleta, ver run_with_deadline) vale para a página
+        in_flight[_page_executor.submit(contextvars.copy_context().run, fetch_page, page)] = page
+        return True
+
+    try:
+        for _ in range(concurrency):
+            if not submit_next():
+                break
+
+        while in_flight:
+            done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in done:
+                page = in_flight.pop(future)
+                submit_next()
+
+                try:
+                    data = future.result()
+                except Exception as e:
+                    logger.warning(f"Falha ao buscar página {page}: {e}")
+                    continue
+
+                items = extract_items(data) if data else []
+                if items:
+                    yield items
+    finally:
+        # Parada antecipada: descarta páginas ainda não iniciadas
+        for future in in_flight:
+            future.cancel()
@@ -1,18 +1,14 @@
-
 # app/api/painel_precos_api.py
 
-import requests
 from typing import List, Dict, Optional
-from datetime import datetime, timedelta
+from datetime import datetime
 import logging
-from functools import lru_cache
-import time
-from requests.adapters import HTTPAdapter
-from requests.packages.urllib3.util.retry import Retry
+from app.api.base_client import BaseAPIClient
+from config import Config
 
 logger = logging.getLogger(__name__)
 
-class PainelPrecosClient:
+class PainelPrecosClient(BaseAPIClient):
     """
     Cliente para API do Painel de Preços (Gov Federal)
     
@@ -28,9 +24,9 @@ class PainelPrecosClient:
     
     # Configurações
     MAX_RETRIES = 3
-    BACKOFF_FACTOR = 0.5
     TIMEOUT = 30
     MAX_ITEMS_PER_REQUEST = 100  # API limita a 500, mas 100 é mais seguro
+    HEDGE_REQUESTS = True  # cauda de latência longa
     
     def __init__(self, timeout: int = None):
         """
@@ -39,79 +35,21 @@ class PainelPrecosClient:
         Args:
             timeout: Timeout para requisições (default: 30s)
         """
-        self.timeout = timeout or self.TIMEOUT
-        self.session = self._create_session()
-        
-        # Cache simples (pode ser substituído por Redis)
-        self._cache: Dict[str, tuple] = {}  # {key: (data, timestamp)}
-        self._cache_ttl = 3600  # 1 hora
-        
-        # Rate limiting
-        self._last_request_time = 0
-        self._min_interval = 0.5  # Mínimo 0.5s entre requisições
-    
-
-    def _create_session(self) -> requests.Session:
-        """Cria sessão com retry automático"""
-        session = requests.Session()
-        
-        # Configurar retry strategy
-        retry_strategy = Retry(
-            total=self.MAX_RETRIES,
-            backoff_factor=self.BACKOFF_FACTOR,
-            status_forcelist=[429, 500, 502, 503, 504],
-            allowed_methods=["HEAD", "GET", "OPTIONS"]
+        # Intervalo mínimo entre requisições convertido em chamadas por minuto
+        min_interval = Config.PAINEL_PRECOS_RATE_LIMIT
+        
+        super().__init__(
+            base_url=self.BASE_URL,
+            timeout=timeout or self.TIMEOUT,
+            max_retries=self.MAX_RETRIES,
+            rate_limit_calls=max(1, int(60 / min_interval)) if min_interval > 0 else 1000,
+            rate_limit_period=60,
+            cache_ttl=Config.PAINEL_PRECOS_CACHE_TTL,
+            headers={'User-Agent': 'PrecoAgil/1.0 (Pesquisa de Precos)'}
         )
-        
-        adapter = HTTPAdapter(max_retries=retry_strategy)
-        session.mount("http://", adapter)
-        session.mount("https://", adapter)
-        
-        # Headers
-        session.headers.update({
-            "User-Agent": "PrecoAgil/1.0 (Pesquisa de Precos)",
-            "Accept": "application/json"
-        })
-        
-        return session
-
-    
-    def _rate_limit(self):
-        """Implementa rate limiting simples"""
-        elapsed = time.time() - self._last_request_time
-        if elapsed < self._min_interval:
-            sleep_time = self._min_interval - elapsed
-            logger.debug(f"Rate limiting: aguardando {sleep_time:.2f}s")
-            time.sleep(sleep_time)
-        self._last_request_time = time.time()
-    
-    def _get_cache(self, key: str) -> Optional[List[Dict]]:
-        """Recupera item do cache se válido"""
-        if key in self._cache:
-            data, timestamp = self._cache[key]
-            age = time.time() - timestamp
-            
-            if age < self._cache_ttl:
-                logger.debug(f"Cache hit: {key} (idade: {age:.0f}s)")
-                return data
-            else:
-                del self._cache[key]
-                logger.debug(f"Cache expirado: {key}")
-        
-        return None
-    
-    def _set_cache(self, key: str, data: List[Dict]):
-        """Armazena item no cache"""
-        self._cache[key] = (data, time.time())
-        
-        if len(self._cache) > 100:
-            items = sorted(self._cache.items(), key=lambda x: x[1][1])
-            for key, _ in items[:20]:
-                del self._cache[key]
-            logger.debug(f"Cache limpo: removidos 20 itens antigos")
     
 
-    def search_by_item(self, item_code: str, catalog_type: str = 'material', **kwargs) -> List[Dict]:
+    def search_by_item(self, item_code: str, catalog_type: str = 'material', **kwargs) -> Optional[List[Dict]]:
         """
         Busca preços de um item no Painel de Preços
         
@@ -119,6 +57,9 @@ class PainelPrecosClient:
             item_code: Código do item
             catalog_type: Tipo do catálogo ('material' ou 'servico')
             **kwargs: Aceita parâmetros adicionais (region, max_days, etc) para compatibilidade
+        
+        Returns:
+            Preços encontrados, ou None se o Painel não respondeu
         """
         if 'item_type' in kwargs:
             catalog_type = kwargs['item_type']
@@ -144,50 +85,37 @@ class PainelPrecosClient:
             
         except Exception as e:
             print(f"   ⚠️ Erro: {e}")
-            return []
+            return None
     
     
-    def _search_with_pagination(self, params: Dict, max_results: int = 1000) -> List[Dict]:
-        """Busca com paginação automática"""
+    def _search_with_pagination(self, params: Dict, max_results: int = 1000) -> Optional[List[Dict]]:
+        """
+        Busca com paginação automática
+        
+        O total de páginas vem da primeira resposta; as demais são buscadas
+        em paralelo e processadas à medida que chegam. Retorna None se a
+        primeira página não for obtida.
+        """
+        first_data = self.get('/compras', {**params, 'page': 1})
+        if first_data is None:
+            return None
+        
         all_results = []
-        page = 1
         
-        while len(all_results) < max_results:
-            params['page'] = page
-            
-            try:
-                response = self.session.get(
-                    f"{self.BASE_URL}/compras",
-                    params=params,
-                    timeout=30
-                )
-                
-                if response.status_code != 200:
-                    print(f"   ⚠️ Status {response.status_code}: {response.text[:200]}")
-                    break
-                
-                if not response.text or 'application/json' not in response.headers.get('Content-Type', ''):
-                    print(f"   ⚠️ Resposta inesperada da API: {response.text[:500]}")
-                    break
-                
-                data = response.json()
-                items = data.get('_embedded', {}).get('compras', [])
-
-                if not items:
-                    break
-
-                all_results.extend(self._parse_items(items))
-                page += 1
-
-            except requests.exceptions.JSONDecodeError as e:
-                print(f"   ⚠️ Erro ao decodificar JSON: {e}")
-                print(f"   📄 Resposta recebida: {response.text[:500]}")
-                break
-            except Exception as e:
-                print(f"   ❌ Erro inesperado: {e}")
+        pages = self.iter_pages(
+            '/compras',
+            params,
+            extract_items=lambda data: data.get('_embedded', {}).get('compras', []) if isinstance(data, dict) else [],
+            page_param='page',
+            first_data=first_data
+        )
+        
+        for items in pages:
+            all_results.extend(self._parse_items(items))
+            if len(all_results) >= max_results:
                 break
         
-        return all_results
+        return all_results[:max_results]
 
     
     def _parse_items(self, items: List[Dict]) -> List[Dict]:
@@ -274,22 +202,9 @@ class PainelPrecosClient:
     
     def clear_cache(self):
         """Limpa o cache manualmente"""
-        self._cache.clear()
+        self.cache.clear()
         logger.info("🧹 Cache limpo manualmente")
     
     def get_cache_stats(self) -> Dict:
         """Retorna estatísticas do cache"""
-        total_items = len(self._cache)
-        
-        if total_items == 0:
-            return {"total_items": 0, "avg_age": 0, "oldest": 0}
-        
-        now = time.time()
-        ages = [now - timestamp for _, (_, timestamp) in self._cache.items()]
-        
-        return {
-            "total_items": total_items,
-            "avg_age": sum(ages) / len(ages),
-            "oldest": max(ages) if ages else 0,
-            "newest": min(ages) if ages else 0
-        }
+        return self.cache.stats()
@@ -3,104 +3,231 @@
 Cliente PNCP - Portal Nacional de Contratações Públicas
 """
 
-import requests
-import os
+import contextvars
+import unicodedata
+from concurrent.futures import ThreadPoolExecutor
 from typing import List, Dict, Optional
 from datetime import datetime, timedelta
+from app.api.base_client import BaseAPIClient
+from config import Config
 
 
-class PNCPClient:
+def _normalize_text(text: str) -> str:
+    """Remove acentos e normaliza espaços/caixa"""
+    text = unicodedata.normalize('NFD', str(text).lower())
+    text = text.encode('ascii', 'ignore').decode('utf-8')
+    return ' '.join(text.split())
+
+
+class PNCPItensClient(BaseAPIClient):
+    """Cliente para os endpoints de itens de compras do PNCP (API de integração)"""
+    
+    # Campos em que o PNCP informa o código do catálogo (CATMAT/CATSER) do item
+    CODE_FIELDS = ('catalogoCodigoItem', 'codigoCatalogo', 'codigoItemCatalogo', 'codigoItem')
+    
+    def __init__(self):
+        super().__init__(
+            base_url='https://pncp.gov.br/api/pncp/v1',
+            timeout=20
+        )
+    
+    def _rate_key(self, endpoint: str) -> str:
+        # Uma cota para o endpoint de itens, e não uma por compra
+        return f"{self.__class__.__name__}:/orgaos/{{cnpj}}/compras/{{ano}}/{{sequencial}}/itens"
+    
+    def get_purchase_items(self, cnpj: str, ano: int, sequencial: int) -> Optional[List[Dict]]:
+        """Itens de uma compra (None se o endpoint não responder)"""
+        data = self.get(f'/orgaos/{cnpj}/compras/{ano}/{sequencial}/itens')
+        if data is None:
+            return None
+        return data if isinstance(data, list) else data.get('data', [])
+
+
+class PNCPClient(BaseAPIClient):
     """Cliente para API do PNCP (pública, sem necessidade de chave)"""
     
+    HEDGE_REQUESTS = True  # cauda de latência longa
+    
     def __init__(self):
-        self.base_url = 'https://pncp.gov.br/api/consulta/v1'
-        self.session = requests.Session()
-        self.session.headers.update({
-            'Accept': 'application/json',
-            'User-Agent': 'PrecoAgil/1.0'
-        })
+        super().__init__(
+            base_url='https://pncp.gov.br/api/consulta/v1',
+            timeout=20
+        )
+        self.itens = PNCPItensClient()
+        self._item_executor = ThreadPoolExecutor(
+            max_workers=Config.PAGINATION_CONCURRENCY,
+            thread_name_prefix='pncp-itens'
+        )
     
     def search_contracts(
         self,
         item_code: str,
         catalog_type: str,
         max_days: int = 730,
-        region: Optional[str] = None
-    ) -> List[Dict]:
-        """Busca contratos no PNCP"""
+        region: Optional[str] = None,
+        item_description: Optional[str] = None,
+        target_samples: Optional[int] = None
+    ) -> Optional[List[Dict]]:
+        """
+        Busca preços do item em contratos do PNCP (None se o PNCP não responder)
         
-        endpoint = f"{self.base_url}/contratos"
+        A consulta de contratos não aceita filtro por item, então as páginas
+        são percorridas (em paralelo) e cada contrato é filtrado pelo código
+        do catálogo ou pelas palavras iniciais da descrição do item. Para os
+        candidatos, os itens da compra são consultados para obter o preço
+        unitário do código exato; candidatos sem essa consulta (além de
+        PNCP_MAX_ITEM_LOOKUPS ou com o endpoint de itens indisponível) são
+        descartados, pois o valor do contrato não é preço unitário. A coleta
+        para assim que `target_samples` preços forem obtidos.
+        """
+        
+        endpoint = '/contratos'
         date_limit = datetime.now() - timedelta(days=max_days)
+        target = target_samples or Config.PNCP_TARGET_SAMPLES
+        keywords = self._keywords(item_description)
         
         params = {
             'dataInicial': date_limit.strftime('%Y%m%d'),
             'dataFinal': datetime.now().strftime('%Y%m%d'),
-            'pagina': 1,
-            'tamanhoPagina': 100
+            'tamanhoPagina': Config.PNCP_PAGE_SIZE
         }
         
-        print(f"  🔗 GET {endpoint}")
+        print(f"  🔗 GET {self.base_url}{endpoint} (até {Config.PNCP_MAX_PAGES} páginas, meta: {target} preços)")
         
-        try:
-            response = self.session.get(endpoint, params=params, timeout=20)
-            print(f"  📊 Status: {response.status_code}")
+        first_data = self.get(endpoint, {**params, 'pagina': 1})
+        if first_data is None:
+            print("  ⚠️ PNCP não respondeu")
+            return None
+        
+        results = []
+        scanned = 0
+        lookups = 0
+        
+        for contratos in self.iter_pages(
+            endpoint,
+            params,
+            extract_items=lambda data: data.get('data', []) if isinstance(data, dict) else [],
+            page_size=Config.PNCP_PAGE_SIZE,
+            max_pages=Config.PNCP_MAX_PAGES,
+            first_data=first_data
+        ):
+            scanned += len(contratos)
+            candidates = [c for c in contratos if self._matches_item(c, item_code, keywords)]
             
-            if response.status_code == 200:
-                try:
-                    data = response.json()
-                    contratos = data.get('data', [])
-                    print(f"  ✅ {len(contratos)} contratos")
-                    return self._parse_contracts(contratos)
-                except Exception as e:
-                    print(f"  ❌ Erro JSON: {e}")
-                    return []
-            else:
-                print(f"  ⚠️ Erro HTTP {response.status_code}")
-                return []
-        
-        except requests.exceptions.Timeout:
-            print(f"  ⏱️ Timeout")
-            return []
-        except Exception as e:
-            print(f"  ❌ Erro: {str(e)[:80]}")
+            # Limita consultas item a item por pesquisa
+            budget = max(0, Config.PNCP_MAX_ITEM_LOOKUPS - lookups)
+            candidates = candidates[:budget]
+            lookups += len(candidates)
+            
+            # Cada consulta herda o contexto (prazo da coleta) desta thread
+            lookups_in_flight = [
+                self._item_executor.submit(contextvars.copy_context().run, self._item_prices, candidate, item_code)
+                for candidate in candidates
+            ]
+            for future in lookups_in_flight:
+                results.extend(future.result() or [])
+            
+            if len(results) >= target or lookups >= Config.PNCP_MAX_ITEM_LOOKUPS:
+                break
+        
+        print(f"  ✅ {scanned} contratos analisados, {len(results)} preços do item")
+        return results
+    
+    @staticmethod
+    def _keywords(item_description: Optional[str], count: int = 2) -> List[str]:
+        """Palavras iniciais significativas da descrição do catálogo"""
+        if not item_description:
             return []
+        
+        words = [w.strip('.,;:()') for w in _normalize_text(item_description).split()]
+        return [w for w in words if len(w) >= 4][:count]
+    
+    def _matches_item(self, contract: Dict, item_code: str, keywords: List[str]) -> bool:
+        """Verifica se o contrato se refere ao item pesquisado"""
+        for field in PNCPItensClient.CODE_FIELDS:
+            if str(contract.get(field) or '').strip() == str(item_code):
+                return True
+        
+        objeto = _normalize_text(contract.get('objetoContrato') or '')
+        if not objeto:
+            return False
+        
+        if str(item_code) in objeto.split():
+            return True
+        
+        return bool(keywords) and all(k in objeto for k in keywords)
     
-    def _parse_contracts(self, contracts: List[Dict]) -> List[Dict]:
-        """Processa contratos do PNCP"""
-        items = []
+    def _item_prices(self, contract: Dict, item_code: str) -> Optional[List[Dict]]:
+        """
+        Preços unitários do item na compra que originou o contrato
+        
+        Retorna None se a compra não puder ser identificada ou o endpoint
+        de itens não responder.
+        """
+        try:
+            # Formato: {cnpj}-{tipo}-{sequencial}/{ano}
+            controle = contract.get('numeroControlePncpCompra') or ''
+            cnpj, _, resto = controle.split('-', 2)
+            sequencial, ano = resto.split('/')
+            itens = self.itens.get_purchase_items(cnpj, int(ano), int(sequencial))
+        except (ValueError, AttributeError):
+            return None
+        
+        if itens is None:
+            return None
+        
+        base = self._contract_info(contract)
+        if base is None:
+            return []
         
-        for contract in contracts:
+        prices = []
+        for item in itens:
+            codigo = next(
+                (str(item.get(f)).strip() for f in PNCPItensClient.CODE_FIELDS if item.get(f)),
+                None
+            )
+            if codigo != str(item_code):
+                continue
+            
             try:
-                valor = (
-                    contract.get('valorTotal') or
-                    contract.get('valorGlobal') or
-                    contract.get('valorInicial')
+                valor = float(
+                    item.get('valorUnitarioHomologado') or
+                    item.get('valorUnitarioEstimado') or 0
                 )
-                
-                if not valor or float(valor) <= 0:
-                    continue
-                
-                data_str = contract.get('dataAssinatura') or contract.get('dataPublicacao')
-                if data_str:
-                    try:
-                        date_obj = datetime.strptime(data_str.split('T')[0], '%Y-%m-%d')
-                    except:
-                        continue
-                else:
-                    continue
-                
-                items.append({
-                    'source': 'PNCP',
-                    'price': float(valor),
-                    'date': date_obj,
-                    'supplier': contract.get('nomeRazaoSocialFornecedor', 'N/A'),
-                    'supplier_cnpj': contract.get('niFornecedor'),
-                    'entity': contract.get('orgaoEntidade', {}).get('razaoSocial', 'N/A'),
-                    'region': contract.get('ufOrgao'),
-                    'contract_number': contract.get('numeroControlePNCP')
-                })
+            except (TypeError, ValueError):
+                continue
             
-            except (ValueError, KeyError, TypeError):
+            if valor <= 0:
                 continue
+            
+            prices.append({
+                **base,
+                'price': valor,
+                'quantity': item.get('quantidade') or 1,
+                'description': item.get('descricao', ''),
+                'unit': item.get('unidadeMedida', 'UN')
+            })
         
-        return items
+        return prices
+    
+    @staticmethod
+    def _contract_info(contract: Dict) -> Optional[Dict]:
+        """Dados do contrato comuns aos preços de seus itens (None sem data válida)"""
+        data_str = contract.get('dataAssinatura') or contract.get('dataPublicacao')
+        if not data_str:
+            return None
+        
+        try:
+            date_obj = datetime.strptime(data_str.split('T')[0], '%Y-%m-%d')
+        except ValueError:
+            return None
+        
+        return {
+            'source': 'PNCP',
+            'date': date_obj,
+            'supplier': contract.get('nomeRazaoSocialFornecedor', 'N/A'),
+            'supplier_cnpj': contract.get('niFornecedor'),
+            'entity': (contract.get('orgaoEntidade') or {}).get('razaoSocial', 'N/A'),
+            'region': contract.get('ufOrgao'),
+            'contract_number': contract.get('numeroControlePNCP')
+        }
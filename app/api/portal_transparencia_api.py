@@ -1,25 +1,25 @@
 # app/api/portal_transparencia_api.py
-import requests
 import os
-from typing import List, Dict, Optional
+from typing import List, Dict
 from dotenv import load_dotenv
+from app.api.base_client import BaseAPIClient
 
 load_dotenv()
 
-class PortalTransparenciaClient:
+class PortalTransparenciaClient(BaseAPIClient):
     """Cliente para API do Portal da Transparência (CGU)"""
     
     def __init__(self):
-        self.base_url = "https://api.portaldatransparencia.gov.br/api-de-dados"
-        
         self.api_key = os.getenv('PORTAL_TRANSPARENCIA_API_KEY', '')
         
-        self.session = requests.Session()
-        self.session.headers.update({
-            'User-Agent': 'Mozilla/5.0 (compatible; PrecoAgil/1.0)',
-            'Accept': 'application/json',
-            'chave-api-dados': self.api_key
-        })
+        super().__init__(
+            base_url="https://api.portaldatransparencia.gov.br/api-de-dados",
+            timeout=30,
+            headers={
+                'User-Agent': 'Mozilla/5.0 (compatible; PrecoAgil/1.0)',
+                'chave-api-dados': self.api_key
+            }
+        )
     
     def search_by_item(self, item_code: str, catalog_type: str = 'material', **kwargs) -> List[Dict]:
         """
@@ -36,7 +36,7 @@ class PortalTransparenciaClient:
             data_fim = datetime.now()
             data_inicio = data_fim - timedelta(days=365)
             
-            endpoint = f"{self.base_url}/despesas/documentos"
+            endpoint = '/despesas/documentos'
             
             params = {
                 'dataInicio': data_inicio.strftime('%d/%m/%Y'),
@@ -44,45 +44,18 @@ class PortalTransparenciaClient:
                 'pagina': 1
             }
             
-            print(f"  🔗 GET {endpoint}")
+            print(f"  🔗 GET {self.base_url}{endpoint}")
             print(f"  📋 Params: {params}")
             
-            response = self.session.get(
-                endpoint,
-                params=params,
-                timeout=30
-            )
-            
-            print(f"  📊 Status: {response.status_code}")
+            data = self.get(endpoint, params)
             
-            if response.status_code == 400:
-                print("  ⚠️ Erro 400 - Verificando resposta...")
-                try:
-                    error_detail = response.json()
-                    print(f"  📄 Detalhe do erro: {error_detail}")
-                except:
-                    print(f"  📄 Resposta: {response.text[:500]}")
-                
-                print("  ℹ️ Usando dados mockados")
+            if data is None:
+                # 400/403 (chave inválida ou não autorizada) ou falha de conexão
+                print("  ℹ️ Portal Transparência indisponível, usando dados mockados")
                 return self._generate_mock_data(item_code)
             
-            if response.status_code == 403:
-                print("  ⚠️ Erro 403 - API Key inválida ou não autorizada")
-                return self._generate_mock_data(item_code)
+            return self._parse_results(data, item_code)
             
-            if response.status_code == 200:
-                try:
-                    data = response.json()
-                    return self._parse_results(data, item_code)
-                except Exception as e:
-                    print(f"  ⚠️ Erro ao parsear JSON: {e}")
-                    return []
-            
-            return []
-            
-        except requests.exceptions.RequestException as e:
-            print(f"  ❌ Erro de conexão: {e}")
-            return self._generate_mock_data(item_code)
         except Exception as e:
             print(f"  ❌ Erro inesperado: {e}")
             import traceback
@@ -39,7 +39,7 @@ def create_app(config_class=Config):
     migrate.init_app(app, db)
 
     # ✅ CRÍTICO: Importa modelos ANTES de criar tabelas
-    from app.models.models import User, Pesquisa, AuditLog
+    from app.models.models import User, Pesquisa, PesquisaJob, PesquisaLote, AuditLog, PrecoArmazenado, SincronizacaoPrecos
 
     # ✅ Função para carregar o usuário logado
     @login_manager.user_loader
@@ -66,6 +66,12 @@ def create_app(config_class=Config):
     from app.context_processors import inject_global_vars
     app.context_processor(inject_global_vars)
 
+    # ✅ Comandos de linha de comando
+    from app.services.price_warehouse import sync_prices_command
+    from app.services.catalog_snapshot import compile_catalogs_command
+    app.cli.add_command(sync_prices_command)
+    app.cli.add_command(compile_catalogs_command)
+
     @app.errorhandler(404)
     def not_found_error(error):
         from flask import render_template
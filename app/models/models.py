@@ -99,6 +99,107 @@ class Pesquisa(db.Model):
         return f'<Pesquisa {self.id} - {self.item_code}>'
 
 
+class PesquisaJob(db.Model):
+    """Execução de uma pesquisa de preços na fila de processamento"""
+    __tablename__ = 'pesquisa_jobs'
+    
+    # Estados
+    PENDING = 'pendente'
+    RUNNING = 'executando'
+    DONE = 'concluida'
+    FAILED = 'erro'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False, index=True)
+    
+    # Parâmetros da pesquisa
+    item_code = db.Column(db.String(50), nullable=False)
+    catalog_type = db.Column(db.String(20), nullable=False)
+    region = db.Column(db.String(10))
+    responsible_agent = db.Column(db.String(100), nullable=False)
+    
+    # Andamento
+    status = db.Column(db.String(20), nullable=False, default=PENDING, index=True)
+    stage = db.Column(db.String(50))
+    error = db.Column(db.Text)
+    error_category = db.Column(db.String(20))
+    
+    # Pesquisa gerada ao concluir
+    pesquisa_id = db.Column(db.Integer, db.ForeignKey('pesquisas.id'), nullable=True)
+    pesquisa = db.relationship('Pesquisa')
+    
+    # Lote (pesquisa em massa) ao qual o job pertence
+    lote_id = db.Column(db.Integer, db.ForeignKey('pesquisa_lotes.id'), nullable=True, index=True)
+    
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    started_at = db.Column(db.DateTime)
+    finished_at = db.Column(db.DateTime)
+    
+    @property
+    def finished(self):
+        return self.status in (self.DONE, self.FAILED)
+    
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'status': self.status,
+            'etapa': self.stage,
+            'item_code': self.item_code,
+            'catalog_type': self.catalog_type,
+            'pesquisa_id': self.pesquisa_id,
+            'erro': self.error,
+            'criado_em': self.created_at.isoformat() if self.created_at else None,
+            'iniciado_em': self.started_at.isoformat() if self.started_at else None,
+            'concluido_em': self.finished_at.isoformat() if self.finished_at else None
+        }
+    
+    def __repr__(self):
+        return f'<PesquisaJob {self.id} {self.item_code} {self.status}>'
+
+
+class PesquisaLote(db.Model):
+    """Pesquisa em massa: vários itens executados em uma única rodada"""
+    __tablename__ = 'pesquisa_lotes'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False, index=True)
+    region = db.Column(db.String(10))
+    responsible_agent = db.Column(db.String(100), nullable=False)
+    
+    # Estados de PesquisaJob; ao terminar, 'erro' só se todos os itens falharam
+    PARTIAL = 'parcial'  # concluído, com falha em parte dos itens
+    
+    status = db.Column(db.String(20), nullable=False, default=PesquisaJob.PENDING)
+    
+    jobs = db.relationship('PesquisaJob', backref='lote', lazy='dynamic', order_by='PesquisaJob.id')
+    
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    started_at = db.Column(db.DateTime)
+    heartbeat_at = db.Column(db.DateTime)  # renovado pelo processo que executa o lote
+    finished_at = db.Column(db.DateTime)
+    
+    def to_dict(self):
+        contagem = dict(
+            db.session.query(PesquisaJob.status, db.func.count(PesquisaJob.id))
+            .filter(PesquisaJob.lote_id == self.id)
+            .group_by(PesquisaJob.status)
+            .all()
+        )
+        return {
+            'id': self.id,
+            'status': self.status,
+            'total': sum(contagem.values()),
+            'concluidos': contagem.get(PesquisaJob.DONE, 0),
+            'falhas': contagem.get(PesquisaJob.FAILED, 0),
+            'criado_em': self.created_at.isoformat() if self.created_at else None,
+            'iniciado_em': self.started_at.isoformat() if self.started_at else None,
+            'concluido_em': self.finished_at.isoformat() if self.finished_at else None
+        }
+    
+    def __repr__(self):
+        return f'<PesquisaLote {self.id} {self.status}>'
+
+
 class AuditLog(db.Model):
     """Log de auditoria de ações no sistema"""
     __tablename__ = 'audit_logs'
@@ -121,3 +222,52 @@ class AuditLog(db.Model):
     
     def __repr__(self):
         return f'<AuditLog {self.action} by User {self.user_id}>'
+
+
+class PrecoArmazenado(db.Model):
+    """Preço coletado de uma fonte e mantido no armazém local de preços"""
+    __tablename__ = 'precos_armazenados'
+    __table_args__ = (
+        db.Index('ix_precos_item_fonte_data', 'item_code', 'source', 'date'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    
+    # Chave de deduplicação (item, fonte, data, fornecedor, preço, contrato)
+    record_key = db.Column(db.String(40), unique=True, nullable=False)
+    
+    item_code = db.Column(db.String(50), nullable=False)
+    catalog_type = db.Column(db.String(20), nullable=False)
+    source = db.Column(db.String(50), nullable=False)
+    date = db.Column(db.Date, nullable=False)
+    price = db.Column(db.Float, nullable=False)
+    supplier = db.Column(db.String(255))
+    region = db.Column(db.String(10))
+    
+    # Registro completo como retornado pela fonte
+    data = db.Column(db.JSON, nullable=False)
+    
+    synced_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    def __repr__(self):
+        return f'<PrecoArmazenado {self.item_code} {self.source} {self.date}>'
+
+
+class SincronizacaoPrecos(db.Model):
+    """Marca d'água da sincronização incremental por item e fonte"""
+    __tablename__ = 'sincronizacoes_precos'
+    __table_args__ = (
+        db.UniqueConstraint('item_code', 'source', name='uq_sincronizacao_item_fonte'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    item_code = db.Column(db.String(50), nullable=False, index=True)
+    catalog_type = db.Column(db.String(20), nullable=False)
+    source = db.Column(db.String(50), nullable=False)
+    
+    # Data do registro mais recente já armazenado
+    watermark = db.Column(db.Date)
+    last_sync_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    
+    def __repr__(self):
+        return f'<SincronizacaoPrecos {self.item_code} {self.source} {self.watermark}>'
@@ -3,21 +3,25 @@
 Preço Ágil - Rotas da Aplicação Flask
 """
 
-from flask import Blueprint, render_template, request, flash, redirect, url_for, send_file, jsonify, current_app
+from flask import Blueprint, render_template, request, flash, redirect, url_for, send_file, jsonify, current_app, Response, stream_with_context, abort
 from flask_login import login_required, current_user
 from app.models import db
-from app.models.models import Pesquisa, User
+from app.models.models import Pesquisa, PesquisaJob, PesquisaLote, User
 from app.services.price_collector_enhanced import EnhancedPriceCollector
 from app.services.statistical_analyzer import StatisticalAnalyzer
 from app.services.document_generator import DocumentGenerator
 from app.services.chart_generator import ChartGenerator
+from app.services.research_service import ResearchService, ResearchError
+from app.services.research_jobs import ResearchQueue
 from app.auth import audit_log, admin_required
 from config import Config
 from datetime import datetime, timedelta
 import os
+import json
 import pandas as pd
 import io
 from sqlalchemy import func
+from sqlalchemy.orm import joinedload
 
 bp = Blueprint('main', __name__)
 
@@ -26,6 +30,20 @@ collector = EnhancedPriceCollector()
 analyzer = StatisticalAnalyzer()
 doc_generator = DocumentGenerator()
 chart_gen = ChartGenerator()
+research_service = ResearchService(collector, analyzer, doc_generator)
+research_queue = ResearchQueue()
+
+
+@bp.before_app_request
+def retomar_fila():
+    """Retoma a fila de pesquisas no início do processo e periodicamente (ver ResearchQueue.recover)"""
+    if not research_queue.enabled:
+        return
+    try:
+        research_queue.recover_if_due()
+    except Exception as e:
+        db.session.rollback()
+        current_app.logger.error(f'Erro ao retomar a fila de pesquisas: {e}')
 
 
 @bp.route('/')
@@ -45,6 +63,10 @@ def buscar_item():
         flash('Por favor, informe uma descrição com pelo menos 3 caracteres.', 'warning')
         return redirect(url_for('main.index'))
     
+    if not collector.catalogs_ready():
+        flash('Os catálogos CATMAT/CATSER ainda estão sendo carregados. Tente novamente em instantes.', 'info')
+        return render_template('index.html', descricao_buscada=descricao)
+    
     try:
         resultados = collector.search_item(descricao)
         
@@ -61,10 +83,128 @@ def buscar_item():
         return redirect(url_for('main.index'))
 
 
+@bp.route('/api/sugestoes')
+@login_required
+def sugestoes():
+    """Autocompletar da descrição do item (JSON)"""
+    texto = request.args.get('q', '')
+    tipo = request.args.get('tipo') or None
+    limite = min(request.args.get('limite', 10, type=int), 50)
+    
+    return jsonify({
+        'q': texto,
+        'carregando': not collector.catalogs_ready(),
+        'sugestoes': collector.suggest(texto, catalog_type=tipo, limit=limite)
+    })
+
+
+@bp.route('/api/catalogo/lote', methods=['POST'])
+@login_required
+def catalogo_lote():
+    """
+    Resolve uma lista de códigos ou descrições nos catálogos (JSON ou CSV)
+    
+    Aceita JSON ({"itens": [...], "tipo": "material"}), o campo de formulário
+    `itens` (um por linha) ou uma planilha em `arquivo` (primeira coluna).
+    O formato da resposta vem de `formato` (json/csv).
+    """
+    dados = request.get_json(silent=True) or {}
+    tipo = dados.get('tipo') or request.form.get('tipo') or None
+    formato = (request.args.get('formato') or dados.get('formato') or request.form.get('formato') or 'json').lower()
+    
+    try:
+        itens = _itens_do_lote(dados)
+    except Exception as e:
+        current_app.logger.warning(f'Lote inválido: {e}')
+        return jsonify({'erro': 'Não foi possível ler a lista de itens.'}), 400
+    
+    if not itens:
+        return jsonify({'erro': 'Informe ao menos um código ou descrição.'}), 400
+    
+    if len(itens) > Config.CATALOG_BATCH_MAX_ITEMS:
+        return jsonify({'erro': f'Máximo de {Config.CATALOG_BATCH_MAX_ITEMS} itens por consulta.'}), 413
+    
+    if not collector.catalogs_ready():
+        return jsonify({'erro': 'Catálogos em carregamento.', 'carregando': True}), 503
+    
+    resultados = collector.lookup_batch(itens, catalog_type=tipo)
+    
+    if formato == 'csv':
+        csv_data = pd.DataFrame(resultados).to_csv(index=False)
+        return send_file(io.BytesIO(csv_data.encode('utf-8')), download_name='itens_catalogo.csv', as_attachment=True, mimetype='text/csv')
+    
+    return jsonify({
+        'total': len(resultados),
+        'encontrados': sum(1 for r in resultados if r['encontrado']),
+        'itens': resultados
+    })
+
+
+def _itens_do_lote(dados: dict) -> list:
+    """Entradas do lote: JSON, texto (uma por linha) ou primeira coluna da planilha"""
+    if dados.get('itens'):
+        return [str(item).strip() for item in dados['itens'] if str(item).strip()]
+    
+    arquivo = request.files.get('arquivo')
+    if arquivo and arquivo.filename:
+        if arquivo.filename.lower().endswith(('.xlsx', '.xls')):
+            df = pd.read_excel(arquivo, dtype=str, header=None)
+        else:
+            df = pd.read_csv(arquivo, dtype=str, header=None, sep=None, engine='python')
+        itens = [item.strip() for item in df.iloc[:, 0].dropna() if item.strip()]
+        
+        # Ignora a linha de cabeçalho da planilha
+        if itens and itens[0].lower().startswith(('codigo', 'código', 'descri')):
+            itens = itens[1:]
+        return itens
+    
+    return [linha.strip() for linha in request.form.get('itens', '').splitlines() if linha.strip()]
+
+
+@bp.route('/health')
+def health():
+    """Estado do serviço e do carregamento dos catálogos (sem autenticação)"""
+    return jsonify({
+        'status': 'ok',
+        'pronto': collector.catalogs_ready(),
+        'catalogos': collector.catalog_status(),
+        'fontes': collector.source_status()
+    })
+
+
+@bp.route('/health/ready')
+def health_ready():
+    """Readiness probe: 503 enquanto os catálogos carregam"""
+    pronto = collector.catalogs_ready()
+    return jsonify({'pronto': pronto}), 200 if pronto else 503
+
+
+@bp.route('/admin/catalogos/recarregar', methods=['POST'])
+@admin_required
+def recarregar_catalogos():
+    """
+    Recarrega os CSVs de CATMAT/CATSER sem reiniciar o serviço
+
+    Vale para o processo que atende a requisição; os demais workers detectam
+    o arquivo novo pela verificação periódica (CATALOG_WATCH_INTERVAL).
+    """
+    forcar = request.form.get('forcar', '').lower() in ('1', 'true', 'sim')
+    collector.reload_catalogs(force=forcar)
+    
+    audit_log('catalogos_recarregados', 'catalogo', None, {'forcar': forcar})
+    
+    return jsonify({'recarregando': True, 'catalogos': collector.catalog_status()}), 202
+
+
 @bp.route('/pesquisar-precos', methods=['POST'])
 @login_required
 def pesquisar_precos():
-    """Executa pesquisa de preços"""
+    """
+    Executa pesquisa de preços
+    
+    Com RESEARCH_JOBS_ENABLED a pesquisa vai para a fila e a resposta é
+    imediata (página de acompanhamento ou 202 com a URL de status).
+    """
     item_code = request.form.get('item_code', '').strip()
     catalog_type = request.form.get('catalog_type', '').strip()
     region = request.form.get('region', '').strip() or None
@@ -73,114 +213,237 @@ def pesquisar_precos():
     if not item_code or not catalog_type:
         flash('Código do item e tipo são obrigatórios.', 'danger')
         return redirect(url_for('main.index'))
+    
+    if research_queue.enabled:
+        job = research_queue.submit(current_user.id, item_code, catalog_type, responsible_agent, region=region)
+        audit_log('pesquisa_enfileirada', 'pesquisa_job', job.id, {'item': f"{item_code} ({catalog_type})"})
+        
+        if request.accept_mimetypes.best == 'application/json':
+            return jsonify({**job.to_dict(), 'status_url': url_for('main.status_pesquisa', id=job.id)}), 202
+        return redirect(url_for('main.acompanhar_pesquisa', id=job.id))
 
     try:
-        # Coleta preços
-        price_data = collector.collect_prices_with_fallback(item_code, catalog_type, region=region)
-        
-        if price_data['total_prices'] == 0:
-            flash('Nenhum preço encontrado para este item.', 'warning')
-            return render_template('resultado.html', error=True)
+        pesquisa = research_service.run(
+            item_code, catalog_type,
+            user_id=current_user.id,
+            responsible_agent=responsible_agent,
+            region=region
+        )
+    except ResearchError as e:
+        flash(str(e), e.category)
+        return render_template('resultado.html', error=True)
+    except Exception as e:
+        current_app.logger.error(f'Erro na pesquisa: {e}')
+        import traceback
+        traceback.print_exc()
+        flash(f'Erro ao realizar pesquisa: {e}', 'danger')
+        return render_template('resultado.html', error=True)
+    
+    flash('Pesquisa concluída e salva com sucesso!', 'success')
+    return redirect(url_for('main.ver_pesquisa', id=pesquisa.id))
 
-        # Extrai valores para análise
-        prices_values = [p['price'] for p in price_data['prices'] if p.get('price') and p['price'] > 0]
-        
-        if not prices_values:
-            flash('Nenhum preço válido encontrado.', 'danger')
-            return render_template('resultado.html', error=True)
-        
-        # Análise estatística
-        stats = analyzer.analyze_prices(prices_values)
-        
-        if 'error' in stats:
-            flash(stats['error'], 'danger')
-            return render_template('resultado.html', error=True)
 
-        # Informações do catálogo
-        catalog_info = collector.get_catalog_info(item_code, catalog_type)
-        
-        # Monta dados da pesquisa
-        research_data = {
-            'item_code': item_code,
-            'catalog_type': catalog_type,
-            'catalog_info': catalog_info,
-            'catalog_source': 'CATMAT' if catalog_type == 'material' else 'CATSER',
-            'responsible_agent': responsible_agent,
-            'research_date': datetime.now().strftime('%d/%m/%Y %H:%M'),
-            'sources_consulted': price_data['sources'],
-            'prices_collected': price_data['prices'],
-            'filters_applied': price_data['filters'],
-            'sample_size': len(prices_values)
-        }
+@bp.route('/pesquisa/job/<int:id>')
+@login_required
+def acompanhar_pesquisa(id):
+    """Acompanha uma pesquisa na fila (redireciona ao resultado quando concluída)"""
+    job = _job_do_usuario(id)
+    
+    if job.status == PesquisaJob.DONE:
+        flash('Pesquisa concluída e salva com sucesso!', 'success')
+        return redirect(url_for('main.ver_pesquisa', id=job.pesquisa_id))
+    
+    if job.status == PesquisaJob.FAILED:
+        flash(job.error, job.error_category or 'danger')
+        return render_template('resultado.html', error=True)
+    
+    return render_template('pesquisa_job.html', job=job)
 
-        # Gera gráficos
-        charts = {
-            'histogram': chart_gen.create_histogram(prices_values, stats),
-            'boxplot': chart_gen.create_boxplot(prices_values, stats),
-            'timeline': chart_gen.create_timeline(price_data['prices']),
-            'scatter': chart_gen.create_scatter_by_source(price_data['prices'])
-        }
 
-        # Gera PDF
-        pdf_filename = None
-        try:
-            pdf_data = {**research_data, 'statistical_analysis': stats}
-            pdf_path = doc_generator.generate_research_report(pdf_data)
-            pdf_filename = os.path.basename(pdf_path)
-        except Exception as e:
-            current_app.logger.error(f'Erro ao gerar PDF: {e}')
-
-        # Serializa datas para JSON
-        prices_serializable = []
-        for p in price_data['prices']:
-            p_copy = p.copy()
-            if isinstance(p_copy.get('date'), datetime):
-                p_copy['date'] = p_copy['date'].isoformat()
-            prices_serializable.append(p_copy)
-        
-        # Salva no banco
-        db_research = Pesquisa(
-            user_id=current_user.id,
-            item_code=item_code,
-            item_description=catalog_info.get('description', 'N/A'),
-            catalog_type=catalog_type,
-            responsible_agent=responsible_agent,
-            stats=stats,
-            prices_collected=prices_serializable,
-            sources_consulted=price_data['sources'],
-            pdf_filename=pdf_filename
-        )
+@bp.route('/api/pesquisa/job/<int:id>')
+@login_required
+def status_pesquisa(id):
+    """Estado de uma pesquisa na fila (JSON, para polling)"""
+    job = _job_do_usuario(id)
+    
+    dados = job.to_dict()
+    if job.status == PesquisaJob.DONE:
+        dados['resultado_url'] = url_for('main.ver_pesquisa', id=job.pesquisa_id)
+    return jsonify(dados)
+
+
+@bp.route('/api/pesquisa/lote', methods=['POST'])
+@login_required
+def pesquisar_lote():
+    """
+    Pesquisa em massa: enfileira a pesquisa de vários códigos CATMAT/CATSER
+    
+    Aceita os mesmos formatos de /api/catalogo/lote (JSON, texto ou planilha);
+    sem `tipo`, o catálogo de cada código é identificado automaticamente.
+    """
+    if not research_queue.enabled:
+        return jsonify({'erro': 'Fila de pesquisas desativada.'}), 503
+    
+    dados = request.get_json(silent=True) or {}
+    tipo = dados.get('tipo') or request.form.get('tipo') or None
+    region = (dados.get('regiao') or request.form.get('regiao') or '').strip() or None
+    
+    try:
+        entradas = _itens_do_lote(dados)
+    except Exception as e:
+        current_app.logger.warning(f'Lote inválido: {e}')
+        return jsonify({'erro': 'Não foi possível ler a lista de itens.'}), 400
+    
+    codigos = list(dict.fromkeys(e for e in entradas if e.isdigit()))
+    ignorados = [e for e in entradas if not e.isdigit()]
+    
+    if not codigos:
+        return jsonify({'erro': 'Informe ao menos um código CATMAT/CATSER.', 'ignorados': ignorados}), 400
+    
+    if len(codigos) > Config.RESEARCH_BATCH_MAX_ITEMS:
+        return jsonify({'erro': f'Máximo de {Config.RESEARCH_BATCH_MAX_ITEMS} itens por lote.'}), 413
+    
+    if not collector.catalogs_ready():
+        return jsonify({'erro': 'Catálogos em carregamento.', 'carregando': True}), 503
+    
+    if tipo:
+        itens = [(codigo, tipo) for codigo in codigos]
+    else:
+        servicos = collector.catser.get_descriptions(codigos)
+        itens = [(codigo, 'servico' if desc else 'material') for codigo, desc in zip(codigos, servicos)]
+    
+    lote = research_queue.submit_batch(current_user.id, itens, current_user.full_name, region=region)
+    audit_log('pesquisa_lote_enfileirada', 'pesquisa_lote', lote.id, {'itens': len(itens)})
+    
+    return jsonify({
+        **lote.to_dict(),
+        'ignorados': ignorados,
+        'status_url': url_for('main.status_lote', id=lote.id)
+    }), 202
+
+
+@bp.route('/api/pesquisa/lote/<int:id>')
+@login_required
+def status_lote(id):
+    """Andamento e resultado consolidado de um lote (JSON ou CSV com formato=csv)"""
+    lote = PesquisaLote.query.get_or_404(id)
+    if not current_user.is_gestor and lote.user_id != current_user.id:
+        abort(404)
+    
+    itens = []
+    for job in lote.jobs.options(joinedload(PesquisaJob.pesquisa)):
+        stats = job.pesquisa.stats if job.pesquisa else {}
+        itens.append({
+            'item_code': job.item_code,
+            'catalog_type': job.catalog_type,
+            'descricao': job.pesquisa.item_description if job.pesquisa else None,
+            'status': job.status,
+            'amostras': stats.get('sample_size'),
+            'mediana': stats.get('median'),
+            'valor_estimado': stats.get('estimated_value'),
+            'metodo': stats.get('recommended_method'),
+            'pesquisa_id': job.pesquisa_id,
+            'erro': job.error
+        })
+    
+    if request.args.get('formato') == 'csv':
+        csv_data = pd.DataFrame(itens).to_csv(index=False)
+        return send_file(io.BytesIO(csv_data.encode('utf-8')), download_name=f'lote_{lote.id}.csv', as_attachment=True, mimetype='text/csv')
+    
+    return jsonify({**lote.to_dict(), 'itens': itens})
+
+
+def _job_do_usuario(id: int) -> PesquisaJob:
+    """Job da fila visível ao usuário atual (404 caso contrário)"""
+    job = PesquisaJob.query.get_or_404(id)
+    if not current_user.is_gestor and job.user_id != current_user.id:
+        abort(404)
+    return job
+
+
+@bp.route('/pesquisar-precos/stream')
+@login_required
+def pesquisar_precos_stream():
+    """
+    Pesquisa de preços em fluxo (Server-Sent Events)
+    
+    Envia o resultado de cada fonte assim que ela responde, com a estatística
+    parcial da amostra acumulada. Ao fim da coleta, a própria amostra
+    transmitida é analisada e registrada (relatório e PDF), sem consultar as
+    fontes de novo; o evento `salvo` traz a URL da pesquisa. O POST
+    /pesquisar-precos fica como alternativa se o fluxo falhar.
+    """
+    item_code = request.args.get('item_code', '').strip()
+    catalog_type = request.args.get('catalog_type', '').strip()
+    region = request.args.get('region', '').strip() or None
+    
+    if not item_code or not catalog_type:
+        return jsonify({'erro': 'Código do item e tipo são obrigatórios.'}), 400
+    
+    def eventos():
+        # Abre o fluxo imediatamente (proxies só repassam após o primeiro byte)
+        yield ': conectado\n\n'
         
+        precos = []
         try:
-            db.session.add(db_research)
-            db.session.commit()
-            research_id = db_research.id
-            
-            flash('Pesquisa concluída e salva com sucesso!', 'success')
+            for evento in collector.iter_collection(item_code, catalog_type, region=region):
+                if evento['evento'] == 'fonte':
+                    precos.extend(evento['precos'])
+                    yield _sse('fonte', {
+                        'fonte': evento['fonte'],
+                        'local': evento['local'],
+                        'quantidade': len(evento['precos']),
+                        'precos': evento['precos'],
+                        'estatisticas': _estatisticas_parciais(precos)
+                    })
+                else:
+                    resultado = evento['resultado']
+                    yield _sse('concluido', {
+                        'item_code': item_code,
+                        'descricao': resultado['item_description'],
+                        'total': resultado['total_prices'],
+                        'fontes': resultado['sources'],
+                        'fallback': resultado['metadata']['fallback_used'],
+                        'estatisticas': _estatisticas_parciais(resultado['prices'])
+                    })
             
-            audit_log(
-                'pesquisa_criada', 'pesquisa', research_id,
-                {'item': f"{item_code} ({catalog_type})", 'valor': stats.get('estimated_value')}
-            )
+            # Registra a pesquisa com a coleta transmitida
+            try:
+                pesquisa = research_service.run(
+                    item_code, catalog_type,
+                    user_id=current_user.id,
+                    responsible_agent=current_user.full_name,
+                    region=region,
+                    price_data=resultado
+                )
+            except ResearchError as e:
+                yield _sse('sem_resultado', {'erro': str(e), 'categoria': e.category})
+                return
             
+            yield _sse('salvo', {
+                'pesquisa_id': pesquisa.id,
+                'resultado_url': url_for('main.ver_pesquisa', id=pesquisa.id)
+            })
         except Exception as e:
-            db.session.rollback()
-            current_app.logger.error(f'Erro ao salvar: {e}')
-            research_id = None
+            current_app.logger.error(f'Erro na pesquisa em fluxo: {e}')
+            yield _sse('falha', {'erro': 'Erro ao coletar preços.'})
+    
+    return Response(
+        stream_with_context(eventos()),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
 
-        return render_template('resultado.html', 
-                             research=research_data, 
-                             stats=stats, 
-                             pdf_filename=pdf_filename, 
-                             research_id=research_id, 
-                             charts=charts)
 
-    except Exception as e:
-        current_app.logger.error(f'Erro na pesquisa: {e}')
-        import traceback
-        traceback.print_exc()
-        flash(f'Erro ao realizar pesquisa: {e}', 'danger')
-        return render_template('resultado.html', error=True)
+def _sse(evento: str, dados: dict) -> str:
+    """Formata uma mensagem Server-Sent Events"""
+    return f"event: {evento}\ndata: {json.dumps(dados, default=str)}\n\n"
+
+
+def _estatisticas_parciais(precos: list) -> dict:
+    """Estatística da amostra acumulada até o momento"""
+    valores = [p['price'] for p in precos if p.get('price') and p['price'] > 0]
+    return analyzer.analyze_prices(valores)
 
 
 @bp.route('/download-pdf/<filename>')
@@ -0,0 +1,37 @@
+# -*- coding: utf-8 -*-
+"""
+Compilação dos Catálogos - Preço Ágil
+Gera os snapshots binários (índice de busca) de CATMAT e CATSER
+"""
+
+import os
+
+import click
+from flask.cli import with_appcontext
+
+from config import Config
+
+
+@click.command('compilar-catalogos')
+@click.option('--force', is_flag=True, help='Recompila mesmo que o snapshot esteja atualizado')
+@with_appcontext
+def compile_catalogs_command(force):
+    """Compila os CSVs de CATMAT/CATSER em snapshots binários (mmap)"""
+    # Usa os clientes da aplicação, cuja carga (que já grava o snapshot)
+    # começou ao registrar as rotas: o catálogo não é indexado duas vezes
+    from app.routes import collector
+
+    for label, client, snapshot in (
+        ('CATMAT', collector.catmat, Config.CATMAT_SNAPSHOT),
+        ('CATSER', collector.catser, Config.CATSER_SNAPSHOT),
+    ):
+        client.wait_ready()
+        if force:
+            client.reload(force=True)
+
+        if client.index is None:
+            click.echo(f"⚠️  {label}: catálogo não encontrado ou inválido")
+        elif os.path.exists(snapshot):
+            click.echo(f"✅ {label}: {len(client.index)} itens → {snapshot} ({os.path.getsize(snapshot) / 1e6:.1f} MB)")
+        else:
+            click.echo(f"⚠️  {label}: snapshot não gravado")
@@ -3,9 +3,14 @@
 Coletor de Preços APRIMORADO - Preço Ágil
 """
 
-from typing import List, Dict, Optional
+from typing import List, Dict, Optional, Tuple, Callable, Iterator
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from concurrent.futures import TimeoutError as FuturesTimeoutError
 from datetime import datetime
+import time
 import pandas as pd
+from config import Config
+from app.api.fallback_manager import run_with_deadline
 from app.api.pncp_api import PNCPClient
 from app.api.comprasnet_api import ComprasNetClient
 from app.api.painel_precos_api import PainelPrecosClient
@@ -13,6 +18,7 @@ from app.api.portal_transparencia_api import PortalTransparenciaClient
 from app.api.catmat_api import CATMATClient
 from app.api.catser_api import CATSERClient
 from app.api.brasilapi_client import BrasilAPIClient
+from app.services.price_warehouse import PriceWarehouse
 
 
 class EnhancedPriceCollector:
@@ -32,9 +38,26 @@ class EnhancedPriceCollector:
         self.comprasnet = ComprasNetClient()
         self.portal_transparencia = PortalTransparenciaClient()
         
+        # Cliente de cada fonte (circuit breaker consultado antes da coleta)
+        self._source_clients = {
+            'Painel de Preços': self.painel_precos,
+            'PNCP': self.pncp,
+            'ComprasNet': self.comprasnet,
+            'Portal da Transparência': self.portal_transparencia,
+        }
+        
         # APIs auxiliares
         self.brasilapi = BrasilAPIClient()
         
+        # Armazém local de preços (PNCP e Painel)
+        self.warehouse = PriceWarehouse(painel_client=self.painel_precos, pncp_client=self.pncp)
+        
+        # Executor limitado compartilhado pelas coletas concorrentes
+        self._executor = ThreadPoolExecutor(
+            max_workers=Config.COLLECTOR_MAX_WORKERS,
+            thread_name_prefix='coleta-precos'
+        )
+        
         # Cache simples
         self._cache = {}
         self._cache_ttl = 3600  # 1 hora
@@ -75,10 +98,38 @@ class EnhancedPriceCollector:
         catalog_type: str,
         region: Optional[str] = None,
         max_days: int = 365,
-        validate_suppliers: bool = False
+        validate_suppliers: bool = False,
+        concurrent: Optional[bool] = None
     ) -> Dict:
         """
         Coleta preços com sistema robusto de fallback
+        
+        Args:
+            concurrent: Consulta as fontes em paralelo (default: Config.COLLECTOR_CONCURRENT)
+        """
+        for event in self.iter_collection(
+            item_code, catalog_type, region, max_days, validate_suppliers, concurrent
+        ):
+            if event['evento'] == 'concluido':
+                return event['resultado']
+    
+    def iter_collection(
+        self,
+        item_code: str,
+        catalog_type: str,
+        region: Optional[str] = None,
+        max_days: int = 365,
+        validate_suppliers: bool = False,
+        concurrent: Optional[bool] = None
+    ) -> Iterator[Dict]:
+        """
+        Coleta preços entregando eventos à medida que cada fonte responde
+        
+        Eventos:
+            {'evento': 'fonte', 'fonte', 'precos', 'local'}: resultado de uma
+                fonte (local=True quando respondida pelo armazém)
+            {'evento': 'concluido', 'resultado'}: mesmo retorno de
+                collect_prices_with_fallback
         """
         print("\n" + "="*70)
         print(f"🔍 COLETA APRIMORADA DE PREÇOS - Item: {item_code}")
@@ -87,73 +138,40 @@ class EnhancedPriceCollector:
         all_prices = []
         sources_used = []
         
-        # 1. PAINEL DE PREÇOS
-        print("1️⃣  Consultando Painel de Preços...")
-        try:
-            painel_prices = self._collect_from_painel(item_code, catalog_type, region)
-            if painel_prices:
-                all_prices.extend(painel_prices)
-                sources_used.append({
-                    'fonte': 'Painel de Preços',
-                    'quantidade': len(painel_prices),
-                })
-                print(f"   ✅ {len(painel_prices)} preços encontrados")
-            else:
-                print("   ℹ️  Nenhum preço encontrado")
-        except Exception as e:
-            print(f"   ⚠️  Erro: {e}")
-            print("   ℹ️  Nenhum preço encontrado")
-
-        # 2. PNCP
-        print("\n2️⃣  Consultando PNCP...")
-        try:
-            pncp_prices = self._collect_from_pncp(item_code, catalog_type, region, max_days)
-            if pncp_prices:
-                all_prices.extend(pncp_prices)
-                sources_used.append({
-                    'fonte': 'PNCP',
-                    'quantidade': len(pncp_prices),
-                })
-                print(f"   ✅ {len(pncp_prices)} preços encontrados")
-            else:
-                print("   ℹ️  Nenhum preço encontrado")
-        except Exception as e:
-            print(f"   ⚠️  Erro: {e}")
-            print("   ℹ️  Nenhum preço encontrado")
-
-        # 3. COMPRASNET
-        print("\n3️⃣  Consultando ComprasNet...")
-        try:
-            comprasnet_prices = self._collect_from_comprasnet(item_code, catalog_type)
-            if comprasnet_prices:
-                all_prices.extend(comprasnet_prices)
-                sources_used.append({
-                    'fonte': 'ComprasNet',
-                    'quantidade': len(comprasnet_prices),
-                })
-                print(f"   ✅ {len(comprasnet_prices)} preços encontrados")
-            else:
-                print("   ℹ️  Nenhum preço encontrado")
-        except Exception as e:
-            print(f"   ⚠️  Erro: {e}")
-            print("   ℹ️  Nenhum preço encontrado")
-
-        # 4. PORTAL DA TRANSPARÊNCIA
-        print("\n4️⃣  Consultando Portal da Transparência...")
-        try:
-            pt_prices = self._collect_from_portal_transparencia(item_code, catalog_type)
-            if pt_prices:
-                all_prices.extend(pt_prices)
-                sources_used.append({
-                    'fonte': 'Portal da Transparência',
-                    'quantidade': len(pt_prices),
-                })
-                print(f"   ✅ {len(pt_prices)} preços encontrados")
-            else:
-                print("   ℹ️  Nenhum preço encontrado")
-        except Exception as e:
-            print(f"   ⚠️  Erro: {e}")
-            print("   ℹ️  Nenhum preço encontrado")
+        # Armazém local: fontes sincronizadas recentemente não vão à rede e
+        # o PNCP busca apenas o delta desde a marca d'água
+        use_warehouse = region is None and self.warehouse.available()
+        warehouse_sources = self.warehouse.fresh_sources(item_code) if use_warehouse else set()
+        pncp_days = self.warehouse.delta_days(item_code, 'PNCP', max_days) if use_warehouse else max_days
+        
+        for fonte in sorted(warehouse_sources):
+            print(f"💾 {fonte}: respondida pelo armazém local")
+            local_prices = self.warehouse.get_prices(item_code, fonte, max_days)
+            self._register_source_result(fonte, local_prices, all_prices, sources_used)
+            yield {'evento': 'fonte', 'fonte': fonte, 'precos': local_prices, 'local': True}
+        
+        # Fontes com circuito aberto (fora do ar) não são consultadas
+        sources = []
+        skipped_sources = []
+        for fonte, fetch in self._get_sources(item_code, catalog_type, region, max_days, pncp_days):
+            if fonte in warehouse_sources:
+                continue
+            if not self._source_available(fonte):
+                print(f"🔌 {fonte}: indisponível (circuito aberto), ignorada")
+                skipped_sources.append(fonte)
+                continue
+            sources.append((fonte, fetch))
+        
+        for fonte, prices in self._iter_source_results(sources, concurrent):
+            # Fontes do armazém: o delta é incorporado e a resposta vem do
+            # armazém (inclusive quando o delta vem vazio). Se a gravação
+            # falhar, ficam os preços recém-buscados.
+            if use_warehouse and fonte in PriceWarehouse.SOURCES and prices is not None:
+                if self.warehouse.store(item_code, catalog_type, fonte, prices) is not None:
+                    prices = self.warehouse.get_prices(item_code, fonte, max_days)
+            prices = prices or []
+            self._register_source_result(fonte, prices, all_prices, sources_used)
+            yield {'evento': 'fonte', 'fonte': fonte, 'precos': prices, 'local': False}
 
         # Fallback para dados mockados
         fallback_used = False
@@ -171,6 +189,7 @@ class EnhancedPriceCollector:
                     'fonte': 'DADOS DE TESTE (Mockados)',
                     'quantidade': len(mock_prices),
                 })
+                yield {'evento': 'fonte', 'fonte': 'DADOS DE TESTE (Mockados)', 'precos': mock_prices, 'local': False}
             except Exception as e:
                 print(f"   ❌ Erro ao gerar dados mockados: {e}")
 
@@ -190,7 +209,7 @@ class EnhancedPriceCollector:
             print(f"   📍 Fontes: {fontes_str}")
         print("="*70 + "\n")
         
-        return {
+        yield {'evento': 'concluido', 'resultado': {
             'item_code': item_code,
             'item_description': item_description or 'Descrição não disponível',
             'catalog_type': catalog_type,
@@ -205,10 +224,128 @@ class EnhancedPriceCollector:
             'metadata': {
                 'suppliers_validated': validate_suppliers,
                 'cache_hit': False,
+                'warehouse_sources': sorted(warehouse_sources),
+                'skipped_sources': skipped_sources,
                 'fallback_used': fallback_used
             }
+        }}
+    
+    def _get_sources(
+        self,
+        item_code: str,
+        catalog_type: str,
+        region: Optional[str],
+        max_days: int,
+        pncp_days: Optional[int] = None
+    ) -> List[Tuple[str, Callable[[], List[Dict]]]]:
+        """Fontes de preços na ordem de prioridade"""
+        pncp_days = pncp_days or max_days
+        return [
+            ('Painel de Preços', lambda: self._collect_from_painel(item_code, catalog_type, region)),
+            ('PNCP', lambda: self._collect_from_pncp(item_code, catalog_type, region, pncp_days)),
+            ('ComprasNet', lambda: self._collect_from_comprasnet(item_code, catalog_type)),
+            ('Portal da Transparência', lambda: self._collect_from_portal_transparencia(item_code, catalog_type)),
+        ]
+    
+    def _source_available(self, fonte: str) -> bool:
+        """Fonte sem circuito aberto (ver APIFallbackManager)"""
+        client = self._source_clients.get(fonte)
+        return client is None or client.fallback.is_available(client.source_name)
+    
+    def source_status(self) -> Dict[str, Dict]:
+        """Estado do circuit breaker (e das cópias de requisições) de cada fonte"""
+        return {
+            fonte: client.fallback.source_status(client.source_name)
+            for fonte, client in self._source_clients.items()
         }
     
+    def _register_source_result(
+        self,
+        fonte: str,
+        prices: List[Dict],
+        all_prices: List[Dict],
+        sources_used: List[Dict]
+    ) -> None:
+        """Incorpora o resultado de uma fonte à coleta"""
+        if prices:
+            all_prices.extend(prices)
+            sources_used.append({
+                'fonte': fonte,
+                'quantidade': len(prices),
+            })
+            print(f"   ✅ {fonte}: {len(prices)} preços encontrados")
+        else:
+            print(f"   ℹ️  {fonte}: nenhum preço encontrado")
+    
+    def _iter_source_results(
+        self,
+        sources: List[Tuple[str, Callable[[], List[Dict]]]],
+        concurrent: Optional[bool] = None
+    ) -> Iterator[Tuple[str, List[Dict]]]:
+        """Itera (fonte, preços) à medida que cada fonte responde (None: a fonte falhou)"""
+        if concurrent is None:
+            concurrent = Config.COLLECTOR_CONCURRENT
+        
+        if concurrent:
+            return self._iter_concurrently(sources)
+        return self._iter_sequentially(sources)
+    
+    def _iter_sequentially(
+        self,
+        sources: List[Tuple[str, Callable[[], List[Dict]]]]
+    ) -> Iterator[Tuple[str, List[Dict]]]:
+        """Consulta as fontes uma após a outra"""
+        for i, (fonte, fetch) in enumerate(sources, start=1):
+            print(f"\n{i}. Consultando {fonte}...")
+            try:
+                prices = fetch()
+            except Exception as e:
+                print(f"   ⚠️  {fonte}: erro {e}")
+                prices = None
+            yield fonte, prices
+    
+    def _iter_concurrently(
+        self,
+        sources: List[Tuple[str, Callable[[], List[Dict]]]]
+    ) -> Iterator[Tuple[str, List[Dict]]]:
+        """
+        Consulta as fontes em paralelo no executor compartilhado
+        
+        Os resultados são entregues à medida que chegam. Fontes que não
+        respondem dentro de COLLECTOR_DEADLINE são descartadas, de modo que a
+        latência da pesquisa é limitada pela fonte mais lenta (ou pelo prazo).
+        
+        O prazo também vale dentro de cada fonte (run_with_deadline): o
+        timeout de cada requisição não passa dele e, esgotado, retentativas e
+        páginas restantes são abandonadas, liberando a thread do executor.
+        """
+        if not sources:
+            return
+        
+        print(f"⚡ Consultando {len(sources)} fontes em paralelo "
+              f"(prazo: {Config.COLLECTOR_DEADLINE:.0f}s)...")
+        
+        deadline = time.monotonic() + Config.COLLECTOR_DEADLINE
+        futures = {
+            self._executor.submit(run_with_deadline, deadline, fetch): fonte
+            for fonte, fetch in sources
+        }
+        
+        try:
+            for future in as_completed(futures, timeout=Config.COLLECTOR_DEADLINE):
+                fonte = futures[future]
+                try:
+                    prices = future.result()
+                except Exception as e:
+                    print(f"   ⚠️  {fonte}: erro {e}")
+                    prices = None
+                yield fonte, prices
+        except FuturesTimeoutError:
+            for future, fonte in futures.items():
+                if not future.done():
+                    future.cancel()
+                    print(f"   ⏱️  {fonte}: prazo de {Config.COLLECTOR_DEADLINE:.0f}s excedido, ignorada")
+    
     def _collect_from_painel(self, item_code: str, catalog_type: str, region: Optional[str]) -> List[Dict]:
         """Coleta do Painel de Preços"""
         return self.painel_precos.search_by_item(
@@ -218,12 +355,14 @@ class EnhancedPriceCollector:
         )
     
     def _collect_from_pncp(self, item_code: str, catalog_type: str, region: Optional[str], max_days: int) -> List[Dict]:
-        """Coleta do PNCP"""
+        """Coleta do PNCP (filtrando contratos pela descrição do catálogo)"""
+        catalog = self.catmat if catalog_type == 'material' else self.catser
         return self.pncp.search_contracts(
             item_code=item_code,
             catalog_type=catalog_type,
             max_days=max_days,
-            region=region
+            region=region,
+            item_description=catalog.get_description(item_code)
         )
     
     def _collect_from_comprasnet(self, item_code: str, catalog_type: str) -> List[Dict]:
@@ -256,9 +395,9 @@ class EnhancedPriceCollector:
         return unique_prices
     
     def search_item(self, description: str) -> Dict:
-        """Busca item nos catálogos"""
-        materiais = self.catmat.search_by_description(description)
-        servicos = self.catser.search_by_description(description)
+        """Busca item nos catálogos (ordenado por relevância)"""
+        materiais = self.catmat.search_by_description(description, ranked=True)
+        servicos = self.catser.search_by_description(description, ranked=True)
         
         return {
             'materiais': materiais,
@@ -266,6 +405,96 @@ class EnhancedPriceCollector:
             'total': len(materiais) + len(servicos)
         }
     
+    def catalogs_ready(self) -> bool:
+        """CATMAT e CATSER carregados"""
+        return self.catmat.ready and self.catser.ready
+    
+    def catalog_status(self) -> List[Dict]:
+        """Estado de carregamento dos catálogos"""
+        return [self.catmat.status(), self.catser.status()]
+    
+    def reload_catalogs(self, force: bool = False):
+        """Recarrega CATMAT e CATSER em segundo plano (troca atômica do índice)"""
+        self.catmat.reload_async(force=force)
+        self.catser.reload_async(force=force)
+    
+    def suggest(self, text: str, catalog_type: Optional[str] = None, limit: int = 10) -> List[Dict]:
+        """Sugestões de autocompletar combinando CATMAT e CATSER"""
+        catalogs = {'material': [self.catmat], 'servico': [self.catser]}.get(
+            catalog_type, [self.catmat, self.catser]
+        )
+        
+        itens = {}
+        for catalog in catalogs:
+            for sugestao in catalog.suggest(text, limit):
+                itens[sugestao['texto']] = itens.get(sugestao['texto'], 0) + sugestao['itens']
+        
+        ranking = sorted(itens.items(), key=lambda s: (-s[1], s[0]))[:limit]
+        return [{'texto': texto, 'itens': n} for texto, n in ranking]
+    
+    def lookup_batch(self, entries: List[str], catalog_type: Optional[str] = None) -> List[Dict]:
+        """
+        Resolve uma lista de códigos e/ou descrições contra CATMAT e CATSER
+        
+        Códigos (somente dígitos) são resolvidos em uma única busca
+        vetorizada por catálogo; cada descrição distinta é resolvida pelo
+        item mais relevante (BM25) entre os catálogos consultados.
+        
+        Returns:
+            Um resultado por entrada, na ordem recebida
+        """
+        catalogs = {'material': [self.catmat], 'servico': [self.catser]}.get(
+            catalog_type, [self.catmat, self.catser]
+        )
+        labels = {catalog.ITEM_TYPE: catalog.LABEL for catalog in catalogs}
+        
+        entries = [str(entry).strip() for entry in entries]
+        matches = {}
+        
+        codes = [i for i, entry in enumerate(entries) if entry.isdigit()]
+        for catalog in catalogs:
+            pending = [i for i in codes if i not in matches]
+            descriptions = catalog.get_descriptions([entries[i] for i in pending])
+            for i, description in zip(pending, descriptions):
+                if description is not None:
+                    matches[i] = {
+                        'codigo': entries[i],
+                        'descricao': description,
+                        'tipo': catalog.ITEM_TYPE,
+                        'score': None
+                    }
+        
+        best = {}
+        for i, entry in enumerate(entries):
+            if i in matches or entry.isdigit() or not entry:
+                continue
+            
+            if entry.lower() not in best:
+                candidates = [
+                    item
+                    for catalog in catalogs
+                    for item in catalog.search_by_description(entry, limit=1, ranked=True)
+                ]
+                best[entry.lower()] = max(candidates, key=lambda item: item['score']) if candidates else None
+            
+            if best[entry.lower()] is not None:
+                matches[i] = best[entry.lower()]
+        
+        results = []
+        for i, entry in enumerate(entries):
+            item = matches.get(i)
+            results.append({
+                'entrada': entry,
+                'encontrado': item is not None,
+                'codigo': item['codigo'] if item else None,
+                'descricao': item['descricao'] if item else None,
+                'catalogo': labels[item['tipo']] if item else None,
+                'tipo': item['tipo'] if item else None,
+                'score': item['score'] if item else None
+            })
+        
+        return results
+    
     def get_catalog_info(self, item_code: str, catalog_type: str) -> Dict:
         """Informações do catálogo"""
         if catalog_type == 'material':
@@ -0,0 +1,226 @@
+# -*- coding: utf-8 -*-
+"""
+Armazém Local de Preços - Preço Ágil
+Base local sincronizada de forma incremental com PNCP e Painel de Preços
+"""
+
+import hashlib
+import json
+from datetime import datetime, date, timedelta
+from typing import List, Dict, Optional, Set
+
+import click
+from flask import has_app_context
+from flask.cli import with_appcontext
+
+from app.models import db
+from app.models.models import Pesquisa, PrecoArmazenado, SincronizacaoPrecos
+from config import Config
+
+
+class PriceWarehouse:
+    """
+    Armazém de preços indexado por item, fonte e data
+
+    Fontes sincronizadas há menos de WAREHOUSE_SYNC_INTERVAL horas são
+    respondidas localmente; para as demais, apenas o delta posterior à
+    marca d'água é buscado na rede e incorporado ao armazém.
+    """
+
+    SOURCES = ('Painel de Preços', 'PNCP')
+
+    def __init__(self, painel_client=None, pncp_client=None):
+        self.painel = painel_client
+        self.pncp = pncp_client
+
+    def available(self) -> bool:
+        """O armazém exige contexto de aplicação (banco de dados)"""
+        return Config.WAREHOUSE_ENABLED and has_app_context()
+
+    # ---------- Consulta ----------
+
+    def fresh_sources(self, item_code: str) -> Set[str]:
+        """Fontes do item sincronizadas dentro do intervalo configurado"""
+        limite = datetime.utcnow() - timedelta(hours=Config.WAREHOUSE_SYNC_INTERVAL)
+        rows = SincronizacaoPrecos.query.filter(
+            SincronizacaoPrecos.item_code == str(item_code),
+            SincronizacaoPrecos.last_sync_at >= limite
+        ).all()
+        return {row.source for row in rows}
+
+    def delta_days(self, item_code: str, source: str, max_days: int) -> int:
+        """Janela (em dias) a buscar na rede: desde a marca d'água, com 1 dia de sobreposição"""
+        sync = SincronizacaoPrecos.query.filter_by(item_code=str(item_code), source=source).first()
+        if sync is None or sync.watermark is None:
+            return max_days
+        return max(1, min(max_days, (date.today() - sync.watermark).days + 1))
+
+    def get_prices(
+        self,
+        item_code: str,
+        source: str,
+        max_days: int,
+        region: Optional[str] = None
+    ) -> List[Dict]:
+        """Preços armazenados do item/fonte na janela de max_days"""
+        query = PrecoArmazenado.query.filter(
+            PrecoArmazenado.item_code == str(item_code),
+            PrecoArmazenado.source == source,
+            PrecoArmazenado.date >= date.today() - timedelta(days=max_days)
+        )
+        if region:
+            query = query.filter(db.or_(PrecoArmazenado.region == region, PrecoArmazenado.region.is_(None)))
+
+        prices = []
+        for row in query.order_by(PrecoArmazenado.date.desc()).all():
+            price = dict(row.data)
+            price['date'] = datetime.combine(row.date, datetime.min.time())
+            prices.append(price)
+        return prices
+
+    # ---------- Gravação ----------
+
+    @staticmethod
+    def _to_date(value) -> Optional[date]:
+        """Converte a data do registro da fonte em date"""
+        if isinstance(value, datetime):
+            return value.date()
+        if isinstance(value, date):
+            return value
+        try:
+            return datetime.strptime(str(value).split('T')[0], '%Y-%m-%d').date()
+        except (TypeError, ValueError):
+            return None
+
+    @staticmethod
+    def _record_key(item_code: str, source: str, record_date: date, price: Dict) -> str:
+        """Chave de deduplicação do registro"""
+        parts = [
+            str(item_code), source, record_date.isoformat(),
+            str(price.get('supplier') or ''), f"{float(price.get('price') or 0):.2f}",
+            str(price.get('contract_number') or '')
+        ]
+        return hashlib.sha1('|'.join(parts).encode('utf-8')).hexdigest()
+
+    def store(self, item_code: str, catalog_type: str, source: str, prices: List[Dict]) -> Optional[int]:
+        """
+        Incorpora preços de uma consulta bem-sucedida à fonte
+
+        Avança a marca d'água e registra a sincronização mesmo que a
+        consulta não traga nada novo (delta vazio), para que as próximas
+        pesquisas sejam respondidas localmente. Não chamar se a fonte falhou.
+
+        Returns:
+            Quantidade de registros novos, ou None se a gravação falhar
+        """
+        records = {}
+        for price in prices:
+            if price.get('is_mock'):
+                continue
+            record_date = self._to_date(price.get('date'))
+            if record_date is None or not price.get('price'):
+                continue
+            key = self._record_key(item_code, source, record_date, price)
+            records[key] = (record_date, price)
+
+        try:
+            existing = set()
+            keys = list(records)
+            for i in range(0, len(keys), 500):
+                existing.update(
+                    k for (k,) in db.session.query(PrecoArmazenado.record_key)
+                    .filter(PrecoArmazenado.record_key.in_(keys[i:i + 500]))
+                )
+
+            for key, (record_date, price) in records.items():
+                if key in existing:
+                    continue
+                db.session.add(PrecoArmazenado(
+                    record_key=key,
+                    item_code=str(item_code),
+                    catalog_type=catalog_type,
+                    source=source,
+                    date=record_date,
+                    price=float(price['price']),
+                    supplier=str(price.get('supplier') or '')[:255],
+                    region=price.get('region'),
+                    data=json.loads(json.dumps(price, default=str))
+                ))
+
+            sync = SincronizacaoPrecos.query.filter_by(item_code=str(item_code), source=source).first()
+            if sync is None:
+                sync = SincronizacaoPrecos(item_code=str(item_code), catalog_type=catalog_type, source=source)
+                db.session.add(sync)
+
+            newest = max((d for d, _ in records.values()), default=None)
+            if newest and (sync.watermark is None or newest > sync.watermark):
+                sync.watermark = newest
+            sync.last_sync_at = datetime.utcnow()
+
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            print(f"   ⚠️  Armazém de preços: erro ao gravar {source}: {e}")
+            return None
+
+        return len(records) - len(existing)
+
+    # ---------- Sincronização ----------
+
+    def sync_item(
+        self,
+        item_code: str,
+        catalog_type: str,
+        item_description: Optional[str] = None,
+        max_days: int = 365
+    ) -> Dict[str, Optional[int]]:
+        """Sincroniza o delta de um item em todas as fontes do armazém (None: a fonte falhou)"""
+        novos = {}
+
+        if self.painel is not None:
+            sync = SincronizacaoPrecos.query.filter_by(item_code=str(item_code), source='Painel de Preços').first()
+            prices = self.painel.search_by_item(item_code=item_code, catalog_type=catalog_type)
+            if prices is None:
+                novos['Painel de Preços'] = None
+            else:
+                # O Painel não filtra por data: descarta o que já está abaixo da marca d'água
+                if sync is not None and sync.watermark is not None:
+                    prices = [p for p in prices if (self._to_date(p.get('date')) or date.min) >= sync.watermark]
+                novos['Painel de Preços'] = self.store(item_code, catalog_type, 'Painel de Preços', prices)
+
+        if self.pncp is not None:
+            prices = self.pncp.search_contracts(
+                item_code=item_code,
+                catalog_type=catalog_type,
+                max_days=self.delta_days(item_code, 'PNCP', max_days),
+                item_description=item_description
+            )
+            novos['PNCP'] = None if prices is None else self.store(item_code, catalog_type, 'PNCP', prices)
+
+        return novos
+
+
+@click.command('sincronizar-precos')
+@click.option('--item', 'items', multiple=True, help='Código do item (padrão: itens já pesquisados)')
+@with_appcontext
+def sync_prices_command(items):
+    """Sincroniza incrementalmente o armazém local de preços"""
+    from app.routes import collector
+
+    if items:
+        alvos = [(code, 'servico' if collector.catser.get_description(code) else 'material') for code in items]
+    else:
+        alvos = set(db.session.query(Pesquisa.item_code, Pesquisa.catalog_type).distinct())
+        alvos |= set(db.session.query(SincronizacaoPrecos.item_code, SincronizacaoPrecos.catalog_type).distinct())
+
+    for item_code, catalog_type in sorted(alvos):
+        catalog = collector.catmat if catalog_type == 'material' else collector.catser
+        novos = collector.warehouse.sync_item(
+            item_code,
+            catalog_type,
+            item_description=catalog.get_description(item_code),
+            max_days=Config.MAX_PRICE_AGE_DAYS
+        )
+        click.echo(f"{item_code} ({catalog_type}): " + ', '.join(
+            f"{f}: falhou" if n is None else f"{f}: +{n}" for f, n in novos.items()
+        ))
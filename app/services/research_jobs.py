@@ -0,0 +1,365 @@
+# -*- coding: utf-8 -*-
+"""
+Fila de Pesquisas - Preço Ágil
+Executa as pesquisas de preços (individuais ou em lote) em um pool local de processos
+"""
+
+import multiprocessing
+import os
+import threading
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime, timedelta
+from typing import List, Optional, Tuple
+
+from app.models import db
+from app.models.models import PesquisaJob, PesquisaLote
+from config import Config
+
+# Estado de cada processo do pool (preenchido por _init_worker)
+_worker_app = None
+_worker_service = None
+
+
+def _init_worker():
+    """Inicializa o processo do pool: aplicação (banco) e serviço de pesquisa"""
+    global _worker_app, _worker_service
+
+    from app.models import create_app
+
+    _worker_app = create_app()
+
+    # Serviço criado pelo blueprint ao registrar as rotas
+    from app.routes import collector, research_service
+    _worker_service = research_service
+
+    # Sem os catálogos a pesquisa sairia sem descrição e sem palavras-chave do PNCP
+    for catalog in (collector.catmat, collector.catser):
+        catalog.wait_ready()
+
+
+def _run_job(job_id: int):
+    """Executa uma pesquisa da fila (no processo do pool)"""
+    with _worker_app.app_context():
+        _execute_job(job_id)
+
+
+def _run_batch(lote_id: int):
+    """
+    Executa um lote de pesquisas (no processo do pool)
+
+    Os itens rodam em RESEARCH_BATCH_CONCURRENCY threads do mesmo processo
+    e compartilham os clientes das APIs: páginas já buscadas para um item
+    (ex.: contratos do PNCP no mesmo período) vêm do cache, buscas idênticas
+    simultâneas viram uma só (single-flight) e o rate limit é o global de
+    cada fonte. Em cada item as fontes são consultadas em sequência; o
+    paralelismo fica entre itens.
+
+    O lote renova heartbeat_at ao começar e ao terminar cada item; é o sinal
+    de vida que ResearchQueue.recover usa para achar lotes parados.
+    """
+    with _worker_app.app_context():
+        now = datetime.utcnow()
+        claimed = PesquisaLote.query.filter_by(id=lote_id, status=PesquisaJob.PENDING).update(
+            {'status': PesquisaJob.RUNNING, 'started_at': now, 'heartbeat_at': now}
+        )
+        db.session.commit()
+        if not claimed:
+            return
+
+        job_ids = [
+            job_id for (job_id,) in db.session.query(PesquisaJob.id)
+            .filter_by(lote_id=lote_id, status=PesquisaJob.PENDING)
+            .order_by(PesquisaJob.id)
+        ]
+
+    def execute(job_id):
+        with _worker_app.app_context():
+            _batch_heartbeat(lote_id)
+            _execute_job(job_id, concurrent=False)
+            _batch_heartbeat(lote_id)
+
+    print(f"📦 Lote {lote_id}: {len(job_ids)} itens "
+          f"({Config.RESEARCH_BATCH_CONCURRENCY} em paralelo)")
+
+    with ThreadPoolExecutor(
+        max_workers=Config.RESEARCH_BATCH_CONCURRENCY,
+        thread_name_prefix=f'lote-{lote_id}'
+    ) as executor:
+        list(executor.map(execute, job_ids))
+
+    with _worker_app.app_context():
+        lote = db.session.get(PesquisaLote, lote_id)
+        _finish_batch(lote)
+        db.session.commit()
+        print(f"✅ Lote {lote_id} concluído: {lote.to_dict()}")
+
+
+def _batch_heartbeat(lote_id: int):
+    """Renova o sinal de vida do lote (requer contexto de aplicação)"""
+    PesquisaLote.query.filter_by(id=lote_id).update({'heartbeat_at': datetime.utcnow()})
+    db.session.commit()
+
+
+def _finish_batch(lote: PesquisaLote):
+    """
+    Encerra um lote cujos jobs já terminaram
+
+    O estado vem dos jobs: concluído sem falhas, erro se todos falharam
+    e parcial nos demais casos.
+    """
+    contagem = dict(
+        db.session.query(PesquisaJob.status, db.func.count(PesquisaJob.id))
+        .filter(PesquisaJob.lote_id == lote.id)
+        .group_by(PesquisaJob.status)
+        .all()
+    )
+    falhas = contagem.get(PesquisaJob.FAILED, 0)
+
+    if not falhas:
+        lote.status = PesquisaJob.DONE
+    elif falhas == sum(contagem.values()):
+        lote.status = PesquisaJob.FAILED
+    else:
+        lote.status = PesquisaLote.PARTIAL
+    lote.finished_at = datetime.utcnow()
+
+
+def _execute_job(job_id: int, concurrent: Optional[bool] = None):
+    """Executa um job (requer contexto de aplicação)"""
+    from app.services.research_service import ResearchError
+
+    # Reserva o job (um único processo o executa)
+    claimed = PesquisaJob.query.filter_by(id=job_id, status=PesquisaJob.PENDING).update(
+        {'status': PesquisaJob.RUNNING, 'started_at': datetime.utcnow()}
+    )
+    db.session.commit()
+    if not claimed:
+        return
+
+    job = db.session.get(PesquisaJob, job_id)
+
+    def progress(etapa):
+        job.stage = etapa
+        db.session.commit()
+
+    try:
+        pesquisa = _worker_service.run(
+            job.item_code,
+            job.catalog_type,
+            user_id=job.user_id,
+            responsible_agent=job.responsible_agent,
+            region=job.region,
+            progress=progress,
+            concurrent=concurrent
+        )
+        job.status = PesquisaJob.DONE
+        job.pesquisa_id = pesquisa.id
+    except ResearchError as e:
+        db.session.rollback()
+        job.status = PesquisaJob.FAILED
+        job.error = str(e)
+        job.error_category = e.category
+    except Exception as e:
+        db.session.rollback()
+        traceback.print_exc()
+        job.status = PesquisaJob.FAILED
+        job.error = 'Erro ao realizar pesquisa. Tente novamente.'
+        job.error_category = 'danger'
+        print(f"❌ Pesquisa {job_id} falhou: {e}")
+
+    job.stage = None
+    job.finished_at = datetime.utcnow()
+    db.session.commit()
+
+
+class ResearchQueue:
+    """
+    Fila de pesquisas de preços
+
+    O estado de cada pesquisa fica na tabela PesquisaJob, de modo que a
+    requisição web apenas registra o job e retorna; o andamento é consultado
+    por qualquer worker web. Os processos do pool (RESEARCH_WORKERS) são
+    iniciados com 'spawn' e criam a própria aplicação, sem herdar threads
+    ou conexões do processo web.
+    """
+
+    def __init__(self):
+        self._executor = None
+        self._executor_pid = None
+        self._lock = threading.Lock()
+
+        # Retomada (ver recover): jobs pendentes criados antes deste pool
+        # foram enviados a um pool que não existe mais
+        self._pool_started = datetime.utcnow()
+        self._resubmitted = set()
+        self._last_recovery = None
+
+    @property
+    def enabled(self) -> bool:
+        return Config.RESEARCH_JOBS_ENABLED
+
+    def _get_executor(self, broken: Optional[ProcessPoolExecutor] = None) -> ProcessPoolExecutor:
+        """
+        Pool do processo, criado no primeiro uso
+
+        Args:
+            broken: Pool que falhou (BrokenProcessPool); é substituído, a
+                menos que outra thread já o tenha feito
+        """
+        with self._lock:
+            if broken is not None and self._executor is broken:
+                self._executor = None
+                self._pool_started = datetime.utcnow()
+
+            # Um pool por processo web (servidores que fazem fork após o import)
+            if self._executor is None or self._executor_pid != os.getpid():
+                self._executor = ProcessPoolExecutor(
+                    max_workers=Config.RESEARCH_WORKERS,
+                    mp_context=multiprocessing.get_context('spawn'),
+                    initializer=_init_worker
+                )
+                self._executor_pid = os.getpid()
+            return self._executor
+
+    def submit(self, user_id: int, item_code: str, catalog_type: str,
+               responsible_agent: str, region: str = None) -> PesquisaJob:
+        """Registra a pesquisa e a envia ao pool"""
+        job = PesquisaJob(
+            user_id=user_id,
+            item_code=item_code,
+            catalog_type=catalog_type,
+            region=region,
+            responsible_agent=responsible_agent
+        )
+        db.session.add(job)
+        db.session.commit()
+
+        self._submit(_run_job, job.id)
+        return job
+
+    def submit_batch(self, user_id: int, items: List[Tuple[str, str]],
+                     responsible_agent: str, region: str = None) -> PesquisaLote:
+        """
+        Registra um lote de pesquisas e o envia ao pool como uma única tarefa
+
+        Args:
+            items: Pares (código, tipo de catálogo)
+        """
+        lote = PesquisaLote(user_id=user_id, region=region, responsible_agent=responsible_agent)
+        db.session.add(lote)
+        db.session.flush()
+
+        db.session.add_all([
+            PesquisaJob(
+                user_id=user_id,
+                item_code=item_code,
+                catalog_type=catalog_type,
+                region=region,
+                responsible_agent=responsible_agent,
+                lote_id=lote.id
+            )
+            for item_code, catalog_type in items
+        ])
+        db.session.commit()
+
+        self._submit(_run_batch, lote.id)
+        return lote
+
+    def _submit(self, fn, *args):
+        executor = self._get_executor()
+        try:
+            executor.submit(fn, *args)
+        except BrokenProcessPool:
+            # Um processo do pool morreu: recria o pool e reenvia (os demais
+            # jobs do pool antigo voltam na próxima retomada)
+            self._get_executor(broken=executor).submit(fn, *args)
+
+    def recover_if_due(self) -> bool:
+        """Executa recover() na primeira chamada do processo e depois a cada RESEARCH_RECOVERY_INTERVAL"""
+        with self._lock:
+            now = time.monotonic()
+            if self._last_recovery is not None and now - self._last_recovery < Config.RESEARCH_RECOVERY_INTERVAL:
+                return False
+            self._last_recovery = now
+
+        self.recover()
+        return True
+
+    def recover(self) -> dict:
+        """
+        Retoma a fila após reinício do serviço ou morte de um processo do pool
+
+        - Jobs em execução há mais de RESEARCH_JOB_TIMEOUT são dados como
+          interrompidos (erro): o processo que os executava não existe mais.
+        - Lotes em execução sem sinal de vida (heartbeat_at) há mais que
+          isso, e sem job em andamento, voltam à fila e seguem com os itens
+          pendentes. Um lote ativo renova o sinal a cada item, inclusive
+          entre um item e outro.
+        - Jobs e lotes pendentes criados antes do pool atual são reenviados
+          (uma vez por processo).
+
+        Reenviar é seguro: a reserva condicional em _execute_job/_run_batch
+        garante que cada job e cada lote rodem uma única vez.
+
+        Returns:
+            Contagem de jobs interrompidos e de jobs/lotes reenviados
+        """
+        now = datetime.utcnow()
+        cutoff = now - timedelta(seconds=Config.RESEARCH_JOB_TIMEOUT)
+
+        interrupted = PesquisaJob.query.filter(
+            PesquisaJob.status == PesquisaJob.RUNNING,
+            PesquisaJob.started_at < cutoff
+        ).update({
+            'status': PesquisaJob.FAILED,
+            'stage': None,
+            'error': 'Pesquisa interrompida (o processamento foi reiniciado). Tente novamente.',
+            'error_category': 'warning',
+            'finished_at': now
+        }, synchronize_session=False)
+
+        running_jobs = db.session.query(PesquisaJob.id).filter(
+            PesquisaJob.lote_id == PesquisaLote.id,
+            PesquisaJob.status == PesquisaJob.RUNNING
+        ).exists()
+        stalled = PesquisaLote.query.filter(
+            PesquisaLote.status == PesquisaJob.RUNNING,
+            db.func.coalesce(PesquisaLote.heartbeat_at, PesquisaLote.started_at) < cutoff,
+            ~running_jobs
+        ).all()
+        for lote in stalled:
+            lote.status = PesquisaJob.PENDING
+        db.session.commit()
+
+        # Lotes parados: sempre reenviados; pendentes: uma vez por processo
+        batches = [lote.id for lote in stalled]
+        batches += [
+            lote_id for (lote_id,) in db.session.query(PesquisaLote.id).filter(
+                PesquisaLote.status == PesquisaJob.PENDING,
+                PesquisaLote.created_at < self._pool_started
+            )
+            if ('lote', lote_id) not in self._resubmitted and lote_id not in batches
+        ]
+        jobs = [
+            job_id for (job_id,) in db.session.query(PesquisaJob.id).filter(
+                PesquisaJob.status == PesquisaJob.PENDING,
+                PesquisaJob.lote_id.is_(None),
+                PesquisaJob.created_at < self._pool_started
+            )
+            if ('job', job_id) not in self._resubmitted
+        ]
+
+        for lote_id in batches:
+            self._resubmitted.add(('lote', lote_id))
+            self._submit(_run_batch, lote_id)
+        for job_id in jobs:
+            self._resubmitted.add(('job', job_id))
+            self._submit(_run_job, job_id)
+
+        if interrupted or batches or jobs:
+            print(f"♻️ Fila retomada: {interrupted} interrompidos, "
+                  f"{len(jobs)} pesquisas e {len(batches)} lotes reenviados")
+        return {'interrompidos': interrupted, 'pesquisas': len(jobs), 'lotes': len(batches)}
@@ -0,0 +1,148 @@
+# -*- coding: utf-8 -*-
+"""
+Serviço de Pesquisa de Preços - Preço Ágil
+Coleta, análise estatística, relatório PDF e registro de uma pesquisa
+"""
+
+import os
+from datetime import datetime
+from typing import Callable, Dict, Optional
+
+from app.models import db
+from app.models.models import AuditLog, Pesquisa
+
+
+class ResearchError(Exception):
+    """Pesquisa sem resultado utilizável (mensagem exibida ao usuário)"""
+
+    def __init__(self, message: str, category: str = 'warning'):
+        super().__init__(message)
+        self.category = category
+
+
+class ResearchService:
+    """
+    Executa uma pesquisa de preços completa e a registra no histórico
+
+    Usado tanto pela rota (modo síncrono) quanto pelos workers da fila de
+    pesquisas. Os gráficos não são gerados aqui: a página da pesquisa os
+    monta a partir dos preços armazenados.
+    """
+
+    def __init__(self, collector, analyzer, doc_generator):
+        self.collector = collector
+        self.analyzer = analyzer
+        self.doc_generator = doc_generator
+
+    def run(
+        self,
+        item_code: str,
+        catalog_type: str,
+        user_id: int,
+        responsible_agent: str,
+        region: Optional[str] = None,
+        progress: Optional[Callable[[str], None]] = None,
+        concurrent: Optional[bool] = None,
+        price_data: Optional[Dict] = None
+    ) -> Pesquisa:
+        """
+        Executa a pesquisa
+
+        Args:
+            progress: Chamado com o nome de cada etapa
+            concurrent: Consulta as fontes em paralelo (ver collect_prices_with_fallback)
+            price_data: Coleta já realizada (ex.: a da pesquisa em fluxo), usada
+                no lugar de uma nova consulta às fontes
+
+        Raises:
+            ResearchError: Nenhum preço (válido) encontrado ou amostra insuficiente
+        """
+        report = progress or (lambda etapa: None)
+
+        # Coleta preços
+        if price_data is None:
+            report('coletando preços')
+            price_data = self.collector.collect_prices_with_fallback(
+                item_code, catalog_type, region=region, concurrent=concurrent
+            )
+
+        if price_data['total_prices'] == 0:
+            raise ResearchError('Nenhum preço encontrado para este item.', 'warning')
+
+        # Extrai valores para análise
+        prices_values = [p['price'] for p in price_data['prices'] if p.get('price') and p['price'] > 0]
+
+        if not prices_values:
+            raise ResearchError('Nenhum preço válido encontrado.', 'danger')
+
+        # Análise estatística
+        report('analisando preços')
+        stats = self.analyzer.analyze_prices(prices_values)
+
+        if 'error' in stats:
+            raise ResearchError(stats['error'], 'danger')
+
+        # Informações do catálogo
+        catalog_info = self.collector.get_catalog_info(item_code, catalog_type)
+
+        # Gera PDF
+        report('gerando relatório')
+        pdf_filename = None
+        try:
+            pdf_data = {
+                'item_code': item_code,
+                'catalog_type': catalog_type,
+                'catalog_info': catalog_info,
+                'catalog_source': 'CATMAT' if catalog_type == 'material' else 'CATSER',
+                'responsible_agent': responsible_agent,
+                'research_date': datetime.now().strftime('%d/%m/%Y %H:%M'),
+                'sources_consulted': price_data['sources'],
+                'prices_collected': price_data['prices'],
+                'filters_applied': price_data['filters'],
+                'sample_size': len(prices_values),
+                'statistical_analysis': stats
+            }
+            pdf_path = self.doc_generator.generate_research_report(pdf_data)
+            pdf_filename = os.path.basename(pdf_path)
+        except Exception as e:
+            print(f"⚠️ Erro ao gerar PDF: {e}")
+
+        # Serializa datas para JSON
+        prices_serializable = []
+        for p in price_data['prices']:
+            p_copy = p.copy()
+            if isinstance(p_copy.get('date'), datetime):
+                p_copy['date'] = p_copy['date'].isoformat()
+            prices_serializable.append(p_copy)
+
+        # Salva no banco
+        report('salvando')
+        pesquisa = Pesquisa(
+            user_id=user_id,
+            item_code=item_code,
+            item_description=catalog_info.get('description', 'N/A'),
+            catalog_type=catalog_type,
+            responsible_agent=responsible_agent,
+            stats=stats,
+            prices_collected=prices_serializable,
+            sources_consulted=price_data['sources'],
+            pdf_filename=pdf_filename
+        )
+
+        try:
+            db.session.add(pesquisa)
+            db.session.commit()
+
+            db.session.add(AuditLog(
+                user_id=user_id,
+                action='pesquisa_criada',
+                resource='pesquisa',
+                resource_id=pesquisa.id,
+                details={'item': f"{item_code} ({catalog_type})", 'valor': stats.get('estimated_value')}
+            ))
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+
+        return pesquisa
@@ -90,8 +90,143 @@ document.addEventListener('DOMContentLoaded', function() {
     
     // Configura o theme switcher
     setupThemeSwitcher();
+    
+    // Autocompletar da descrição do item
+    configurarSugestoes();
+    
+    // Resultados da pesquisa de preços à medida que as fontes respondem
+    configurarPesquisaStream();
 });
 
+/**
+ * Pesquisa de preços em fluxo (SSE): mostra cada fonte assim que responde e,
+ * ao final, abre a pesquisa registrada pelo servidor com a mesma coleta
+ */
+function configurarPesquisaStream() {
+    const form = document.getElementById('form-pesquisa');
+    const progresso = document.getElementById('pesquisa-progresso');
+    
+    if (!form || !progresso || !form.dataset.streamUrl || !window.EventSource) return;
+    
+    const fontes = document.getElementById('pesquisa-fontes');
+    const parcial = document.getElementById('pesquisa-parcial');
+    const moeda = new Intl.NumberFormat('pt-BR', {style: 'currency', currency: 'BRL'});
+    
+    const mostrarEstatisticas = function(stats) {
+        if (stats.error) {
+            parcial.textContent = `${stats.sample_size} preços até agora`;
+        } else {
+            parcial.textContent = `${stats.sample_size} preços · mediana ${moeda.format(stats.median)} · ` +
+                `estimativa parcial ${moeda.format(stats.estimated_value)} (${stats.recommended_method})`;
+        }
+    };
+    
+    form.addEventListener('submit', function(e) {
+        if (form.dataset.enviando) return;
+        e.preventDefault();
+        
+        const params = new URLSearchParams({
+            item_code: form.elements['item_code'].value,
+            catalog_type: form.elements['catalog_type'].value,
+            region: form.elements['region'].value
+        });
+        
+        fontes.innerHTML = '';
+        parcial.className = 'alert alert-secondary small mt-2 mb-0';
+        parcial.textContent = 'Aguardando a primeira fonte...';
+        progresso.classList.remove('d-none');
+        form.querySelector('button[type="submit"]').disabled = true;
+        
+        // Pesquisa pelo POST normal, apenas se o fluxo falhar
+        const enviar = function() {
+            stream.close();
+            form.dataset.enviando = '1';
+            form.submit();
+        };
+        
+        const stream = new EventSource(`${form.dataset.streamUrl}?${params}`);
+        
+        stream.addEventListener('fonte', function(event) {
+            const data = JSON.parse(event.data);
+            const li = document.createElement('li');
+            li.className = 'list-group-item d-flex justify-content-between px-0';
+            li.textContent = data.local ? `💾 ${data.fonte}` : data.fonte;
+            const badge = document.createElement('span');
+            badge.className = `badge ${data.quantidade ? 'bg-success' : 'bg-secondary'}`;
+            badge.textContent = data.quantidade;
+            li.appendChild(badge);
+            fontes.appendChild(li);
+            mostrarEstatisticas(data.estatisticas);
+        });
+        
+        stream.addEventListener('concluido', function(event) {
+            mostrarEstatisticas(JSON.parse(event.data).estatisticas);
+            parcial.textContent += ' — gerando relatório...';
+        });
+        
+        stream.addEventListener('salvo', function(event) {
+            stream.close();
+            window.location.href = JSON.parse(event.data).resultado_url;
+        });
+        
+        stream.addEventListener('sem_resultado', function(event) {
+            const data = JSON.parse(event.data);
+            stream.close();
+            parcial.className = `alert alert-${data.categoria} small mt-2 mb-0`;
+            parcial.textContent = data.erro;
+            form.querySelector('button[type="submit"]').disabled = false;
+        });
+        
+        stream.addEventListener('falha', enviar);
+        stream.onerror = enviar;
+    });
+}
+
+/**
+ * Autocompletar da descrição (datalist alimentado por /api/sugestoes)
+ */
+function configurarSugestoes() {
+    const input = document.getElementById('descricao');
+    const lista = document.getElementById('sugestoes-descricao');
+    
+    if (!input || !lista || !input.dataset.sugestoesUrl) return;
+    
+    let timer = null;
+    let controller = null;
+    
+    input.addEventListener('input', function() {
+        clearTimeout(timer);
+        timer = setTimeout(function() {
+            const texto = input.value;
+            if (texto.trim().length < 2) {
+                lista.innerHTML = '';
+                return;
+            }
+            
+            // Cancela a requisição da tecla anterior
+            if (controller) controller.abort();
+            controller = new AbortController();
+            
+            fetch(`${input.dataset.sugestoesUrl}?q=${encodeURIComponent(texto)}`, {signal: controller.signal})
+                .then(response => response.json())
+                .then(function(data) {
+                    lista.innerHTML = '';
+                    data.sugestoes.forEach(function(sugestao) {
+                        const option = document.createElement('option');
+                        option.value = sugestao.texto;
+                        option.label = `${sugestao.itens} itens`;
+                        lista.appendChild(option);
+                    });
+                })
+                .catch(function(error) {
+                    if (error.name !== 'AbortError') {
+                        console.warn('⚠️ Erro ao buscar sugestões:', error);
+                    }
+                });
+        }, 80);
+    });
+}
+
 /**
  * Inicializa event listeners nos botões
  */
@@ -29,6 +29,40 @@ class Config:
     # Rate limiting
     PAINEL_PRECOS_RATE_LIMIT = float(os.getenv("PAINEL_PRECOS_RATE_LIMIT", "0.5"))
     
+    # Coleta concorrente das fontes de preços
+    COLLECTOR_CONCURRENT = os.getenv('COLLECTOR_CONCURRENT', 'true').lower() == 'true'
+    COLLECTOR_MAX_WORKERS = int(os.getenv('COLLECTOR_MAX_WORKERS', 16))
+    COLLECTOR_DEADLINE = float(os.getenv('COLLECTOR_DEADLINE', 45))  # segundos por pesquisa
+    
+    # Fila de pesquisas: executa as pesquisas em um pool de processos
+    RESEARCH_JOBS_ENABLED = os.getenv('RESEARCH_JOBS_ENABLED', 'true').lower() == 'true'
+    RESEARCH_WORKERS = int(os.getenv('RESEARCH_WORKERS', 2))
+    # Retomada da fila: job em execução há mais que isto (s) é dado como interrompido;
+    # a verificação roda na primeira requisição do processo e depois a cada intervalo (s)
+    RESEARCH_JOB_TIMEOUT = int(os.getenv('RESEARCH_JOB_TIMEOUT', 1800))
+    RESEARCH_RECOVERY_INTERVAL = int(os.getenv('RESEARCH_RECOVERY_INTERVAL', 300))
+    # Pesquisa em massa: itens por lote e itens pesquisados em paralelo no lote
+    RESEARCH_BATCH_MAX_ITEMS = int(os.getenv('RESEARCH_BATCH_MAX_ITEMS', 500))
+    RESEARCH_BATCH_CONCURRENCY = int(os.getenv('RESEARCH_BATCH_CONCURRENCY', 8))
+    
+    # Armazém local de preços
+    WAREHOUSE_ENABLED = os.getenv('WAREHOUSE_ENABLED', 'true').lower() == 'true'
+    WAREHOUSE_SYNC_INTERVAL = float(os.getenv('WAREHOUSE_SYNC_INTERVAL', 6))  # horas
+    
+    # Paginação concorrente
+    PAGINATION_CONCURRENCY = int(os.getenv('PAGINATION_CONCURRENCY', 4))  # páginas em voo por busca
+    PAGINATION_MAX_WORKERS = int(os.getenv('PAGINATION_MAX_WORKERS', 16))
+    
+    # PNCP: varredura paginada de contratos filtrada pelo item
+    PNCP_PAGE_SIZE = int(os.getenv('PNCP_PAGE_SIZE', 500))
+    PNCP_MAX_PAGES = int(os.getenv('PNCP_MAX_PAGES', 20))
+    PNCP_TARGET_SAMPLES = int(os.getenv('PNCP_TARGET_SAMPLES', 50))  # parada antecipada
+    PNCP_MAX_ITEM_LOOKUPS = int(os.getenv('PNCP_MAX_ITEM_LOOKUPS', 60))
+    
+    # Pool de conexões HTTP compartilhado pelos clientes das APIs
+    HTTP_POOL_HOSTS = int(os.getenv('HTTP_POOL_HOSTS', 20))  # hosts com pool próprio
+    HTTP_POOL_LIMIT_PER_HOST = int(os.getenv('HTTP_POOL_LIMIT_PER_HOST', 20))
+    
     # Banco de dados
     SQLALCHEMY_DATABASE_URI = os.getenv('DATABASE_URL', 'sqlite:///preco_agil.db')
     SQLALCHEMY_TRACK_MODIFICATIONS = False
@@ -50,6 +84,53 @@ class Config:
     CATMAT_FILE = os.path.join(DATA_DIR, 'catmat.csv')
     CATSER_FILE = os.path.join(DATA_DIR, 'catser.csv')
     
+    # Carregamento dos catálogos em segundo plano (o app atende enquanto carrega)
+    CATALOG_BACKGROUND_LOAD = os.getenv('CATALOG_BACKGROUND_LOAD', 'true').lower() == 'true'
+    
+    # Snapshot binário dos catálogos (índice pré-compilado, aberto via mmap)
+    CATALOG_SNAPSHOT_ENABLED = os.getenv('CATALOG_SNAPSHOT_ENABLED', 'true').lower() == 'true'
+    CATMAT_SNAPSHOT = os.path.join(DATA_DIR, 'catmat.idx')
+    CATSER_SNAPSHOT = os.path.join(DATA_DIR, 'catser.idx')
+    
+    # Linhas lidas por bloco na ingestão em fluxo dos CSVs de catálogo
+    CATALOG_CSV_CHUNKSIZE = int(os.getenv('CATALOG_CSV_CHUNKSIZE', 10000))
+    
+    # Máximo de entradas por consulta em lote ao catálogo (/api/catalogo/lote)
+    CATALOG_BATCH_MAX_ITEMS = int(os.getenv('CATALOG_BATCH_MAX_ITEMS', 5000))
+    
+    # Recarga a quente dos CSVs republicados (intervalo de verificação em s; 0 desativa)
+    CATALOG_WATCH_INTERVAL = int(os.getenv('CATALOG_WATCH_INTERVAL', 60))
+    # Fração máxima de itens alterados aplicada como sobreposição (acima disso, reindexa tudo)
+    CATALOG_RELOAD_MAX_DIFF = float(os.getenv('CATALOG_RELOAD_MAX_DIFF', 0.05))
+    
+    # Cache persistente das respostas das APIs ('sqlite' ou 'memory')
+    API_CACHE_BACKEND = os.getenv('API_CACHE_BACKEND', 'sqlite')
+    API_CACHE_DB = os.getenv('API_CACHE_DB', os.path.join(DATA_DIR, 'api_cache.sqlite3'))
+    API_CACHE_MAX_ENTRIES = int(os.getenv('API_CACHE_MAX_ENTRIES', 50000))
+    API_CACHE_L1_MAX_ITEMS = int(os.getenv('API_CACHE_L1_MAX_ITEMS', 1000))
+    API_CACHE_L1_MAX_BYTES = int(os.getenv('API_CACHE_L1_MAX_BYTES', 0))  # 0 = sem limite por bytes
+    
+    # Rate limiting compartilhado entre workers ('sqlite' ou 'memory')
+    RATE_LIMIT_BACKEND = os.getenv('RATE_LIMIT_BACKEND', 'sqlite')
+    RATE_LIMIT_DB = os.getenv('RATE_LIMIT_DB', os.path.join(DATA_DIR, 'rate_limits.sqlite3'))
+    
+    # Circuit breaker por fonte: falhas consecutivas para abrir e espera (s) até testar de novo
+    CIRCUIT_FAILURE_THRESHOLD = int(os.getenv('CIRCUIT_FAILURE_THRESHOLD', 3))
+    CIRCUIT_RESET_TIMEOUT = float(os.getenv('CIRCUIT_RESET_TIMEOUT', 60))
+    
+    # Timeout adaptativo: fator x percentil das latências recentes (limitado ao timeout do cliente)
+    ADAPTIVE_TIMEOUT_PERCENTILE = float(os.getenv('ADAPTIVE_TIMEOUT_PERCENTILE', 95))
+    ADAPTIVE_TIMEOUT_FACTOR = float(os.getenv('ADAPTIVE_TIMEOUT_FACTOR', 3))
+    ADAPTIVE_TIMEOUT_MIN = float(os.getenv('ADAPTIVE_TIMEOUT_MIN', 2))
+    ADAPTIVE_TIMEOUT_MIN_SAMPLES = int(os.getenv('ADAPTIVE_TIMEOUT_MIN_SAMPLES', 10))
+    
+    # Hedging: cópia da requisição que passa do percentil (clientes com HEDGE_REQUESTS)
+    HEDGE_ENABLED = os.getenv('HEDGE_ENABLED', 'true').lower() == 'true'
+    HEDGE_PERCENTILE = float(os.getenv('HEDGE_PERCENTILE', 95))
+    HEDGE_BUDGET_RATIO = float(os.getenv('HEDGE_BUDGET_RATIO', 0.05))  # cópias / requisições
+    HEDGE_BUDGET_BURST = float(os.getenv('HEDGE_BUDGET_BURST', 5))
+    HEDGE_MAX_WORKERS = int(os.getenv('HEDGE_MAX_WORKERS', 32))
+    
     # Servidor
     HOST = os.getenv('HOST', '0.0.0.0')
     PORT = int(os.getenv('PORT', 8000))
\ No newline at end of file
@@ -0,0 +1,380 @@
+import json
+import os
+import tempfile
+import threading
+import time
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest import mock
+
+from app.api.base_client import (
+    BaseAPIClient, CacheManager, RateLimiter, SingleFlight, SQLiteCacheBackend, SQLiteRateLimitBackend
+)
+from app.api.fallback_manager import (
+    APIFallbackManager, CircuitBreaker, HedgeBudget, remaining_time, run_with_deadline
+)
+
+
+class CacheManagerTestCase(unittest.TestCase):
+
+    def test_lru_keeps_recently_read_keys(self):
+        """Reading a key refreshes it, so the cold key is evicted instead."""
+        cache = CacheManager(ttl_seconds=60, max_size=2)
+        cache.set('a', 1)
+        cache.set('b', 2)
+        self.assertEqual(cache.get('a'), 1)
+        cache.set('c', 3)
+
+        self.assertEqual(cache.get('a'), 1)
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual(cache.get('c'), 3)
+        self.assertEqual(cache.stats()['evictions'], 1)
+
+    def test_ttl_expiry_is_lazy(self):
+        cache = CacheManager(ttl_seconds=0)
+        cache.set('a', 1)
+        self.assertIsNone(cache.get('a'))
+        stats = cache.stats()
+        self.assertEqual(stats['expirations'], 1)
+        self.assertEqual(stats['total_items'], 0)
+
+    def test_byte_budget(self):
+        cache = CacheManager(ttl_seconds=60, max_size=100, max_bytes=10, size_fn=len)
+        cache.set('a', 'xxxxxx')
+        cache.set('b', 'yyyyyy')
+        self.assertIsNone(cache.get('a'))
+        self.assertEqual(cache.get('b'), 'yyyyyy')
+        self.assertEqual(cache.stats()['bytes'], 6)
+
+    def test_hit_miss_counters(self):
+        cache = CacheManager(ttl_seconds=60)
+        cache.set('a', 1)
+        cache.get('a')
+        cache.get('missing')
+        stats = cache.stats()
+        self.assertEqual((stats['hits'], stats['misses']), (1, 1))
+        self.assertEqual(stats['hit_rate'], 0.5)
+
+
+class SingleFlightTestCase(unittest.TestCase):
+
+    def test_concurrent_identical_calls_share_one_execution(self):
+        flight = SingleFlight()
+        calls = []
+        results = []
+
+        def fetch():
+            calls.append(1)
+            time.sleep(0.2)
+            return {'ok': True}
+
+        threads = [
+            threading.Thread(target=lambda: results.append(flight.do('k', fetch)))
+            for _ in range(10)
+        ]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(results, [{'ok': True}] * 10)
+        self.assertEqual(flight.shared, 9)
+
+    def test_errors_propagate_and_key_is_released(self):
+        flight = SingleFlight()
+        with self.assertRaises(ValueError):
+            flight.do('k', lambda: (_ for _ in ()).throw(ValueError('falha')))
+        self.assertEqual(flight.do('k', lambda: 1), 1)
+
+
+class RateLimiterTestCase(unittest.TestCase):
+
+    def test_burst_then_exact_wait(self):
+        """max_calls pass immediately; the next one gets the exact wait, not a poll."""
+        limiter = RateLimiter()
+        for _ in range(3):
+            self.assertTrue(limiter.is_allowed('k', 3, 3))
+        self.assertFalse(limiter.is_allowed('k', 3, 3))
+
+        wait = limiter._acquire('k', 3, 3, reserve=True)
+        self.assertAlmostEqual(wait, 1.0, delta=0.05)
+
+    def test_shared_state_between_limiters(self):
+        """Two limiters (two workers) on the same SQLite file share one quota."""
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = os.path.join(tmpdir, 'limits.sqlite3')
+            worker_a = RateLimiter(backend=SQLiteRateLimitBackend(path))
+            worker_b = RateLimiter(backend=SQLiteRateLimitBackend(path))
+
+            self.assertTrue(worker_a.is_allowed('PNCPClient:/contratos', 2, 60))
+            self.assertTrue(worker_b.is_allowed('PNCPClient:/contratos', 2, 60))
+            self.assertFalse(worker_a.is_allowed('PNCPClient:/contratos', 2, 60))
+            self.assertFalse(worker_b.is_allowed('PNCPClient:/contratos', 2, 60))
+
+
+class SQLiteCacheBackendTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmpdir.name, 'cache.sqlite3')
+        self.backend = SQLiteCacheBackend(self.path, max_entries=10)
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_set_and_get_roundtrip(self):
+        """Values are stored as JSON and namespaced per client."""
+        self.backend.set('PNCPClient', 'k', {'data': [1, 2]}, ttl_seconds=60)
+        self.assertEqual(self.backend.get('PNCPClient', 'k'), {'data': [1, 2]})
+        self.assertIsNone(self.backend.get('BrasilAPIClient', 'k'))
+
+    def test_expired_entries_are_not_returned(self):
+        self.backend.set('ns', 'k', {'v': 1}, ttl_seconds=-1)
+        self.assertIsNone(self.backend.get('ns', 'k'))
+
+    def test_size_bounded_eviction(self):
+        """Once over max_entries the oldest entries are evicted."""
+        for i in range(SQLiteCacheBackend.EVICTION_CHECK_EVERY):
+            self.backend.set('ns', f'k{i}', i, ttl_seconds=60)
+        count = self.backend._connect().execute('SELECT COUNT(*) FROM cache_entries').fetchone()[0]
+        self.assertLessEqual(count, 10)
+        self.assertEqual(self.backend.get('ns', f'k{SQLiteCacheBackend.EVICTION_CHECK_EVERY - 1}'),
+                         SQLiteCacheBackend.EVICTION_CHECK_EVERY - 1)
+
+    def test_shared_between_cache_managers(self):
+        """A second CacheManager (another worker) reads what the first one wrote."""
+        writer = CacheManager(ttl_seconds=60, backend=self.backend, namespace='ns')
+        reader = CacheManager(ttl_seconds=60, backend=SQLiteCacheBackend(self.path), namespace='ns')
+        writer.set('k', {'v': 1})
+        self.assertEqual(reader.get('k'), {'v': 1})
+
+        writer.clear()
+        self.assertIsNone(SQLiteCacheBackend(self.path).get('ns', 'k'))
+
+    def test_l2_hit_keeps_the_remaining_lifetime_in_l1(self):
+        writer = CacheManager(ttl_seconds=60, backend=self.backend, namespace='ns')
+        writer.set('k', {'v': 1})
+        # Entrada do L2 a 5 s de expirar
+        self.backend._connect().execute(
+            "UPDATE cache_entries SET expires_at = ? WHERE key = 'k'", (time.time() + 5,)
+        )
+
+        reader = CacheManager(ttl_seconds=60, backend=SQLiteCacheBackend(self.path), namespace='ns')
+        self.assertEqual(reader.get('k'), {'v': 1})
+        self.assertEqual(reader.stats()['l2_hits'], 1)
+        self.assertGreater(reader.stats()['oldest'], 54)
+
+
+class SharedConnectionPoolTestCase(unittest.TestCase):
+
+    def setUp(self):
+        config = mock.patch.multiple(
+            'app.api.base_client.Config', API_CACHE_BACKEND='memory', RATE_LIMIT_BACKEND='memory'
+        )
+        config.start()
+        self.addCleanup(config.stop)
+
+    def test_clients_share_one_pool_but_keep_their_headers(self):
+        first = BaseAPIClient('https://a.example', headers={'User-Agent': 'A'})
+        second = BaseAPIClient('https://b.example')
+
+        self.assertIs(
+            first.session.get_adapter('https://a.example/x'),
+            second.session.get_adapter('https://b.example/y')
+        )
+        self.assertEqual(first.session.headers['User-Agent'], 'A')
+        self.assertEqual(second.session.headers['User-Agent'], 'PrecoAgil/1.0')
+
+
+class CircuitBreakerTestCase(unittest.TestCase):
+
+    def test_opens_after_consecutive_failures(self):
+        breaker = CircuitBreaker('fonte', failure_threshold=2, reset_timeout=60)
+        breaker.record_failure()
+        breaker.record_success()
+        breaker.record_failure()
+        self.assertTrue(breaker.allow_request())
+
+        breaker.record_failure()
+        self.assertEqual(breaker.state, CircuitBreaker.OPEN)
+        self.assertFalse(breaker.available())
+        self.assertFalse(breaker.allow_request())
+
+    def test_half_open_allows_a_single_probe(self):
+        breaker = CircuitBreaker('fonte', failure_threshold=1, reset_timeout=0.05)
+        breaker.record_failure()
+        time.sleep(0.06)
+
+        self.assertTrue(breaker.available())
+        self.assertTrue(breaker.allow_request())
+        self.assertEqual(breaker.state, CircuitBreaker.HALF_OPEN)
+        self.assertFalse(breaker.allow_request())
+
+        # Teste falhou: volta a abrir; depois, um teste bem-sucedido fecha
+        breaker.record_failure()
+        self.assertEqual(breaker.state, CircuitBreaker.OPEN)
+        time.sleep(0.06)
+        self.assertTrue(breaker.allow_request())
+        breaker.record_success(0.1)
+        self.assertEqual(breaker.state, CircuitBreaker.CLOSED)
+        self.assertTrue(breaker.allow_request())
+
+    def test_adaptive_timeout_follows_latency_percentile(self):
+        manager = APIFallbackManager(failure_threshold=3, reset_timeout=60)
+        self.assertEqual(manager.timeout_for('fonte', 30), 30)
+
+        for latency in [0.5] * 19 + [2.0]:
+            manager.record_success('fonte', latency)
+        self.assertEqual(manager.timeout_for('fonte', 30), 2.0)  # mínimo
+        self.assertEqual(manager.timeout_for('fonte', 1), 1)     # nunca acima do configurado
+
+        for latency in [4.0] * 20:
+            manager.record_success('fonte', latency)
+        self.assertEqual(manager.timeout_for('fonte', 30), 12.0)
+
+    def test_timeouts_do_not_hold_the_adaptive_timeout_down(self):
+        """A source that slowed down only times out; its timeouts must raise the value."""
+        manager = APIFallbackManager(failure_threshold=100, reset_timeout=60)
+        for _ in range(20):
+            manager.record_success('fonte', 0.5)
+        timeout = manager.timeout_for('fonte', 30)
+        self.assertEqual(timeout, 2.0)
+
+        for _ in range(10):
+            manager.record_failure('fonte', latency=timeout)
+            new_timeout = manager.timeout_for('fonte', 30)
+            self.assertGreaterEqual(new_timeout, timeout)
+            timeout = new_timeout
+        self.assertEqual(timeout, 30)
+
+
+class _SlowFirstHandler(BaseHTTPRequestHandler):
+    """Responde a primeira requisição com atraso e as demais na hora (status por ordem em server.status)"""
+
+    def do_GET(self):
+        with self.server.lock:
+            self.server.count += 1
+            n = self.server.count
+        if n == 1:
+            time.sleep(1.0)
+        body = json.dumps({'n': n}).encode()
+        self.send_response(self.server.status.get(n, 200))
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class HedgingTestCase(unittest.TestCase):
+
+    def setUp(self):
+        config = mock.patch.multiple(
+            'app.api.base_client.Config', API_CACHE_BACKEND='memory', RATE_LIMIT_BACKEND='memory'
+        )
+        config.start()
+        self.addCleanup(config.stop)
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), _SlowFirstHandler)
+        self.server.count = 0
+        self.server.status = {}
+        self.server.lock = threading.Lock()
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+        class HedgedClient(BaseAPIClient):
+            HEDGE_REQUESTS = True
+
+        self.client = HedgedClient(f'http://127.0.0.1:{self.server.server_port}', max_retries=1)
+        self.client.fallback = APIFallbackManager(failure_threshold=3, reset_timeout=60)
+        for _ in range(10):
+            self.client.fallback.record_success(self.client.source_name, 0.05)
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_slow_request_is_hedged_and_first_answer_wins(self):
+        with mock.patch.multiple('app.api.fallback_manager.Config', HEDGE_BUDGET_RATIO=1.0):
+            start = time.monotonic()
+            data = self.client.get('/itens', use_cache=False)
+
+        self.assertEqual(data, {'n': 2})
+        self.assertLess(time.monotonic() - start, 0.8)
+        self.assertEqual(self.client.fallback.source_status(self.client.source_name)['copias_enviadas'], 1)
+
+    def test_hedged_latency_counts_from_the_original(self):
+        self.client.fallback = APIFallbackManager(failure_threshold=3, reset_timeout=60)
+        for _ in range(10):
+            self.client.fallback.record_success(self.client.source_name, 0.2)
+
+        with mock.patch.multiple('app.api.fallback_manager.Config', HEDGE_BUDGET_RATIO=1.0):
+            self.client.get('/itens', use_cache=False)
+
+        # A cópia responde na hora; a amostra registrada é a da original (>= 0.2s)
+        breaker = self.client.fallback.breaker(self.client.source_name)
+        self.assertEqual(breaker.sample_count(), 11)
+        self.assertGreaterEqual(breaker.latency_percentile(0), 0.2)
+
+    def test_fast_error_from_the_copy_does_not_win(self):
+        self.server.status = {2: 503}
+        with mock.patch.multiple('app.api.fallback_manager.Config', HEDGE_BUDGET_RATIO=1.0):
+            data = self.client.get('/itens', use_cache=False)
+
+        self.assertEqual(data, {'n': 1})
+        self.assertEqual(self.server.count, 2)
+
+    def test_without_budget_waits_for_the_original(self):
+        data = self.client.get('/itens', use_cache=False)
+        self.assertEqual(data, {'n': 1})
+        self.assertEqual(self.server.count, 1)
+
+    def test_budget_bounds_hedges_to_ratio_of_requests(self):
+        budget = HedgeBudget(ratio=0.25, burst=2)
+        hedges = 0
+        for _ in range(100):
+            budget.deposit()
+            hedges += budget.withdraw()
+        self.assertEqual(hedges, 25)
+
+
+class DeadlineTestCase(unittest.TestCase):
+    """Prazo da coleta (run_with_deadline) limitando as requisições da thread"""
+
+    def setUp(self):
+        config = mock.patch.multiple(
+            'app.api.base_client.Config', API_CACHE_BACKEND='memory', RATE_LIMIT_BACKEND='memory'
+        )
+        config.start()
+        self.addCleanup(config.stop)
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), _SlowFirstHandler)
+        self.server.count = 0
+        self.server.status = {}
+        self.server.lock = threading.Lock()
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.addCleanup(self.server.server_close)
+        self.addCleanup(self.server.shutdown)
+
+        self.client = BaseAPIClient(f'http://127.0.0.1:{self.server.server_port}', max_retries=3)
+        self.client.fallback = APIFallbackManager(failure_threshold=3, reset_timeout=60)
+
+    def test_request_is_cut_at_the_deadline_without_counting_as_failure(self):
+        start = time.monotonic()
+        data = run_with_deadline(start + 0.2, self.client.get, '/itens', None, False)
+
+        self.assertIsNone(data)
+        self.assertLess(time.monotonic() - start, 0.6)
+        self.assertEqual(self.server.count, 1)  # sem retentativas
+        self.assertEqual(self.client.fallback.breaker(self.client.source_name).failures, 0)
+
+    def test_expired_deadline_sends_nothing(self):
+        self.assertIsNone(run_with_deadline(time.monotonic(), self.client.get, '/itens', None, False))
+        self.assertEqual(self.server.count, 0)
+        self.assertIsNone(remaining_time())
+
+
+if __name__ == '__main__':
+    unittest.main()
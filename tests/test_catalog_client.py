@@ -0,0 +1,99 @@
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from app.api.catalog_index import CatalogIndex
+from app.api.catmat_api import CATMATClient
+
+
+class CatalogCsvTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.csv = os.path.join(self.tmpdir.name, 'catmat.csv')
+        self.config = mock.patch.multiple(
+            'app.api.catalog_base.Config',
+            CATMAT_FILE=self.csv,
+            CATALOG_SNAPSHOT_ENABLED=False,
+            CATALOG_WATCH_INTERVAL=0,
+            CATALOG_CSV_CHUNKSIZE=2
+        )
+        self.config.start()
+
+    def tearDown(self):
+        self.config.stop()
+        self.tmpdir.cleanup()
+
+    def load(self, content: bytes) -> CATMATClient:
+        with open(self.csv, 'wb') as f:
+            f.write(content)
+        return CATMATClient(background=False)
+
+    def test_latin1_semicolon_with_preamble(self):
+        client = self.load(
+            'Consulta realizada em 01/01/2026\n'
+            'Grupo;Codigo do Item;Descrição do Item\n'
+            '75;1001;CANETA ESFEROGRÁFICA, AZUL\n'
+            '75;1002;CADEIRA GIRATÓRIA\n'
+            '75;1001;CANETA DUPLICADA\n'
+            '75;;SEM CÓDIGO\n'.encode('latin-1')
+        )
+        self.assertEqual(dict(client.catalog), {
+            '1001': 'CANETA ESFEROGRÁFICA, AZUL',
+            '1002': 'CADEIRA GIRATÓRIA',
+        })
+
+    def test_comma_delimited_with_quoted_fields(self):
+        client = self.load(
+            'descricao,codigo\n'
+            '"PAPEL A4, SULFITE",2001\n'
+            '"CLIPE; AÇO",2002\n'.encode('utf-8')
+        )
+        self.assertEqual(client.get_description('2001'), 'PAPEL A4, SULFITE')
+        self.assertEqual(client.search_by_description('clipe')[0]['codigo'], '2002')
+
+    def test_latin1_bytes_after_the_sample(self):
+        linhas = ''.join(f'{3000 + n};PAPEL SULFITE A4\n' for n in range(10))
+        with mock.patch.object(CATMATClient, 'SNIFF_BYTES', 64):
+            client = self.load(
+                b'codigo;descricao\n' + linhas.encode('ascii') + '4001;CANETA ESFEROGRÁFICA\n'.encode('latin-1')
+            )
+        self.assertEqual(client.get_description('4001'), 'CANETA ESFEROGRÁFICA')
+        self.assertEqual(len(client.catalog), 11)
+
+    def test_snapshot_hash_comes_from_the_single_read(self):
+        snapshot = os.path.join(self.tmpdir.name, 'catmat.idx')
+        linhas = ''.join(f'{3000 + n};PAPEL SULFITE A4\n' for n in range(10))
+        with mock.patch.multiple('app.api.catalog_base.Config', CATALOG_SNAPSHOT_ENABLED=True,
+                                 CATMAT_SNAPSHOT=snapshot), \
+                mock.patch.object(CATMATClient, 'SNIFF_BYTES', 64), \
+                mock.patch.object(CatalogIndex, 'source_fingerprint', wraps=CatalogIndex.source_fingerprint) as fp:
+            client = self.load(
+                b'codigo;descricao\n' + linhas.encode('ascii') + '4001;CANETA ESFEROGRÁFICA\n'.encode('latin-1')
+            )
+        self.assertEqual(client.get_description('4001'), 'CANETA ESFEROGRÁFICA')
+        # Nenhuma leitura extra do CSV para calcular o SHA-1 do snapshot
+        self.assertTrue(fp.called)
+        self.assertTrue(all(call.kwargs.get('with_hash') is False for call in fp.call_args_list))
+
+        # mtime alterado: a validade do snapshot passa a depender do SHA-1
+        os.utime(self.csv, (0, 0))
+        self.assertIsNotNone(CatalogIndex.load(snapshot, source_path=self.csv))
+
+    def test_reload_waits_for_initial_load(self):
+        client = self.load(b'codigo;descricao\n1001;CANETA\n')
+        with open(self.csv, 'ab') as f:
+            f.write(b'1002;LAPIS\n')
+
+        client._loaded.clear()  # carga inicial ainda em andamento
+        self.assertEqual(client.reload()['resultado'], 'carga inicial em andamento')
+        self.assertEqual(len(client.catalog), 1)
+
+        client._loaded.set()
+        client.reload()
+        self.assertEqual(client.get_description('1002'), 'LAPIS')
+
+
+if __name__ == '__main__':
+    unittest.main()
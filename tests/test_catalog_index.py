@@ -0,0 +1,184 @@
+import os
+import tempfile
+import threading
+import unittest
+
+from app.api.catalog_index import CatalogIndex, CatalogMapping, OverlayIndex, bounded_levenshtein
+
+
+CATALOGO = [
+    ('1001', 'CANETA ESFEROGRÁFICA, COR AZUL'),
+    ('1002', 'CANETA ESFEROGRÁFICA, COR PRETA'),
+    ('1003', 'CADEIRA GIRATÓRIA ESCRITÓRIO'),
+    ('1004', 'PAPEL SULFITE A4 (AZUL)'),
+]
+
+
+class CatalogIndexTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.index = CatalogIndex(CATALOGO)
+
+    def test_multi_word_query_intersects_postings(self):
+        self.assertEqual(self.index.search('caneta azul'), ['1001'])
+        self.assertEqual(self.index.search('caneta'), ['1001', '1002'])
+
+    def test_prefix_and_accent_insensitive(self):
+        """Terms match token prefixes, and accents/punctuation are ignored."""
+        self.assertEqual(self.index.search('cad girat'), ['1003'])
+        self.assertEqual(self.index.search('azul'), ['1001', '1004'])
+
+    def test_short_terms_are_ignored(self):
+        self.assertEqual(self.index.search('a4'), [])
+        self.assertEqual(self.index.search('papel a4'), ['1004'])
+
+    def test_no_match(self):
+        self.assertEqual(self.index.search('caneta verde'), [])
+
+    def test_rank_boosts_leading_words(self):
+        """'azul' as the item's leading word outranks it as a trailing attribute."""
+        index = CatalogIndex(CATALOGO + [('1005', 'AZUL DE METILENO, SOLUÇÃO')])
+        ranked = index.rank('azul')
+        self.assertEqual(ranked[0][0], '1005')
+        self.assertEqual({code for code, _ in ranked}, {'1001', '1004', '1005'})
+        self.assertTrue(all(score > 0 for _, score in ranked))
+
+    def test_fuzzy_fallback_for_misspelled_terms(self):
+        self.assertEqual(self.index.search('caneta esferografica azull'), ['1001'])
+        self.assertEqual(self.index.search('cadeira giratorai'), ['1003'])
+        self.assertEqual(self.index.search('caneta azull', fuzzy=False), [])
+
+    def test_bounded_levenshtein(self):
+        self.assertEqual(bounded_levenshtein('azull', 'azul', 1), 1)
+        self.assertIsNone(bounded_levenshtein('caneta', 'cadeira', 2))
+
+    def test_suggest_completes_last_word_by_frequency(self):
+        self.assertEqual(self.index.suggest('ca'), [('caneta', 2), ('cadeira', 1)])
+        self.assertEqual(self.index.suggest('caneta esf'), [('caneta esferografica', 2)])
+        self.assertEqual(self.index.suggest('caneta '), [])
+
+    def test_lookup_by_code(self):
+        """Numeric codes are stored as int64; other codes fall back to a string column."""
+        self.assertEqual(self.index.description(' 1003 '), 'CADEIRA GIRATÓRIA ESCRITÓRIO')
+        self.assertIsNone(self.index.description('01003'))
+
+        index = CatalogIndex([('B-2', 'CANETA'), ('A-1', 'PAPEL')])
+        self.assertEqual(index.description('A-1'), 'PAPEL')
+        self.assertIsNone(index.description('C-3'))
+
+    def test_descriptions_many(self):
+        self.assertEqual(
+            self.index.descriptions_many(['1004', '9999', 'abc', ' 1001']),
+            ['PAPEL SULFITE A4 (AZUL)', None, None, 'CANETA ESFEROGRÁFICA, COR AZUL']
+        )
+
+    def test_rank_falls_back_to_any_term(self):
+        ranked = self.index.rank('caneta verde')
+        self.assertEqual([code for code, _ in ranked], ['1001', '1002'])
+
+
+class OverlayIndexTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.base = CatalogIndex(CATALOGO)
+        novo = [
+            ('1001', 'CANETA ESFEROGRÁFICA, COR AZUL'),
+            ('1002', 'CANETA HIDROGRÁFICA, COR PRETA'),
+            ('1004', 'PAPEL SULFITE A4 (AZUL)'),
+            ('1006', 'CANETA MARCA-TEXTO AMARELA'),
+        ]
+        self.changed, self.removed = OverlayIndex.diff(self.base, novo)
+        self.index = OverlayIndex(self.base, self.changed, self.removed)
+
+    def test_diff(self):
+        self.assertEqual(set(self.changed), {'1002', '1006'})
+        self.assertEqual(self.removed, ['1003'])
+
+    def test_overlay_masks_changed_and_removed_items(self):
+        self.assertEqual(len(self.index), 4)
+        self.assertIsNone(self.index.description('1003'))
+        self.assertEqual(self.index.description('1002'), 'CANETA HIDROGRÁFICA, COR PRETA')
+        self.assertEqual(
+            sorted(item['codigo'] for item in self.index.items('caneta')),
+            ['1001', '1002', '1006']
+        )
+        self.assertEqual(self.index.items('esferografica preta'), [])
+        self.assertEqual(self.index.items('cadeira'), [])
+        self.assertEqual(dict(CatalogMapping(self.index)), dict(self.index.iter_items()))
+        self.assertEqual(
+            self.index.descriptions_many(['1002', '1003', '1006']),
+            ['CANETA HIDROGRÁFICA, COR PRETA', None, 'CANETA MARCA-TEXTO AMARELA']
+        )
+
+    def test_suggest_ignores_hidden_items(self):
+        # 1002 e 1006 vêm da sobreposição; a versão antiga de 1002 e o 1003 removido não contam
+        self.assertEqual(self.index.suggest('ca'), [('caneta', 3)])
+        self.assertEqual(self.index.suggest('caneta esf'), [('caneta esferografica', 1)])
+
+    def test_overlay_scores_use_base_corpus_statistics(self):
+        base_items = [(str(2000 + n), f'PAPEL SULFITE MODELO {n}') for n in range(30)] + CATALOGO[:2]
+        novo = base_items + [('1007', 'CANETA AZUL METÁLICA')]
+        base = CatalogIndex(base_items)
+        index = OverlayIndex(base, *OverlayIndex.diff(base, novo))
+
+        ranked = index.items('azul caneta', ranked=True)
+        full = CatalogIndex(novo).items('azul caneta', ranked=True)
+        self.assertEqual([item['codigo'] for item in ranked], [item['codigo'] for item in full])
+        self.assertAlmostEqual(ranked[0]['score'], full[0]['score'], delta=0.05 * full[0]['score'])
+
+    def test_diff_aborts_over_max_changes(self):
+        novo = [(code, desc + ' REVISADA') for code, desc in CATALOGO]
+        self.assertIsNone(OverlayIndex.diff(self.base, iter(novo), max_changes=3))
+        changed, removed = OverlayIndex.diff(self.base, iter(novo), max_changes=4)
+        self.assertEqual((len(changed), removed), (4, []))
+
+
+class CatalogSnapshotTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.csv = os.path.join(self.tmpdir.name, 'catmat.csv')
+        self.snapshot = os.path.join(self.tmpdir.name, 'catmat.idx')
+        with open(self.csv, 'w') as f:
+            f.write('conteudo original')
+        CatalogIndex(CATALOGO).save(self.snapshot, self.csv)
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_roundtrip_through_mmap(self):
+        index = CatalogIndex.load(self.snapshot, source_path=self.csv)
+        self.assertEqual(index.search('caneta azull'), ['1001'])
+        self.assertEqual(index.rank('azul'), CatalogIndex(CATALOGO).rank('azul'))
+
+        catalog = CatalogMapping(index)
+        self.assertEqual(catalog.get('1003'), 'CADEIRA GIRATÓRIA ESCRITÓRIO')
+        self.assertIsNone(catalog.get('9999'))
+        self.assertEqual(len(catalog), 4)
+
+    def test_touched_source_with_same_content_is_still_valid(self):
+        os.utime(self.csv, (0, 0))
+        self.assertIsNotNone(CatalogIndex.load(self.snapshot, source_path=self.csv))
+
+    def test_concurrent_saves_in_one_process_publish_a_valid_snapshot(self):
+        threads = [
+            threading.Thread(target=CatalogIndex(CATALOGO).save, args=(self.snapshot, self.csv))
+            for _ in range(4)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        index = CatalogIndex.load(self.snapshot, source_path=self.csv)
+        self.assertEqual(index.search('caneta azull'), ['1001'])
+        self.assertEqual(sorted(os.listdir(self.tmpdir.name)), ['catmat.csv', 'catmat.idx'])
+
+    def test_changed_source_invalidates(self):
+        with open(self.csv, 'w') as f:
+            f.write('conteudo alterado')
+        self.assertIsNone(CatalogIndex.load(self.snapshot, source_path=self.csv))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,123 @@
+import threading
+import time
+import unittest
+
+from app.api.fallback_manager import remaining_time, run_with_deadline
+from app.api.pagination import iter_pages, total_pages_from
+
+
+class StubSource:
+    """Fonte paginada em memória: `pages` páginas de `per_page` itens"""
+
+    def __init__(self, pages, per_page=2, delay=0.0, failing=()):
+        self.pages = pages
+        self.per_page = per_page
+        self.delay = delay
+        self.failing = set(failing)
+        self.fetched = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.lock = threading.Lock()
+
+    def fetch(self, page):
+        with self.lock:
+            self.fetched.append(page)
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            time.sleep(self.delay)
+            if page in self.failing:
+                raise RuntimeError(f'página {page} falhou')
+            if page > self.pages:
+                return {'itens': [], 'totalPaginas': self.pages}
+            start = (page - 1) * self.per_page
+            return {'itens': list(range(start, start + self.per_page)), 'totalPaginas': self.pages}
+        finally:
+            with self.lock:
+                self.in_flight -= 1
+
+    def iterate(self, total=True, **kwargs):
+        return iter_pages(
+            fetch_page=self.fetch,
+            extract_items=lambda data: data['itens'],
+            total_pages=(lambda data: data['totalPaginas']) if total else (lambda data: None),
+            **kwargs
+        )
+
+
+class IterPagesTestCase(unittest.TestCase):
+
+    def test_first_page_first_then_every_page_once(self):
+        source = StubSource(pages=6, delay=0.01)
+        pages = list(source.iterate(concurrency=3))
+
+        self.assertEqual(pages[0], [0, 1])
+        self.assertEqual(sorted(i for page in pages for i in page), list(range(12)))
+        self.assertEqual(sorted(source.fetched), [1, 2, 3, 4, 5, 6])
+        self.assertLessEqual(source.max_in_flight, 3)
+
+    def test_max_pages_limits_fetches(self):
+        source = StubSource(pages=10)
+        pages = list(source.iterate(max_pages=3))
+
+        self.assertEqual(len(pages), 3)
+        self.assertEqual(sorted(source.fetched), [1, 2, 3])
+
+    def test_unknown_total_is_sequential_until_empty_page(self):
+        source = StubSource(pages=3)
+        pages = list(source.iterate(total=False))
+
+        self.assertEqual(pages, [[0, 1], [2, 3], [4, 5]])
+        self.assertEqual(source.fetched, [1, 2, 3, 4])
+
+    def test_failed_pages_are_skipped(self):
+        source = StubSource(pages=4, failing={3})
+        items = sorted(i for page in source.iterate() for i in page)
+        self.assertEqual(items, [0, 1, 2, 3, 6, 7])
+
+    def test_break_cancels_pages_not_started(self):
+        source = StubSource(pages=20, delay=0.02)
+        for n, _ in enumerate(source.iterate(concurrency=1)):
+            if n == 1:
+                break
+        time.sleep(0.1)
+
+        # Páginas 1 e 2 consumidas; no máximo a 3 já estava em voo
+        self.assertLessEqual(len(source.fetched), 3)
+
+    def test_first_data_is_not_fetched_again(self):
+        source = StubSource(pages=2)
+        first = source.fetch(1)
+        source.fetched.clear()
+
+        pages = list(source.iterate(first_data=first))
+        self.assertEqual(len(pages), 2)
+        self.assertEqual(source.fetched, [2])
+
+    def test_pages_inherit_the_callers_deadline(self):
+        source = StubSource(pages=4)
+        seen = []
+        fetch = source.fetch
+        source.fetch = lambda page: seen.append(remaining_time()) or fetch(page)
+
+        run_with_deadline(time.monotonic() + 30, lambda: list(source.iterate(concurrency=2)))
+        self.assertEqual(len(seen), 4)
+        self.assertTrue(all(r is not None and r <= 30 for r in seen))
+
+
+class TotalPagesFromTestCase(unittest.TestCase):
+
+    def test_response_formats(self):
+        self.assertEqual(total_pages_from({'totalPaginas': 7}), 7)
+        self.assertEqual(total_pages_from({'page': {'totalPages': '4'}}), 4)
+        self.assertEqual(total_pages_from({'totalRegistros': 1001}, page_size=500), 3)
+        self.assertEqual(total_pages_from({'page': {'totalElements': 100}}, page_size=50), 2)
+
+    def test_unknown_total(self):
+        self.assertIsNone(total_pages_from({'totalRegistros': 10}))
+        self.assertIsNone(total_pages_from({'totalPages': 'n/d'}))
+        self.assertIsNone(total_pages_from([]))
+
+
+if __name__ == '__main__':
+    unittest.main()
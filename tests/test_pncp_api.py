@@ -0,0 +1,104 @@
+import unittest
+from unittest import mock
+
+from app.api.pncp_api import PNCPClient
+
+
+def contrato(objeto, controle='00394452000103-1-000010/2025', **campos):
+    return {
+        'objetoContrato': objeto,
+        'numeroControlePncpCompra': controle,
+        'numeroControlePNCP': f'ctr-{controle}',
+        'dataAssinatura': '2025-03-10T00:00:00',
+        'valorGlobal': 250000.0,
+        'nomeRazaoSocialFornecedor': 'FORNECEDOR LTDA',
+        'orgaoEntidade': {'razaoSocial': 'MINISTÉRIO'},
+        **campos
+    }
+
+
+class PNCPClientTestCase(unittest.TestCase):
+
+    def setUp(self):
+        config = mock.patch.multiple(
+            'app.api.base_client.Config', API_CACHE_BACKEND='memory', RATE_LIMIT_BACKEND='memory'
+        )
+        config.start()
+        self.addCleanup(config.stop)
+        self.client = PNCPClient()
+
+    def test_keywords_skip_short_words_and_accents(self):
+        self.assertEqual(PNCPClient._keywords('CANETA ESFEROGRÁFICA, AZUL'), ['caneta', 'esferografica'])
+        self.assertEqual(PNCPClient._keywords('PÁ DE AÇO'), [])
+        self.assertEqual(PNCPClient._keywords(None), [])
+
+    def test_matches_by_code_field_code_in_text_or_all_keywords(self):
+        keywords = ['caneta', 'esferografica']
+        self.assertTrue(self.client._matches_item({'codigoItem': ' 1001 '}, '1001', []))
+        self.assertTrue(self.client._matches_item(contrato('Aquisição do item 1001'), '1001', []))
+        self.assertTrue(self.client._matches_item(contrato('Canetas esferográficas azuis'), '1001', keywords))
+        self.assertFalse(self.client._matches_item(contrato('Caneta marca-texto'), '1001', keywords))
+        self.assertFalse(self.client._matches_item(contrato('Item 10010'), '1001', []))
+
+    def test_item_prices_use_unit_value_of_exact_code(self):
+        itens = [
+            {'catalogoCodigoItem': '1001', 'valorUnitarioHomologado': 2.5, 'quantidade': 100},
+            {'catalogoCodigoItem': '2002', 'valorUnitarioHomologado': 900.0},
+            {'catalogoCodigoItem': '1001', 'valorUnitarioEstimado': 0},
+        ]
+        with mock.patch.object(self.client.itens, 'get_purchase_items', return_value=itens) as get:
+            prices = self.client._item_prices(contrato('Canetas'), '1001')
+
+        get.assert_called_once_with('00394452000103', 2025, 10)
+        self.assertEqual([p['price'] for p in prices], [2.5])
+        self.assertEqual(prices[0]['supplier'], 'FORNECEDOR LTDA')
+        self.assertEqual(prices[0]['quantity'], 100)
+
+    def test_contract_totals_never_enter_the_sample(self):
+        contratos = [
+            contrato('Canetas esferográficas', controle='11111111000111-1-000001/2025'),
+            contrato('Canetas esferográficas', controle='22222222000122-1-000002/2025'),
+            contrato('Canetas esferográficas', controle='sem-formato'),
+        ]
+
+        def itens(cnpj, ano, sequencial):
+            # Segunda compra: endpoint de itens indisponível
+            if cnpj == '22222222000122':
+                return None
+            return [{'catalogoCodigoItem': '1001', 'valorUnitarioHomologado': 3.0}]
+
+        with mock.patch.object(self.client, 'get', return_value={'data': contratos}), \
+                mock.patch.object(self.client, 'iter_pages', return_value=iter([contratos])), \
+                mock.patch.object(self.client.itens, 'get_purchase_items', side_effect=itens):
+            prices = self.client.search_contracts('1001', 'material', item_description='CANETA ESFEROGRÁFICA')
+
+        self.assertEqual([p['price'] for p in prices], [3.0])
+
+    def test_lookup_budget_stops_the_scan(self):
+        pagina = [contrato('Canetas esferográficas', controle=f'11111111000111-1-{n:06d}/2025') for n in range(5)]
+        pages = iter([pagina, pagina])
+
+        with mock.patch('app.api.pncp_api.Config.PNCP_MAX_ITEM_LOOKUPS', 3), \
+                mock.patch.object(self.client, 'get', return_value={'data': pagina}), \
+                mock.patch.object(self.client, 'iter_pages', return_value=pages), \
+                mock.patch.object(self.client.itens, 'get_purchase_items', return_value=[]) as get:
+            self.client.search_contracts('1001', 'material', item_description='CANETA ESFEROGRÁFICA')
+
+        self.assertEqual(get.call_count, 3)
+        self.assertEqual(next(pages, None), pagina)  # segunda página não consumida
+
+    def test_unreachable_source_returns_none(self):
+        with mock.patch.object(self.client, 'get', return_value=None):
+            self.assertIsNone(self.client.search_contracts('1001', 'material'))
+
+    def test_item_lookups_share_one_rate_limit_key(self):
+        itens = self.client.itens
+        self.assertEqual(
+            itens._rate_key('/orgaos/1/compras/2025/1/itens'),
+            itens._rate_key('/orgaos/2/compras/2024/9/itens')
+        )
+        self.assertNotEqual(self.client._rate_key('/contratos'), self.client._rate_key('/contratacoes'))
+
+
+if __name__ == '__main__':
+    unittest.main()
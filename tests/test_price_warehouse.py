@@ -0,0 +1,166 @@
+import os
+import tempfile
+import unittest
+from datetime import date, datetime, timedelta
+from unittest import mock
+
+from flask import Flask
+
+from app.models import db
+from app.models.models import SincronizacaoPrecos
+from app.services.price_warehouse import PriceWarehouse
+
+
+def preco(dias_atras, valor, fornecedor='FORNECEDOR LTDA'):
+    return {
+        'source': 'PNCP',
+        'price': valor,
+        'date': datetime.combine(date.today() - timedelta(days=dias_atras), datetime.min.time()),
+        'supplier': fornecedor,
+        'contract_number': f'ctr-{dias_atras}-{valor}',
+    }
+
+
+class WarehouseTestCase(unittest.TestCase):
+    """Armazém sobre um banco SQLite em memória"""
+
+    def setUp(self):
+        self.app = Flask(__name__)
+        self.app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite://'
+        db.init_app(self.app)
+        self.context = self.app.app_context()
+        self.context.push()
+        db.create_all()
+        self.warehouse = PriceWarehouse()
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+        self.context.pop()
+
+    def age_sync(self, item_code, source, hours):
+        sync = SincronizacaoPrecos.query.filter_by(item_code=item_code, source=source).one()
+        sync.last_sync_at = datetime.utcnow() - timedelta(hours=hours)
+        db.session.commit()
+
+
+class PriceWarehouseTestCase(WarehouseTestCase):
+
+    def test_store_deduplicates_and_sets_watermark(self):
+        prices = [preco(10, 2.5), preco(3, 2.7), preco(3, 2.7)]
+        self.assertEqual(self.warehouse.store('1001', 'material', 'PNCP', prices), 2)
+        self.assertEqual(self.warehouse.store('1001', 'material', 'PNCP', prices), 0)
+
+        sync = SincronizacaoPrecos.query.filter_by(item_code='1001', source='PNCP').one()
+        self.assertEqual(sync.watermark, date.today() - timedelta(days=3))
+        self.assertEqual(self.warehouse.fresh_sources('1001'), {'PNCP'})
+
+    def test_get_prices_window_and_order(self):
+        self.warehouse.store('1001', 'material', 'PNCP', [preco(400, 1.0), preco(30, 2.0), preco(5, 3.0)])
+
+        prices = self.warehouse.get_prices('1001', 'PNCP', max_days=365)
+        self.assertEqual([p['price'] for p in prices], [3.0, 2.0])
+        self.assertIsInstance(prices[0]['date'], datetime)
+        self.assertEqual(self.warehouse.get_prices('1001', 'Painel de Preços', 365), [])
+
+    def test_delta_days_from_watermark(self):
+        self.assertEqual(self.warehouse.delta_days('1001', 'PNCP', 365), 365)
+        self.warehouse.store('1001', 'material', 'PNCP', [preco(30, 2.0)])
+        self.assertEqual(self.warehouse.delta_days('1001', 'PNCP', 365), 31)
+        self.assertEqual(self.warehouse.delta_days('1001', 'PNCP', 10), 10)
+
+    def test_empty_delta_marks_sync_without_moving_watermark(self):
+        self.warehouse.store('1001', 'material', 'PNCP', [preco(30, 2.0)])
+        self.age_sync('1001', 'PNCP', hours=24)
+        self.assertEqual(self.warehouse.fresh_sources('1001'), set())
+
+        self.assertEqual(self.warehouse.store('1001', 'material', 'PNCP', []), 0)
+        self.assertEqual(self.warehouse.fresh_sources('1001'), {'PNCP'})
+        self.assertEqual(self.warehouse.delta_days('1001', 'PNCP', 365), 31)
+
+    def test_mock_prices_are_not_stored(self):
+        self.warehouse.store('1001', 'material', 'PNCP', [{**preco(1, 9.0), 'is_mock': True}])
+        self.assertEqual(self.warehouse.get_prices('1001', 'PNCP', 365), [])
+
+
+class CollectorWarehouseTestCase(WarehouseTestCase):
+    """Coleta com o armazém: resposta local, delta e falha da fonte"""
+
+    def setUp(self):
+        super().setUp()
+        self.tmpdir = tempfile.TemporaryDirectory()
+        catmat = os.path.join(self.tmpdir.name, 'catmat.csv')
+        catser = os.path.join(self.tmpdir.name, 'catser.csv')
+        with open(catmat, 'w', encoding='utf-8') as f:
+            f.write('codigo;descricao\n1001;CANETA ESFEROGRÁFICA\n')
+        with open(catser, 'w', encoding='utf-8') as f:
+            f.write('codigo;descricao\n5001;LIMPEZA PREDIAL\n')
+
+        patches = [
+            mock.patch.multiple(
+                'app.api.catalog_base.Config',
+                CATMAT_FILE=catmat, CATSER_FILE=catser, CATALOG_BACKGROUND_LOAD=False,
+                CATALOG_SNAPSHOT_ENABLED=False, CATALOG_WATCH_INTERVAL=0
+            ),
+            mock.patch.multiple(
+                'app.api.base_client.Config', API_CACHE_BACKEND='memory', RATE_LIMIT_BACKEND='memory'
+            ),
+        ]
+        for patch in patches:
+            patch.start()
+            self.addCleanup(patch.stop)
+
+        from app.services.price_collector_enhanced import EnhancedPriceCollector
+        self.collector = EnhancedPriceCollector()
+        self.addCleanup(self.tmpdir.cleanup)
+
+        # Única fonte: PNCP, com a resposta e a janela pedida registradas
+        self.pncp_response = None
+        self.pncp_windows = []
+
+        def sources(item_code, catalog_type, region, max_days, pncp_days=None):
+            def fetch():
+                self.pncp_windows.append(pncp_days)
+                return self.pncp_response
+            return [('PNCP', fetch)]
+
+        patch = mock.patch.object(self.collector, '_get_sources', side_effect=sources)
+        patch.start()
+        self.addCleanup(patch.stop)
+
+    def collect(self):
+        result = self.collector.collect_prices_with_fallback('1001', 'material', concurrent=False)
+        return [s['fonte'] for s in result['sources']], result['total_prices']
+
+    def test_empty_delta_is_answered_from_the_warehouse(self):
+        self.pncp_response = [preco(30, 2.0), preco(20, 2.1), preco(10, 2.2)]
+        self.assertEqual(self.collect(), (['PNCP'], 3))
+
+        # Sincronização vencida: delta de 31 dias, sem nada novo
+        self.age_sync('1001', 'PNCP', hours=24)
+        self.pncp_response = []
+        self.assertEqual(self.collect(), (['PNCP'], 3))
+        self.assertEqual(self.pncp_windows, [365, 11])
+
+        # Sincronização renovada: a próxima pesquisa não vai à rede
+        self.assertEqual(self.collect(), (['PNCP'], 3))
+        self.assertEqual(len(self.pncp_windows), 2)
+
+    def test_failed_source_does_not_renew_sync(self):
+        self.pncp_response = [preco(10, 2.2)]
+        self.collect()
+        self.age_sync('1001', 'PNCP', hours=24)
+
+        self.pncp_response = None
+        fontes, _ = self.collect()
+        self.assertEqual(fontes, ['DADOS DE TESTE (Mockados)'])
+        self.assertEqual(self.collector.warehouse.fresh_sources('1001'), set())
+
+    def test_failed_store_keeps_the_fetched_prices(self):
+        self.pncp_response = [preco(30, 2.0), preco(10, 2.2)]
+        with mock.patch.object(self.collector.warehouse, 'store', return_value=None):
+            self.assertEqual(self.collect(), (['PNCP'], 2))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,355 @@
+import json
+import os
+import re
+import tempfile
+import unittest
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime, timedelta
+from unittest import mock
+
+from flask import g
+from sqlalchemy import event
+
+from app.models import db
+from app.models.models import Pesquisa, PesquisaJob, PesquisaLote, User
+from app.services import research_jobs
+from app.services.research_service import ResearchError
+
+
+def preco(valor, fonte='PNCP'):
+    return {'source': fonte, 'price': valor, 'date': datetime(2025, 3, 10), 'supplier': 'FORNECEDOR LTDA'}
+
+
+def coleta(precos, fontes=('PNCP',)):
+    """Eventos de iter_collection: uma fonte por vez e o resultado final"""
+    for fonte in fontes:
+        yield {'evento': 'fonte', 'fonte': fonte, 'precos': precos, 'local': False}
+    yield {'evento': 'concluido', 'resultado': {
+        'item_code': '1001',
+        'item_description': 'CANETA ESFEROGRÁFICA',
+        'catalog_type': 'material',
+        'total_prices': len(precos),
+        'prices': precos,
+        'sources': [{'fonte': fonte, 'quantidade': len(precos)} for fonte in fontes],
+        'filters': {},
+        'metadata': {'fallback_used': False}
+    }}
+
+
+class ResearchAppTestCase(unittest.TestCase):
+    """Aplicação completa sobre SQLite em memória, catálogos de teste e sem rede"""
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmpdir.cleanup)
+        catmat = os.path.join(self.tmpdir.name, 'catmat.csv')
+        catser = os.path.join(self.tmpdir.name, 'catser.csv')
+        with open(catmat, 'w', encoding='utf-8') as f:
+            f.write('codigo;descricao\n1001;CANETA ESFEROGRÁFICA\n1002;PAPEL SULFITE A4\n')
+        with open(catser, 'w', encoding='utf-8') as f:
+            f.write('codigo;descricao\n5001;LIMPEZA PREDIAL\n')
+
+        config = mock.patch.multiple(
+            'config.Config',
+            SQLALCHEMY_DATABASE_URI='sqlite://', DATA_DIR=self.tmpdir.name, REPORTS_DIR=self.tmpdir.name,
+            CATMAT_FILE=catmat, CATSER_FILE=catser, CATALOG_BACKGROUND_LOAD=False,
+            CATALOG_SNAPSHOT_ENABLED=False, CATALOG_WATCH_INTERVAL=0,
+            API_CACHE_BACKEND='memory', RATE_LIMIT_BACKEND='memory', RESEARCH_JOBS_ENABLED=False
+        )
+        config.start()
+        self.addCleanup(config.stop)
+
+        from app.models import create_app
+        from app import routes
+        self.routes = routes
+        self.app = create_app()
+        self.app.config['TESTING'] = True
+        context = self.app.app_context()
+        context.push()
+        self.addCleanup(context.pop)
+        self.addCleanup(db.drop_all)
+        self.addCleanup(db.session.remove)
+
+        self.user = User(username='ana', email='ana@orgao.gov.br', full_name='Ana Souza')
+        self.user.set_password('senha')
+        db.session.add(self.user)
+        db.session.commit()
+
+        self.client = self.app.test_client()
+        with self.client.session_transaction() as session:
+            session['_user_id'] = str(self.user.id)
+
+        # PDF fora do teste (reportlab é lento e o arquivo não é verificado)
+        pdf = mock.patch.object(
+            routes.doc_generator, 'generate_research_report',
+            return_value=os.path.join(self.tmpdir.name, 'pesquisa.pdf')
+        )
+        pdf.start()
+        self.addCleanup(pdf.stop)
+
+
+class PriceStreamTestCase(ResearchAppTestCase):
+
+    def stream(self, eventos, **params):
+        with mock.patch.object(self.routes.collector, 'iter_collection', return_value=eventos) as iter_collection, \
+                mock.patch.object(self.routes.collector, 'collect_prices_with_fallback') as collect:
+            response = self.client.get('/pesquisar-precos/stream', query_string={
+                'item_code': '1001', 'catalog_type': 'material', **params
+            })
+            body = response.get_data(as_text=True)
+
+        self.assertEqual(response.mimetype, 'text/event-stream')
+        self.assertEqual(iter_collection.call_count, 1)
+        collect.assert_not_called()
+        return [
+            (evento, json.loads(dados))
+            for evento, dados in re.findall(r'event: (\w+)\ndata: (.*)\n\n', body)
+        ]
+
+    def test_streamed_collection_is_saved_without_collecting_again(self):
+        precos = [preco(2.0), preco(2.2), preco(2.4)]
+        eventos = self.stream(coleta(precos, fontes=('PNCP', 'Painel de Preços')))
+
+        self.assertEqual([e for e, _ in eventos], ['fonte', 'fonte', 'concluido', 'salvo'])
+        self.assertEqual(eventos[1][1]['estatisticas']['sample_size'], 6)
+
+        pesquisa = Pesquisa.query.one()
+        self.assertEqual(eventos[-1][1], {'pesquisa_id': pesquisa.id, 'resultado_url': f'/pesquisa/{pesquisa.id}'})
+        self.assertEqual(pesquisa.user_id, self.user.id)
+        self.assertEqual(pesquisa.responsible_agent, 'Ana Souza')
+        self.assertEqual(len(pesquisa.prices_collected), 3)
+        self.assertEqual(pesquisa.pdf_filename, 'pesquisa.pdf')
+
+    def test_empty_collection_reports_without_saving(self):
+        eventos = self.stream(coleta([]))
+
+        self.assertEqual([e for e, _ in eventos], ['fonte', 'concluido', 'sem_resultado'])
+        self.assertEqual(eventos[-1][1]['erro'], 'Nenhum preço encontrado para este item.')
+        self.assertEqual(Pesquisa.query.count(), 0)
+
+    def test_collection_error_ends_stream_with_failure(self):
+        def eventos():
+            yield {'evento': 'fonte', 'fonte': 'PNCP', 'precos': [preco(2.0)], 'local': False}
+            raise RuntimeError('fonte fora do ar')
+
+        self.assertEqual([e for e, _ in self.stream(eventos())], ['fonte', 'falha'])
+        self.assertEqual(Pesquisa.query.count(), 0)
+
+    def test_missing_parameters(self):
+        response = self.client.get('/pesquisar-precos/stream', query_string={'item_code': '1001'})
+        self.assertEqual(response.status_code, 400)
+
+
+class QueueTestCase(ResearchAppTestCase):
+    """Fila com os jobs executados no próprio processo de teste"""
+
+    def setUp(self):
+        super().setUp()
+        worker = mock.patch.multiple(research_jobs, _worker_app=self.app, _worker_service=self.routes.research_service)
+        worker.start()
+        self.addCleanup(worker.stop)
+
+        # Envio ao pool registrado, sem processos
+        self.submitted = []
+        submit = mock.patch.object(
+            self.routes.research_queue, '_submit', side_effect=lambda fn, *args: self.submitted.append((fn, *args))
+        )
+        submit.start()
+        self.addCleanup(submit.stop)
+
+        self.queue = research_jobs.ResearchQueue()
+        self.queue._submit = self.routes.research_queue._submit
+
+
+class ResearchJobTestCase(QueueTestCase):
+    """Ciclo de vida dos jobs da fila"""
+
+    def enqueue(self):
+        with mock.patch('config.Config.RESEARCH_JOBS_ENABLED', True):
+            response = self.client.post(
+                '/pesquisar-precos', data={'item_code': '1001', 'catalog_type': 'material'},
+                headers={'Accept': 'application/json'}
+            )
+        self.assertEqual(response.status_code, 202)
+        return response.get_json()
+
+    def status(self, job_id):
+        return self.client.get(f'/api/pesquisa/job/{job_id}').get_json()
+
+    def test_submit_and_success(self):
+        dados = self.enqueue()
+        self.assertEqual(dados['status'], PesquisaJob.PENDING)
+        self.assertEqual(self.submitted, [(research_jobs._run_job, dados['id'])])
+        self.assertEqual(self.status(dados['id'])['status'], PesquisaJob.PENDING)
+
+        with mock.patch.object(self.routes.collector, 'iter_collection', return_value=coleta([preco(2.0), preco(2.2), preco(2.4)])):
+            research_jobs._execute_job(dados['id'])
+
+        status = self.status(dados['id'])
+        self.assertEqual(status['status'], PesquisaJob.DONE)
+        self.assertIsNone(status['etapa'])
+        self.assertEqual(status['resultado_url'], f"/pesquisa/{status['pesquisa_id']}")
+        self.assertEqual(db.session.get(Pesquisa, status['pesquisa_id']).item_code, '1001')
+
+    def test_job_is_claimed_once(self):
+        job_id = self.enqueue()['id']
+        with mock.patch.object(self.routes.research_service, 'run', side_effect=ResearchError('sem preços')) as run:
+            research_jobs._execute_job(job_id)
+            research_jobs._execute_job(job_id)
+        self.assertEqual(run.call_count, 1)
+
+    def test_failures_are_recorded(self):
+        esperado = ResearchError('Nenhum preço encontrado para este item.', 'warning')
+        job_id = self.enqueue()['id']
+        with mock.patch.object(self.routes.research_service, 'run', side_effect=esperado):
+            research_jobs._execute_job(job_id)
+        status = self.status(job_id)
+        self.assertEqual((status['status'], status['erro']), (PesquisaJob.FAILED, str(esperado)))
+        self.assertNotIn('resultado_url', status)
+
+        job_id = self.enqueue()['id']
+        with mock.patch.object(self.routes.research_service, 'run', side_effect=RuntimeError('banco fora do ar')):
+            research_jobs._execute_job(job_id)
+        self.assertEqual(self.status(job_id)['erro'], 'Erro ao realizar pesquisa. Tente novamente.')
+
+    def test_status_of_another_users_job_is_hidden(self):
+        job_id = self.enqueue()['id']
+        outro = User(username='bia', email='bia@orgao.gov.br', full_name='Bia Lima')
+        outro.set_password('senha')
+        db.session.add(outro)
+        db.session.commit()
+
+        with self.client.session_transaction() as session:
+            session['_user_id'] = str(outro.id)
+        g.pop('_login_user', None)  # usuário da requisição anterior, guardado no contexto do teste
+        self.assertEqual(self.client.get(f'/api/pesquisa/job/{job_id}').status_code, 404)
+
+    def test_recover_interrupted_and_pending_jobs(self):
+        antigo = datetime.utcnow() - timedelta(hours=2)
+        pendente = PesquisaJob(user_id=self.user.id, item_code='1001', catalog_type='material',
+                               responsible_agent='Ana Souza', created_at=antigo)
+        executando = PesquisaJob(user_id=self.user.id, item_code='1002', catalog_type='material',
+                                 responsible_agent='Ana Souza', status=PesquisaJob.RUNNING,
+                                 created_at=antigo, started_at=antigo)
+        recente = PesquisaJob(user_id=self.user.id, item_code='1002', catalog_type='material',
+                              responsible_agent='Ana Souza', status=PesquisaJob.RUNNING,
+                              started_at=datetime.utcnow())
+        lote = PesquisaLote(user_id=self.user.id, responsible_agent='Ana Souza', status=PesquisaJob.RUNNING,
+                            created_at=antigo, started_at=antigo, heartbeat_at=antigo)
+        # Lote longo entre um item e outro: nenhum job em andamento, mas vivo
+        ativo = PesquisaLote(user_id=self.user.id, responsible_agent='Ana Souza', status=PesquisaJob.RUNNING,
+                             created_at=antigo, started_at=antigo, heartbeat_at=datetime.utcnow())
+        db.session.add_all([pendente, executando, recente, lote, ativo])
+        db.session.commit()
+
+        self.assertEqual(self.queue.recover(), {'interrompidos': 1, 'pesquisas': 1, 'lotes': 1})
+        self.assertEqual(self.submitted, [(research_jobs._run_batch, lote.id), (research_jobs._run_job, pendente.id)])
+        self.assertEqual(executando.status, PesquisaJob.FAILED)
+        self.assertEqual(recente.status, PesquisaJob.RUNNING)
+        self.assertEqual(lote.status, PesquisaJob.PENDING)
+        self.assertEqual(ativo.status, PesquisaJob.RUNNING)
+
+        # Pendentes são reenviados uma única vez por processo
+        self.assertEqual(self.queue.recover(), {'interrompidos': 0, 'pesquisas': 0, 'lotes': 0})
+
+    def test_broken_pool_is_replaced_once(self):
+        queue = research_jobs.ResearchQueue()
+        broken = mock.Mock()
+        broken.submit.side_effect = BrokenProcessPool()
+        queue._executor, queue._executor_pid = broken, os.getpid()
+
+        with mock.patch.object(research_jobs, 'ProcessPoolExecutor') as pool:
+            queue._submit(research_jobs._run_job, 1)
+            # Outra thread que viu o mesmo pool quebrado reaproveita o novo
+            self.assertIs(queue._get_executor(broken=broken), pool.return_value)
+        pool.assert_called_once()
+        pool.return_value.submit.assert_called_once_with(research_jobs._run_job, 1)
+
+    def test_recovery_runs_on_first_request(self):
+        with mock.patch('config.Config.RESEARCH_JOBS_ENABLED', True), \
+                mock.patch.object(self.routes.research_queue, '_last_recovery', None), \
+                mock.patch.object(self.routes.research_queue, 'recover') as recover:
+            self.client.get('/health')
+            self.client.get('/health')
+        recover.assert_called_once_with()
+
+    def test_worker_waits_for_catalogs(self):
+        with mock.patch('app.models.create_app', return_value=self.app), \
+                mock.patch.object(self.routes.collector.catmat, 'wait_ready') as catmat, \
+                mock.patch.object(self.routes.collector.catser, 'wait_ready') as catser:
+            research_jobs._init_worker()
+        catmat.assert_called_once_with()
+        catser.assert_called_once_with()
+
+
+
+class ResearchBatchTestCase(QueueTestCase):
+    """Pesquisa em massa: envio, execução e consolidação do lote"""
+
+    def setUp(self):
+        super().setUp()
+        config = mock.patch.multiple('config.Config', RESEARCH_JOBS_ENABLED=True, RESEARCH_BATCH_CONCURRENCY=1)
+        config.start()
+        self.addCleanup(config.stop)
+
+    def enqueue_batch(self, *codigos):
+        response = self.client.post('/api/pesquisa/lote', json={'itens': list(codigos), 'tipo': 'material'})
+        self.assertEqual(response.status_code, 202)
+        return response.get_json()
+
+    def run_batch(self, lote_id, precos_por_item):
+        def eventos(item_code, *args, **kwargs):
+            return coleta(precos_por_item[item_code])
+
+        with mock.patch.object(self.routes.collector, 'iter_collection', side_effect=eventos):
+            research_jobs._run_batch(lote_id)
+        db.session.expire_all()
+        return self.client.get(f'/api/pesquisa/lote/{lote_id}').get_json()
+
+    def test_batch_waits_for_catalogs(self):
+        with mock.patch.object(self.routes.collector, 'catalogs_ready', return_value=False):
+            response = self.client.post('/api/pesquisa/lote', json={'itens': ['1001'], 'tipo': 'material'})
+        self.assertEqual(response.status_code, 503)
+        self.assertTrue(response.get_json()['carregando'])
+        self.assertEqual(PesquisaLote.query.count(), 0)
+
+    def test_status_is_derived_from_jobs(self):
+        precos = [preco(2.0), preco(2.2), preco(2.4)]
+
+        lote = self.enqueue_batch('1001', '1002')
+        self.assertEqual(self.submitted, [(research_jobs._run_batch, lote['id'])])
+        self.assertEqual(self.run_batch(lote['id'], {'1001': precos, '1002': precos})['status'], PesquisaJob.DONE)
+        # Sinal de vida renovado depois do último item
+        executado = db.session.get(PesquisaLote, lote['id'])
+        self.assertGreaterEqual(executado.heartbeat_at, max(job.finished_at for job in executado.jobs))
+
+        lote = self.enqueue_batch('1001', '1002')
+        dados = self.run_batch(lote['id'], {'1001': precos, '1002': []})
+        self.assertEqual((dados['status'], dados['concluidos'], dados['falhas']), (PesquisaLote.PARTIAL, 1, 1))
+
+        lote = self.enqueue_batch('1001', '1002')
+        self.assertEqual(self.run_batch(lote['id'], {'1001': [], '1002': []})['status'], PesquisaJob.FAILED)
+
+    def test_status_loads_results_in_one_query(self):
+        precos = [preco(2.0), preco(2.2), preco(2.4)]
+        lote = self.enqueue_batch('1001', '1002')
+        self.run_batch(lote['id'], {'1001': precos, '1002': precos})
+        db.session.expire_all()
+
+        statements = []
+        listener = lambda *args: statements.append(args[2])
+        event.listen(db.engine, 'before_cursor_execute', listener)
+        self.addCleanup(event.remove, db.engine, 'before_cursor_execute', listener)
+
+        dados = self.client.get(f"/api/pesquisa/lote/{lote['id']}").get_json()
+        self.assertEqual([item['descricao'] for item in dados['itens']], ['CANETA ESFEROGRÁFICA', 'PAPEL SULFITE A4'])
+        self.assertEqual([item['amostras'] for item in dados['itens']], [3, 3])
+        self.assertEqual(sum('pesquisas' in sql for sql in statements), 1)
+
+        csv = self.client.get(f"/api/pesquisa/lote/{lote['id']}", query_string={'formato': 'csv'})
+        self.assertEqual(csv.mimetype, 'text/csv')
+        self.assertIn('1002,material,PAPEL SULFITE A4', csv.get_data(as_text=True))
+
+
+if __name__ == '__main__':
+    unittest.main()